@@ -3,6 +3,7 @@ import traceback
 import datetime
 import os
 import json
+import sqlite3
 from PyQt6.QtWidgets import (
     QApplication, QMessageBox, QMainWindow, QWidget, QLabel, QPushButton, QFileDialog,
     QVBoxLayout, QHBoxLayout, QScrollArea, QLayout, QDialog, QCheckBox,
@@ -12,7 +13,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtGui import (
     QPixmap, QKeySequence, QShortcut, QWheelEvent, QMouseEvent, QCursor, QIcon,
-    QPainter, QFont, QTransform, QColor, QGuiApplication, QImage, QVector3D, QPen, QKeyEvent, QBrush, QPalette, QOpenGLContext, QAction,
+    QPainter, QFont, QTransform, QColor, QGuiApplication, QImage, QVector3D, QPen, QKeyEvent, QBrush, QPalette, QAction,
     QSurfaceFormat, QColorSpace
 )
 from PyQt6.QtCore import (
@@ -20,12 +21,23 @@ from PyQt6.QtCore import (
     QThread, QCoreApplication, QRect, QRectF, QRunnable, pyqtSlot, QThreadPool, QStandardPaths, QBuffer, QIODevice
 )    
 from PyQt6.QtOpenGLWidgets import QOpenGLWidget
-from PyQt6.QtOpenGL import QOpenGLFramebufferObject, QOpenGLShaderProgram, QOpenGLShader, QOpenGLTexture
 # Windows Shell (COM + open in Explorer); imaging (sharpen, loader); config; workers; UI
 from image_classifier.shell_win import open_folder_and_select_item
-from image_classifier.imaging import sharpen_cv2, ImageLoaderRunnable, WorkerSignals, save_pixmap
-from image_classifier.config import get_config_file
-from image_classifier.workers import ExportWorker, DeleteNonFavoritesWorker, SharpenThread
+from image_classifier.imaging import (
+    sharpen_cv2, GLBrightness, GLSharpener, SharpenSession, ImageLoaderRunnable, WorkerSignals, save_pixmap, PreviewDiskCache,
+    PrefetchPlanner, LoadScheduler, PRIORITY_VISIBLE, PRIORITY_NEXT, PRIORITY_WARMUP,
+    GPULimitError, apply_brightness, default_registry, gl_errors, view_matrix,
+)
+from image_classifier.config import get_catalog_file, get_config_file, get_preview_cache_dir
+from image_classifier.library import (
+    Catalog, DirectoryIndex, DirectoryWatcher, ImageView, LibraryIndex, MarkSet, MarksWriter,
+    read_marks,
+)
+from image_classifier.library.index import unique_roots
+from image_classifier.workers import (
+    ExportWorker, DeleteNonFavoritesWorker, SharpenThread, DecoderBenchmark,
+    DirectoryScanner,
+)
 from image_classifier.ui import (
     IconFactory,
     BaseOverlay,
@@ -157,6 +169,63 @@ class NearestViewport(QOpenGLWidget):
 # ------------------------------------------------------------------------
 # AdvancedGraphicsImageViewer
 # ------------------------------------------------------------------------
+class BrightnessPixmapItem(QGraphicsPixmapItem):
+    """
+    Pixmap item that applies a gamma ``brightness`` as it draws on an
+    OpenGL viewport, with a GLBrightness shader: the pixmap is uploaded
+    once and a brightness change is a uniform and a repaint, with no
+    readback.  If GL fails, ``gl_failed`` is set, the pixmap is drawn
+    plainly and ``on_failed()`` asks the viewer to bake the brightness.
+    A pixmap beyond the texture limit is only baked itself: ``too_large``
+    keeps the smallest such side, smaller pixmaps still go to the GPU.
+    """
+
+    def __init__(self, renderer: GLBrightness, on_failed=None):
+        super().__init__()
+        self.renderer = renderer
+        self.on_failed = on_failed
+        self.brightness = 1.0
+        self.gl_failed = False
+        self.too_large = None
+
+    def drawsBrightness(self, pixmap: QPixmap) -> bool:
+        """True when the shader can draw ``pixmap``; otherwise it has to be baked."""
+        if self.gl_failed:
+            return False
+        return self.too_large is None or max(pixmap.width(), pixmap.height()) < self.too_large
+
+    def setBrightness(self, factor: float):
+        if factor != self.brightness:
+            self.brightness = factor
+            self.update()
+
+    def paint(self, painter, option, widget=None):
+        pixmap = self.pixmap()
+        if (self.brightness == 1.0 or pixmap.isNull() or not self.drawsBrightness(pixmap)
+                or not isinstance(widget, QOpenGLWidget) or not widget.isValid()):
+            super().paint(painter, option, widget)
+            return
+        dpr = widget.devicePixelRatioF()
+        size = (round(widget.width() * dpr), round(widget.height() * dpr))
+        matrix = view_matrix(painter.combinedTransform(), self.boundingRect(), dpr, size)
+        painter.beginNativePainting()
+        try:
+            self.renderer.draw(pixmap, self.brightness, matrix, size)
+        except GPULimitError:
+            # Just this pixmap (and larger ones) are baked by the viewer
+            self.too_large = max(pixmap.width(), pixmap.height())
+        except gl_errors() as e:
+            # Reported once: from now on paints skip GL and the viewer bakes
+            print(f"Error drawing brightness on the GPU, using the CPU: {e}")
+            self.gl_failed = True
+        finally:
+            painter.endNativePainting()
+        if not self.drawsBrightness(pixmap):
+            self.brightness = 1.0
+            if self.on_failed is not None:
+                self.on_failed()
+
+
 class AdvancedGraphicsImageViewer(QGraphicsView):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -172,22 +241,43 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
         self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.scene = QGraphicsScene(self)
         self.setScene(self.scene)
-        self.pixmap_item = QGraphicsPixmapItem()
+        self._gl_brightness = GLBrightness()
+        self._brightness_baked = False
+        self.pixmap_item = BrightnessPixmapItem(self._gl_brightness, self._onBrightnessDrawFailed)
         self.pixmap_item.setCacheMode(QGraphicsPixmapItem.CacheMode.NoCache)
         self.pixmap_item.setTransformationMode(Qt.TransformationMode.FastTransformation)
         self.scene.addItem(self.pixmap_item)
         self.original_pixmap = None
+        self.original_is_full = True
+        self.display_resolution_decode = True
         self.rotation_angle = 0
         self.brightness_factor = 1.0
+        self._gl_sharpener = GLSharpener()
+        self._gl_sharpen_failed = False
         self.auto_fit = True
         self.zoom_factor = 1.0
         self.fit_zoom_factor = 1.0
         self.loader = None
+        self.full_res_loader = None
         self.loading_dialog = None  
 
+    def displayTargetSize(self):
+        """
+        Viewport size in physical pixels, used to decode images straight to
+        screen size.  None means "decode at full resolution".
+        """
+        if not self.display_resolution_decode:
+            return None
+        vp = self.viewport()
+        dpr = vp.devicePixelRatioF()
+        size = QSize(round(vp.width() * dpr), round(vp.height() * dpr))
+        # Before the window is laid out the viewport is tiny; don't cache junk previews.
+        if size.width() < 64 or size.height() < 64:
+            return None
+        return size
+
     def setImage(self, image_path, reset_zoom=True, preserve_zoom=False):
         import os
-        from PyQt6.QtCore import QThreadPool
 
         # 0) Normalize here the same way the loader did:
         norm = os.path.normcase(os.path.abspath(image_path))
@@ -197,26 +287,26 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
         self.current_load_id  = self.load_counter
         self.current_loading_image = norm
 
-        # 2) Cache-first: if we’ve already decoded full-res, skip threading
+        # 2) Cache-first: if we’ve already decoded this image, skip threading
         pix = ImageLoaderRunnable.get_cached_pixmap(norm)
         if pix is not None:
             # Call onImageLoaded directly (synchronous, <1 ms)
-            self.onImageLoaded(pix, reset_zoom, preserve_zoom, self.current_load_id)
+            self.onImageLoaded(pix, reset_zoom, preserve_zoom, self.current_load_id,
+                               ImageLoaderRunnable.is_full_resolution(norm))
             return
 
-        # 3) Otherwise cancel old loader and start a new one…
+        # 3) Otherwise let go of the old load (it stays queued as a
+        #    background job so its decode isn't wasted) and attach to the
+        #    load for this image — a running preload is reused, not repeated.
+        scheduler = LoadScheduler.instance()
         if getattr(self, "loader", None):
-            self.loader.cancel()
+            if self.loader.key != norm:
+                scheduler.demote(self.loader.key)
             self.loader = None
 
         window = self.window()
         window.image_loading = True
 
-        worker = ImageLoaderRunnable(image_path)
-        worker.signals.finished.connect(
-            lambda pix, id=self.current_load_id:
-                self.onImageLoaded(pix, reset_zoom, preserve_zoom, id)
-        )
         # Show user-friendly error message instead of silent print
         def handle_error(err, load_id=self.current_load_id):
             if load_id != self.current_load_id:
@@ -234,9 +324,13 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
             else:
                 # Fallback if dialog method not available
                 print(f"Error loading image: {err}")
-        worker.signals.error.connect(handle_error)
-        QThreadPool.globalInstance().start(worker)
-        self.loader = worker
+        # The visible image jumps ahead of every queued preload
+        self.loader = scheduler.load_image(norm, self.displayTargetSize(), PRIORITY_VISIBLE)
+        self.loader.add_done_callback(
+            lambda pix, full, id=self.current_load_id:
+                self.onImageLoaded(pix, reset_zoom, preserve_zoom, id, full),
+            handle_error,
+        )
 
         # --- RESET BRIGHTNESS & COMPARE-MODE FOR NEW IMAGE ---
         # Nuke any old GPU texture so we rebuild it fresh
@@ -282,7 +376,8 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
                       pixmap: QPixmap,
                       reset_zoom: bool,
                       preserve_zoom: bool,
-                      load_id: int):
+                      load_id: int,
+                      full_resolution: bool = True):
         main_win = self.window()
 
         # 1) Only update the UI if this load ID is still current.
@@ -303,8 +398,13 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
         if pixmap.isNull():
             return
 
-        # 4) Keep a *clean* full-res pixmap (DPR = 1.0) for all logic
-        self.original_pixmap = pixmap.copy()
+        # 4) Keep a *clean* pixmap (DPR = 1.0) for all logic; it may be a
+        #    screen-sized preview until zoom or an edit needs full resolution.
+        #    QPixmap is implicitly shared, so this is the cache's buffer, not
+        #    a second copy; edits always produce new pixmaps.
+        self.original_pixmap = pixmap
+        self.original_is_full = full_resolution
+        self._cancelFullResolutionLoad()
         self.cached_texture  = None
 
         # 5) Pull through any pending rotation/brightness
@@ -353,38 +453,137 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
         # ─── Ensure rotation/brightness are GPU-baked even in manual-zoom mode ───
         if not self.auto_fit:
             self.updatePixmap()
+            self.requestFullResolution()
 
 
+    def _rotatedPixmap(self) -> QPixmap:
+        """
+        original_pixmap rotated by rotation_angle.  Returns the original itself
+        (no pixel copy) when unrotated; quarter turns are exact, so they skip
+        the smoothing pass.
+        """
+        angle = self.rotation_angle % 360
+        if angle == 0:
+            return self.original_pixmap
+        mode = (Qt.TransformationMode.FastTransformation if angle % 90 == 0
+                else Qt.TransformationMode.SmoothTransformation)
+        return self.original_pixmap.transformed(QTransform().rotate(angle), mode)
+
     def _pixmapWithRotationAndBrightness(self) -> QPixmap:
         """
-        Bake rotation & brightness into a new QPixmap via the GPU
-        (we assume viewport() is always a QOpenGLWidget).
+        The pixmap to show: rotation baked in, brightness too unless the
+        pixmap item draws it with the GPU (see ``_displayBrightness``).
         """
-        # 1) Rotate first (skip transform if angle==0 for a small perf win)
-        if self.rotation_angle != 0:
-            base = self.original_pixmap.transformed(
-                QTransform().rotate(self.rotation_angle),
-                Qt.TransformationMode.SmoothTransformation
-            )
-        else:
-            base = self.original_pixmap
+        # 1) Rotate first (no copy at all when the angle is 0)
+        base = self._rotatedPixmap()
 
-        # 2) GPU brightness (only if non‐default)
-        if self.brightness_factor != 1.0:
-            vp = self.viewport()               # must be QOpenGLWidget
-            vp.makeCurrent()
-            out = self.applyBrightnessGPU(
-                base,
-                self.brightness_factor
-            )
-            vp.doneCurrent()
-        else:
-            out = base
+        # 2) Brightness (only if non‐default)
+        out = self._displayBrightness(base)
 
         # 3) preserve DPR on the result
         out.setDevicePixelRatio(base.devicePixelRatio())
         return out
 
+    def _drawsBrightness(self, pixmap: QPixmap | None = None) -> bool:
+        """
+        True when the pixmap item can apply brightness to ``pixmap`` (by
+        default the one it shows) while drawing (GL viewport).
+        """
+        vp = self.viewport()
+        if pixmap is None:
+            pixmap = self.pixmap_item.pixmap()
+        return (isinstance(vp, QOpenGLWidget) and vp.isValid()
+                and self.pixmap_item.drawsBrightness(pixmap))
+
+    def _displayBrightness(self, base: QPixmap) -> QPixmap:
+        """
+        ``base`` ready to show at brightness_factor.  On a GL viewport it is
+        returned as is and the item's shader applies the brightness, so the
+        slider only changes a uniform; otherwise it's baked on the CPU.
+        """
+        self._brightness_baked = self.brightness_factor != 1.0 and not self._drawsBrightness(base)
+        if self._brightness_baked:
+            self.pixmap_item.setBrightness(1.0)
+            return self.applyBrightness(base, self.brightness_factor)
+        self.pixmap_item.setBrightness(self.brightness_factor)
+        return base
+
+    def _needsFullResolution(self) -> bool:
+        """True when a preview is being magnified past 1 image pixel per device pixel."""
+        if self.original_pixmap is None or self.original_is_full:
+            return False
+        dpr = self.viewport().devicePixelRatioF()
+        return self.transform().m11() * dpr > 1.001
+
+    def requestFullResolution(self):
+        """Decode the full-resolution frame in the background and swap it in."""
+        if self.full_res_loader is not None or not self._needsFullResolution():
+            return
+        path = getattr(self, "current_loading_image", None)
+        if not path:
+            return
+        pix = ImageLoaderRunnable.get_cached_pixmap(path, full_resolution=True)
+        if pix is not None:
+            self._swapInFullResolution(pix)
+            return
+
+        self.full_res_loader = LoadScheduler.instance().load_image(path, None, PRIORITY_VISIBLE)
+        self.full_res_loader.add_done_callback(
+            lambda pix, _full, id=self.current_load_id: self._onFullResolutionLoaded(pix, id),
+            lambda _err, id=self.current_load_id: self._onFullResolutionLoaded(QPixmap(), id),
+        )
+
+    def _onFullResolutionLoaded(self, pixmap: QPixmap, load_id: int):
+        if load_id != getattr(self, "current_load_id", None):
+            return
+        self.full_res_loader = None
+        if not pixmap.isNull() and not self.original_is_full:
+            self._swapInFullResolution(pixmap)
+
+    def ensureFullResolution(self) -> bool:
+        """
+        Synchronously replace a preview with the full-resolution frame.
+        Edits, crops and saves must never work on the screen-sized preview.
+        """
+        if self.original_pixmap is None or self.original_is_full:
+            return True
+        path = getattr(self, "current_loading_image", None)
+        if not path:
+            return False
+        pix = ImageLoaderRunnable.get_cached_pixmap(path, full_resolution=True)
+        if pix is None:
+            try:
+                pix, _ = ImageLoaderRunnable.load_pixmap(path)
+            except (OSError, ValueError):
+                return False
+        self._cancelFullResolutionLoad()
+        self._swapInFullResolution(pix)
+        return True
+
+    def _cancelFullResolutionLoad(self):
+        if self.full_res_loader is not None:
+            self.full_res_loader.cancel()
+            self.full_res_loader = None
+
+    def _swapInFullResolution(self, pixmap: QPixmap):
+        """Replace the preview without moving the visible part of the image."""
+        ratio = self.original_pixmap.width() / max(1, pixmap.width())
+        center = self.mapToScene(self.viewport().rect().center())
+        self.original_pixmap = pixmap
+        self.original_is_full = True
+        self.cached_texture = None
+
+        # Keyboard zoom keeps auto_fit set, so check the real scale too
+        if self.auto_fit and abs(self.transform().m11() - self.fit_zoom_factor) < 0.001:
+            self.adjustToFit()
+            return
+
+        self.updatePixmap()
+        self.scale(ratio, ratio)
+        self.zoom_factor = self.transform().m11()
+        self.fit_zoom_factor *= ratio
+        self.centerOn(center / ratio)
+
     def clear(self):
         self.pixmap_item.setPixmap(QPixmap())
 
@@ -400,23 +599,11 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
         # 2) Reset any prior zoom/transform
         self.resetTransform()
 
-        # 3) Always rotate into a fresh pixmap
-        rotated = self.original_pixmap.transformed(
-            QTransform().rotate(self.rotation_angle),
-            Qt.TransformationMode.SmoothTransformation
-        )
+        # 3) Rotate (shares the original's pixels when the angle is 0)
+        rotated = self._rotatedPixmap()
 
-        # 4) Bake brightness (GPU if possible, else CPU)
-        if self.brightness_factor != 1.0:
-            vp = self.viewport()
-            if isinstance(vp, QOpenGLWidget):
-                vp.makeCurrent()
-                baked = self.applyBrightnessGPU(rotated, self.brightness_factor)
-                vp.doneCurrent()
-            else:
-                baked = self.applyBrightness(rotated, self.brightness_factor)
-        else:
-            baked = rotated
+        # 4) Brightness (drawn by the GPU if possible, else baked)
+        baked = self._displayBrightness(rotated)
 
         # 5) Preserve the *original* image’s DPR tag
         baked.setDevicePixelRatio(self.original_pixmap.devicePixelRatio())
@@ -457,24 +644,10 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
         self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorViewCenter)
 
         # 2) Rotate
-        if self.rotation_angle != 0:
-            base = self.original_pixmap.transformed(
-                QTransform().rotate(self.rotation_angle),
-                Qt.TransformationMode.SmoothTransformation
-            )
-        else:
-            base = self.original_pixmap
+        base = self._rotatedPixmap()
 
-        # 3) Brightness (GPU vs CPU)
-        vp = self.viewport()
-        if self.brightness_factor != 1.0 and isinstance(vp, QOpenGLWidget):
-            vp.makeCurrent()
-            baked = self.applyBrightnessGPU(base, self.brightness_factor)
-            vp.doneCurrent()
-        elif self.brightness_factor != 1.0:
-            baked = self.applyBrightness(base, self.brightness_factor)
-        else:
-            baked = base
+        # 3) Brightness (drawn by the GPU if possible, else baked)
+        baked = self._displayBrightness(base)
 
         # 4) Tag with original DPR
         baked.setDevicePixelRatio(self.original_pixmap.devicePixelRatio())
@@ -492,10 +665,12 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
     def setBrightness(self, factor):
         # Turn off split‐view compare overlay
         self.compare_enabled   = False
-        # Drop the old GL texture so we rebuild fresh
         self.cached_texture    = None
-        # Apply the new brightness and repaint
         self.brightness_factor = factor
+        # Shown unbaked on a GL viewport: only the shader's uniform changes
+        if not self._brightness_baked and self._drawsBrightness():
+            self.pixmap_item.setBrightness(factor)
+            return
         self.updatePixmap()
 
     def wheelEvent(self, event: QWheelEvent):
@@ -516,6 +691,7 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
         new_scene_pos = self.mapToScene(event.position().toPoint())
         delta = new_scene_pos - old_scene_pos
         self.translate(delta.x(), delta.y())
+        self.requestFullResolution()
 
     def mouseDoubleClickEvent(self, event: QMouseEvent):
         self.auto_fit = True
@@ -573,6 +749,7 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
         self.scale(factor, factor)
         self.zoom_factor = self.transform().m11()
         self.centerOn(scene_center)
+        self.requestFullResolution()
 
     def rotate_clockwise(self):
         self.rotation_angle = (self.rotation_angle + 90) % 360
@@ -782,8 +959,8 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
             btn_clear_cmp.clicked.connect(lambda: (photo_viewer.clear_compare(), overlay.close()))
             sub_layout.addWidget(btn_clear_cmp)
 
-        all_images = photo_viewer.get_all_images()
-        if len(all_images) > len(photo_viewer.favorites):
+        total_images, favorite_count, _ = photo_viewer.mark_counts()
+        if total_images > favorite_count:
             btn_del_nonfav = QPushButton(t["delete_non_favorites"], submenu)
             btn_del_nonfav.clicked.connect(lambda: (photo_viewer.delete_non_favorites_action(), overlay.close()))
             sub_layout.addWidget(btn_del_nonfav)
@@ -856,195 +1033,75 @@ class AdvancedGraphicsImageViewer(QGraphicsView):
             event.ignore()
 
     def applyBrightnessGPU(self, pixmap: QPixmap, factor: float) -> QPixmap:
-        import ctypes
+        """
+        ``pixmap`` with brightness applied, read back from the GPU (the
+        viewport's context must be current).  The shader, geometry and
+        source texture are the ones the pixmap item draws with, so the
+        shown image is not uploaded again.
+        """
+        return QPixmap.fromImage(self._gl_brightness.render(pixmap, factor))
 
-        GL = _opengl()
+    def applyBrightness(self, pixmap: QPixmap, factor: float) -> QPixmap:
+        """CPU version of applyBrightnessGPU."""
+        return QPixmap.fromImage(apply_brightness(pixmap.toImage(), factor))
 
-        # 1) Bake a fresh QOpenGLTexture from the pixmap each time
-        image = pixmap.toImage().convertToFormat(QImage.Format.Format_RGBA8888)
-        tex = QOpenGLTexture(image)
-        tex.setMinificationFilter(QOpenGLTexture.Filter.Nearest)
-        tex.setMagnificationFilter(QOpenGLTexture.Filter.Nearest)
-        tex.setWrapMode(QOpenGLTexture.WrapMode.ClampToEdge)
-
-        # 2) Offscreen FBO of the same size
-        w, h = pixmap.width(), pixmap.height()
-        fbo = QOpenGLFramebufferObject(QSize(w, h))
-        fbo.bind()
-        GL.glDisable(GL.GL_DEPTH_TEST)
-        GL.glDisable(GL.GL_CULL_FACE)
-
-        GL.glViewport(0, 0, w, h)
-        GL.glClearColor(0, 0, 0, 0)
-        GL.glClear(GL.GL_COLOR_BUFFER_BIT)
-
-        # 3) Compile + bind brightness‐gamma shader
-        prog = QOpenGLShaderProgram()
-        vertex_src = """
-        #version 330 core
-        layout(location=0) in vec2 position;
-        layout(location=1) in vec2 texCoord;
-        out vec2 vTC;
-        void main() {
-            gl_Position = vec4(position, 0.0, 1.0);
-            vTC = texCoord;
-        }
+    def displayedPixmap(self) -> QPixmap:
         """
-        fragment_src = """
-        #version 330 core
-        in vec2 vTC;
-        out vec4 outColor;
-        uniform sampler2D image;
-        uniform float brightness;
-        void main() {
-            vec4 c = texture(image, vTC);
-            vec3 adj = pow(c.rgb, vec3(brightness));
-            outColor = vec4(adj, c.a);
-        }
+        The pixels on screen, rotation and brightness applied, for saving.
+        Brightness drawn by the shader is read back here and only here.
         """
-        VERTEX_SHADER   = 0x00000001
-        FRAGMENT_SHADER = 0x00000002
-        prog.addShaderFromSourceCode(
-            QOpenGLShader.ShaderTypeBit(VERTEX_SHADER),
-            vertex_src
-        )
-        prog.addShaderFromSourceCode(
-            QOpenGLShader.ShaderTypeBit(FRAGMENT_SHADER),
-            fragment_src
-        )
-        prog.link()
-        prog.bind()
-        prog.setUniformValue("brightness", factor)
-
-        GL.glActiveTexture(GL.GL_TEXTURE0)
-        tex.bind()
-        prog.setUniformValue("image", 0)
-
-        # 4) Draw one big triangle—no shared edge, no seam
-        verts = [
-            -1.0, -1.0,   0.0, 0.0,
-             3.0, -1.0,   2.0, 0.0,
-            -1.0,  3.0,   0.0, 2.0
-        ]
-        verts = (GL.GLfloat * len(verts))(*verts)
-        vao = GL.glGenVertexArrays(1)
-        vbo = GL.glGenBuffers(1)
-        GL.glBindVertexArray(vao)
-        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbo)
-        GL.glBufferData(GL.GL_ARRAY_BUFFER, ctypes.sizeof(verts), verts, GL.GL_STATIC_DRAW)
-
-        stride = 4 * ctypes.sizeof(GL.GLfloat)
-        GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, stride, ctypes.c_void_p(0))
-        GL.glEnableVertexAttribArray(0)
-        GL.glVertexAttribPointer(1, 2, GL.GL_FLOAT, GL.GL_FALSE,
-                              stride,
-                              ctypes.c_void_p(2 * ctypes.sizeof(GL.GLfloat)))
-        GL.glEnableVertexAttribArray(1)
-
-        GL.glDrawArrays(GL.GL_TRIANGLES, 0, 3)
-
-        # 5) Cleanup and read back
-        GL.glBindVertexArray(0)
-        GL.glDeleteBuffers(1, [vbo])
-        GL.glDeleteVertexArrays(1, [vao])
-        tex.release()
-        prog.release()
-        fbo.release()
-
-        result = fbo.toImage().mirrored(False, True)
-        return QPixmap.fromImage(result)
-
-
-    def applySharpenGPU(self, pixmap: QPixmap, radius: int, amount: float) -> QPixmap:
-        GL = _opengl()
+        pixmap = self.pixmap_item.pixmap()
+        factor = self.pixmap_item.brightness
+        if factor == 1.0 or pixmap.isNull():
+            return pixmap
+        vp = self.viewport()
+        vp.makeCurrent()
+        try:
+            out = self.applyBrightnessGPU(pixmap, factor)
+        except GPULimitError:
+            out = self.applyBrightness(pixmap, factor)
+        except gl_errors() as e:
+            print(f"Error reading brightness back from the GPU, using the CPU: {e}")
+            self.pixmap_item.gl_failed = True
+            self._onBrightnessDrawFailed()
+            out = self.applyBrightness(pixmap, factor)
+        finally:
+            vp.doneCurrent()
+        out.setDevicePixelRatio(pixmap.devicePixelRatio())
+        return out
 
-        # 1) Compile & link shader if needed
-        if self._sharpen_program is None:
-            ctx = QOpenGLContext.currentContext()
-            if not ctx:
-                raise RuntimeError("No current OpenGL context!")
-            prog = QOpenGLShaderProgram(ctx)
-
-            # vertex pass-through
-            prog.addShaderFromSourceCode(
-                QOpenGLShader.ShaderTypeBit.Vertex,
-                b"""
-                #version 330 core
-                layout(location = 0) in vec2 pos;
-                layout(location = 1) in vec2 uv;
-                out vec2 v_uv;
-                void main() {
-                    v_uv = uv;
-                    gl_Position = vec4(pos, 0.0, 1.0);
-                }
-                """
-            )
-            # unsharp‐mask fragment
-            prog.addShaderFromSourceCode(
-                QOpenGLShader.ShaderTypeBit.Fragment,
-                b"""
-                #version 330 core
-                in vec2 v_uv;
-                uniform sampler2D u_tex;
-                uniform float u_radius;
-                uniform float u_amount;
-                out vec4 fragColor;
-                void main() {
-                    vec2 texel = 1.0 / textureSize(u_tex, 0);
-                    vec3 c = texture(u_tex, v_uv).rgb;
-                    vec3 b = vec3(0.0);
-                    for(int x=-1; x<=1; ++x)
-                        for(int y=-1; y<=1; ++y)
-                            b += texture(u_tex, v_uv + texel * vec2(x,y) * u_radius).rgb;
-                    b /= 9.0;
-                    vec3 r = c + (c - b) * u_amount;
-                    fragColor = vec4(r, 1.0);
-                }
-                """
-            )
-            prog.link()
-            self._sharpen_program = prog
-
-        # 2) Prepare FBO
-        size = QSize(pixmap.width(), pixmap.height())
-        if self._sharpen_fbo is None or self._sharpen_fbo.size() != size:
-            if self._sharpen_fbo:
-                del self._sharpen_fbo
-            self._sharpen_fbo = QOpenGLFramebufferObject(size)
-
-        # 3) Render pass
-        self._sharpen_fbo.bind()
-        self._sharpen_program.bind()
-
-        # upload texture
-        tex = QOpenGLTexture(pixmap.toImage())
-        tex.setMinificationFilter(QOpenGLTexture.Filter.Nearest)
-        tex.setMagnificationFilter(QOpenGLTexture.Filter.Nearest)
-        tex.bind(0)
-
-        # set uniforms
-        self._sharpen_program.setUniformValue("u_tex", 0)
-        self._sharpen_program.setUniformValue("u_radius", float(radius))
-        self._sharpen_program.setUniformValue("u_amount", float(amount))
-
-        # draw full-screen quad via PyOpenGL
-        GL.glBegin(GL.GL_TRIANGLE_STRIP)
-        # bottom-left
-        GL.glTexCoord2f(0.0, 0.0);  GL.glVertex2f(-1.0, -1.0)
-        # top-left
-        GL.glTexCoord2f(0.0, 1.0);  GL.glVertex2f(-1.0,  1.0)
-        # bottom-right
-        GL.glTexCoord2f(1.0, 0.0);  GL.glVertex2f( 1.0, -1.0)
-        # top-right
-        GL.glTexCoord2f(1.0, 1.0);  GL.glVertex2f( 1.0,  1.0)
-        GL.glEnd()
-
-        self._sharpen_program.release()
-        self._sharpen_fbo.release()
-        tex.destroy()
-
-        # return the sharpened pixmap
-        return QPixmap.fromImage(self._sharpen_fbo.toImage())
+    def _onBrightnessDrawFailed(self):
+        # The item can't draw this pixmap (or gave up on GL); bake the brightness
+        QTimer.singleShot(0, self.updatePixmap)
+
+    def applySharpenGPU(self, pixmap: QPixmap, radius: float, amount: float,
+                        threshold: int = 2, fallback=None) -> QPixmap:
+        """
+        ``sharpen_cv2`` in the viewport's OpenGL context, falling back to
+        the CPU when there is no context or the GPU can't do it: too large
+        an image or radius (GPULimitError, this call only) or any other GL
+        failure (reported once, the GPU isn't tried again).  ``fallback()`` makes
+        the CPU result instead of ``sharpen_cv2``.  Sharpening the same
+        pixmap again with a new amount reuses the blurs made for the last
+        radius.
+        """
+        vp = self.viewport()
+        if (not self._gl_sharpen_failed and isinstance(vp, QOpenGLWidget)
+                and vp.isValid() and vp.context() is not None):
+            vp.makeCurrent()
+            try:
+                return QPixmap.fromImage(
+                    self._gl_sharpener.sharpen(pixmap.toImage(), radius, amount, threshold))
+            except GPULimitError:
+                pass
+            except gl_errors() as e:
+                print(f"Error sharpening on the GPU, using the CPU: {e}")
+                self._gl_sharpen_failed = True
+            finally:
+                vp.doneCurrent()
+        if fallback is not None:
+            return fallback()
+        return sharpen_cv2(pixmap, radius, amount, threshold)
 
 # Crop
 # ------------------------------------------------------------------------
@@ -1697,11 +1754,26 @@ class SharpnessOverlayContent(QWidget):
     Split‐view preview of sharpen effect, with 200px sliders plus live
     numeric readouts, Apply/Cancel buttons, mouse‐drag divider, mouse‐pan,
     arrow keys, and mouse‐wheel zoom centered under the cursor.
+
+    Only display-sized proxies are painted and sharpened while the sliders
+    move: the whole image scaled to the view, or when zoomed in the visible
+    region plus a margin for panning.  The full-resolution render runs on a
+    SharpenThread once the sliders are released and replaces the proxy.
+    Proxies are sharpened with ``sharpen_gpu`` (the viewer's
+    applySharpenGPU) when given, else or when it falls back with a
+    SharpenSession.
     """
-    def __init__(self, parent, original_pixmap: QPixmap, current_language="en"):
+    # Full-resolution render starts this long after the last slider change
+    RENDER_DELAY_MS = 250
+    # The whole image is proxied while that takes at most this many view areas
+    PROXY_AREA_LIMIT = 2
+
+    def __init__(self, parent, original_pixmap: QPixmap, current_language="en",
+                 sharpen_gpu=None):
         super().__init__(parent)
         self.orig_pix     = original_pixmap
         self.current      = original_pixmap
+        self._sharpen_gpu = sharpen_gpu
         self.split_x      = 0.5
         self.btn_h        = 35
         self.ctrl_margin  = 20
@@ -1717,6 +1789,24 @@ class SharpnessOverlayContent(QWidget):
         self.min_zoom = 0.5
         self.max_zoom = 4.0
 
+        # Preview proxies and the full-resolution render (see class docstring)
+        self._orig_image = original_pixmap.toImage()
+        self._current_params = None
+        self._proxy_scale = None
+        self._proxy_source = QRect()
+        self._proxy_orig = None
+        self._proxy_sharp = None
+        self._sharp_source = QRect()
+        self._session = None
+        self._session_key = None
+        self._session_region = None
+        self._render_thread = None
+        self._stale_threads = []
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.setInterval(self.RENDER_DELAY_MS)
+        self._render_timer.timeout.connect(self._start_full_render)
+
         # accept keys & wheel
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
         self.setMouseTracking(True)
@@ -1731,6 +1821,7 @@ class SharpnessOverlayContent(QWidget):
         self.sld_r.setValue(1)
         self.sld_r.setFixedWidth(200)
         self.sld_r.valueChanged.connect(self._on_radius_changed)
+        self.sld_r.sliderReleased.connect(self._render_timer.start)
 
         # live readout (2-digit, monospaced width)
         self.lbl_r_value = QLabel(f"{self.sld_r.value():2d}", self)
@@ -1745,6 +1836,7 @@ class SharpnessOverlayContent(QWidget):
         self.sld_a.setValue(100)
         self.sld_a.setFixedWidth(200)
         self.sld_a.valueChanged.connect(self._on_amount_changed)
+        self.sld_a.sliderReleased.connect(self._render_timer.start)
 
         # live readout (3-digit, monospaced width)
         self.lbl_a_value = QLabel(f"{self.sld_a.value():3d}", self)
@@ -1812,7 +1904,7 @@ class SharpnessOverlayContent(QWidget):
         # full-black background
         painter.fillRect(self.rect(), QColor(0, 0, 0))
 
-        if self.current.isNull():
+        if self.orig_pix.isNull():
             return
 
         # leave room for controls + ctrl_margin
@@ -1820,7 +1912,7 @@ class SharpnessOverlayContent(QWidget):
         W = self.width()
         H = self.height() - total_ctrl_h - self.ctrl_margin
 
-        pw, ph     = self.current.width(), self.current.height()
+        pw, ph     = self.orig_pix.width(), self.orig_pix.height()
         base_scale = min(W / pw, H / ph)
         scale      = base_scale * self.zoom
         nw, nh     = int(pw * scale), int(ph * scale)
@@ -1830,27 +1922,29 @@ class SharpnessOverlayContent(QWidget):
         oy = (H - nh) // 2 + int(self.pan_y)
         split_px = ox + int(self.split_x * nw)
 
-        # draw sharpened (left) half
-        painter.save()
-        painter.setClipRect(ox, oy, split_px - ox, nh)
-        painter.drawPixmap(ox, oy,
-            self.current.scaled(nw, nh,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-        )
-        painter.restore()
-
-        # draw original (right) half
-        painter.save()
-        painter.setClipRect(split_px, oy, ox + nw - split_px, nh)
-        painter.drawPixmap(ox, oy,
-            self.orig_pix.scaled(nw, nh,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-        )
-        painter.restore()
+        # image pixels on screen; only the proxies covering them are drawn
+        visible = QRectF(-ox / scale, -oy / scale, W / scale, H / scale).toAlignedRect()
+        visible = visible.intersected(QRect(0, 0, pw, ph))
+        if not visible.isEmpty():
+            (orig_source, orig_proxy), (sharp_source, sharp_proxy) = \
+                self._view_proxies(scale, visible, W * H)
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+
+            def target(source):
+                return QRectF(ox + source.x() * scale, oy + source.y() * scale,
+                              source.width() * scale, source.height() * scale)
+
+            # draw sharpened (left) half
+            painter.save()
+            painter.setClipRect(ox, oy, split_px - ox, nh)
+            painter.drawPixmap(target(sharp_source), sharp_proxy, QRectF(sharp_proxy.rect()))
+            painter.restore()
+
+            # draw original (right) half
+            painter.save()
+            painter.setClipRect(split_px, oy, ox + nw - split_px, nh)
+            painter.drawPixmap(target(orig_source), orig_proxy, QRectF(orig_proxy.rect()))
+            painter.restore()
 
         # draw the split‐line
         pen = QPen(QColor("white"), 2)
@@ -2061,12 +2155,137 @@ class SharpnessOverlayContent(QWidget):
         self.update()
         ev.accept()
 
+    def _params(self):
+        return self.sld_r.value(), self.sld_a.value() / 100.0
+
     def _update_preview(self):
-        r = self.sld_r.value()
-        a = self.sld_a.value() / 100.0
-        self.current = sharpen_cv2(self.orig_pix, r, a)
+        """
+        Re-sharpen the proxy for the new slider values on the next paint and
+        schedule the full-resolution render, unless a slider is still held.
+        """
+        self._proxy_sharp = None
+        self.update()
+        if not (self.sld_r.isSliderDown() or self.sld_a.isSliderDown()):
+            self._render_timer.start()
+
+    def _view_proxies(self, scale: float, visible: QRect, view_area: int):
+        """
+        ``((source, original), (source, sharpened))``: image regions drawn
+        at ``scale`` with display-sized pixmaps of them.  The original
+        covers the whole image while that proxy stays within
+        PROXY_AREA_LIMIT views, else ``visible`` plus a quarter of its size
+        around it for panning.  Until the full render is in, only
+        ``visible`` plus the blur's reach is sharpened.  Each is rebuilt
+        when the zoom or size changes or the view leaves its region.
+        """
+        pw, ph = self.orig_pix.width(), self.orig_pix.height()
+        bounds = QRect(0, 0, pw, ph)
+        if (self._proxy_orig is None or self._proxy_scale != scale
+                or not self._proxy_source.contains(visible)):
+            proxy_scale = min(scale, 1.0)
+            if pw * ph * proxy_scale * proxy_scale <= self.PROXY_AREA_LIMIT * view_area:
+                source = bounds
+            else:
+                mx, my = visible.width() // 4, visible.height() // 4
+                source = visible.adjusted(-mx, -my, mx, my).intersected(bounds)
+            self._proxy_scale = scale
+            self._proxy_source = source
+            self._proxy_orig = self._proxy_of(self.orig_pix, source, scale)
+            self._proxy_sharp = None
+        if self._proxy_sharp is None or not self._sharp_source.contains(visible):
+            radius, amount = self._params()
+            if self._current_params == (radius, amount):
+                source = self._proxy_source
+                self._proxy_sharp = self._proxy_of(self.current, source, scale)
+            else:
+                # The wider blur reaches 2 * radius source pixels
+                halo = 2 * radius + 2
+                source = self._proxy_source
+                if source != bounds:
+                    source = visible.adjusted(-halo, -halo, halo, halo).intersected(source)
+                if self._session_key != (scale, source):
+                    # Kept while only the sliders move: amount changes just re-blend
+                    self._session_region = (self._proxy_orig if source == self._proxy_source
+                                            else self._proxy_of(self.orig_pix, source, scale))
+                    self._session = None
+                    self._session_key = (scale, source)
+                # Radius in proxy pixels, so it looks as the full render will at this zoom
+                self._proxy_sharp = self._sharpen_proxy(radius * min(scale, 1.0), amount)
+            self._sharp_source = source
+        return ((self._proxy_source, self._proxy_orig),
+                (self._sharp_source, self._proxy_sharp))
+
+    def _sharpen_proxy(self, radius: float, amount: float) -> QPixmap:
+        """The session region sharpened, on the GPU when possible."""
+        def on_cpu():
+            if self._session is None:
+                self._session = SharpenSession(self._session_region.toImage())
+            return QPixmap.fromImage(self._session.sharpen(radius, amount))
+
+        if self._sharpen_gpu is None:
+            return on_cpu()
+        return self._sharpen_gpu(self._session_region, radius, amount, fallback=on_cpu)
+
+    @staticmethod
+    def _proxy_of(pixmap: QPixmap, source: QRect, scale: float) -> QPixmap:
+        """``source`` of ``pixmap`` at ``scale``; never enlarged, the painter does that."""
+        region = pixmap if source == pixmap.rect() else pixmap.copy(source)
+        if scale >= 1.0:
+            return region
+        return region.scaled(
+            max(1, round(source.width() * scale)), max(1, round(source.height() * scale)),
+            Qt.AspectRatioMode.IgnoreAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+
+    def _start_full_render(self):
+        params = self._params()
+        if params == self._current_params:
+            return
+        if self._render_thread is not None:
+            self._render_thread.cancel()
+            self._stale_threads.append(self._render_thread)
+        thread = SharpenThread(self._orig_image, *params)
+        thread.finished.connect(
+            lambda result, thread=thread, params=params: self._on_full_render(thread, params, result))
+        thread.errorOccurred.connect(
+            lambda message, thread=thread: self._on_full_render(thread, None, None))
+        thread.cancelled.connect(lambda thread=thread: self._on_full_render(thread, None, None))
+        self._render_thread = thread
+        thread.start()
+
+    def _on_full_render(self, thread, params, result):
+        thread.wait()
+        if thread in self._stale_threads:
+            self._stale_threads.remove(thread)
+        if thread is not self._render_thread:
+            return
+        self._render_thread = None
+        if result is None:
+            return
+        self.current = result
+        self._current_params = params
+        self._proxy_sharp = None
         self.update()
 
+    def sharpened(self) -> QPixmap:
+        """The full-resolution result for the current slider values."""
+        params = self._params()
+        if params != self._current_params:
+            self.current = sharpen_cv2(self.orig_pix, *params)
+            self._current_params = params
+        return self.current
+
+    def stop_rendering(self):
+        """Drop the pending render and stop running ones (at a tile boundary), before closing."""
+        self._render_timer.stop()
+        for thread in self._stale_threads + [self._render_thread]:
+            if thread is not None:
+                thread.cancel()
+                thread.wait()
+        self._render_thread = None
+        self._stale_threads = []
+
 # ------------------------------------------------------------------------
 # Full-Screen Sharpness Overlay tying it all together
 # ------------------------------------------------------------------------
@@ -2103,8 +2322,11 @@ class SharpnessOverlay(QWidget):
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
         self.grabKeyboard()
 
-        # 5) Embed the content
-        self.content = SharpnessOverlayContent(self, original_pixmap, current_language)
+        # 5) Embed the content, previewing on the viewer's GPU
+        image_viewer = getattr(owner, "image_viewer", None)
+        self.content = SharpnessOverlayContent(
+            self, original_pixmap, current_language,
+            sharpen_gpu=image_viewer.applySharpenGPU if image_viewer is not None else None)
         self.content.setGeometry(self.rect())
 
         # 6) Show
@@ -2136,15 +2358,14 @@ class SharpnessOverlay(QWidget):
         Called when the user clicks 'Apply' in the sharpness content.
         Snap an undo, apply the sharpen, then close.
         """
-        # 1) Read slider values
-        r = content.sld_r.value()
-        a = content.sld_a.value() / 100.0
+        # 1) Full-resolution result (already rendered unless the sliders just moved)
+        result = content.sharpened()
 
         # 2) Snapshot undo now
         self._viewer.push_undo_state(from_crop=False)
 
-        # 3) Perform the sharpen (using your existing function)
-        result = sharpen_cv2(self.orig_pix, r, a)
+        # 3) Stop any render still running for older slider values
+        content.stop_rendering()
 
         # 4) Apply the sharpen result (this must not push another undo)
         self._viewer.applySharpenResult(result)
@@ -2159,6 +2380,7 @@ class SharpnessOverlay(QWidget):
         self.close()
 
     def closeEvent(self, ev):
+        self.content.stop_rendering()
         # restore shortcuts & menu on the viewer
         owner = self.parent()
         if hasattr(owner, "enable_all_shortcuts"):
@@ -2197,8 +2419,8 @@ class PhotoViewer(QMainWindow):
         self.image_files = []
         self.current_index = -1
         self.current_directory = None
-        self.favorites = set()
-        self.compare_set = set()
+        self.favorites = MarkSet()
+        self.compare_set = MarkSet()
         self.config_file = get_config_file()
         self.is_fullscreen = False
         self.sort_by_date = False
@@ -2209,14 +2431,33 @@ class PhotoViewer(QMainWindow):
         self.global_rotation = 0 
         self.image_rotations = {}
         self.norm_to_original = {}
-        self._directory_cache = {}
-        self._preload_inflight = set()
+        self._directory_index = None
+        self._directory_index_key = None
+        self._image_view = None
+        self._image_snapshot = None
+        self._view_marks = {"favorites": lambda: self.favorites, "compare": lambda: self.compare_set}
+        self.marks_writer = MarksWriter(self._marks_snapshot, parent=self)
+        self.marks_writer.failed.connect(self._on_marks_write_failed)
+        self.directory_watcher = DirectoryWatcher(parent=self)
+        self.directory_watcher.changed.connect(self.on_directory_changed)
+        self._directory_scan = None
+        self._directory_scan_start = None
+        self._changed_during_scan = []
+        self.load_scheduler = LoadScheduler.instance()
+        self._prefetch_window = []
         self.menu_dock_left = True
         self.loop_navigation = False
         self._first_image_loaded = True
         self.white_balance_enabled = False
         self.white_balance_gains = (1.0, 1.0, 1.0)
         self.load_config()
+        self.init_preview_cache()
+        self.init_pixmap_cache()
+        self.init_catalog()
+        default_registry().set_preferences(self.decoder_preferences)
+        self.load_scheduler.set_read_limits(self.io_threads, self.read_ahead_mb * 1024 * 1024)
+        self._decoder_benchmark = None
+        self.prefetch = PrefetchPlanner(self.prefetch_ahead, self.prefetch_behind)
         self.init_ui()
         self.init_floating_controls()
         self.set_theme(self.theme)
@@ -2231,6 +2472,46 @@ class PhotoViewer(QMainWindow):
         self.all_tooltips = []
         self.loading_in_progress = False
 
+    def init_preview_cache(self):
+        """Persist screen-sized previews so reopened folders skip full decodes."""
+        if self.preview_cache_mb and self.preview_cache_mb > 0:
+            cache = PreviewDiskCache(get_preview_cache_dir(), self.preview_cache_mb * 1024 * 1024)
+        else:
+            cache = None
+        ImageLoaderRunnable.set_preview_cache(cache)
+
+    def init_pixmap_cache(self):
+        """
+        Size the decoded-pixmap cache from physical memory (or the
+        pixmap_cache_mb override) and keep shrinking it under memory pressure.
+        """
+        override = self.pixmap_cache_mb * 1024 * 1024 if self.pixmap_cache_mb else None
+        ImageLoaderRunnable.configure_cache(override)
+        self._memory_timer = QTimer(self)
+        self._memory_timer.setInterval(5000)
+        self._memory_timer.timeout.connect(ImageLoaderRunnable.relieve_memory_pressure)
+        self._memory_timer.start()
+
+    def init_catalog(self):
+        """
+        Open the central catalog (listings, marks, unsaved edits) when
+        ``use_catalog`` is set; otherwise marks live only in each folder's
+        Favorites.json.
+        """
+        self.catalog = None
+        if self.use_catalog:
+            try:
+                self.catalog = Catalog(get_catalog_file())
+            except (OSError, sqlite3.Error) as e:
+                print(f"Error opening catalog: {e}")
+        self.marks_writer.catalog = self.catalog
+
+    def read_folder_marks(self, folder):
+        """``(favorites, compare)`` of one folder, from the catalog if there is one."""
+        if self.catalog is not None:
+            return self.catalog.read_marks(folder)
+        return read_marks(folder)
+
     def toggle_fullscreen(self, *, make_cover: bool = True):
         """
         make_cover = True   → use fade-out overlay (❌, F11, etc.)
@@ -2533,6 +2814,7 @@ class PhotoViewer(QMainWindow):
             (t["rotate_all_option"], self.rotate_all, lambda st: self.set_rotate_all(bool(st))),
             (t["show_filename"], self.show_filename, lambda st: self.set_show_filename(bool(st))),
             (t["load_last_folder"], getattr(self, "load_last_folder", False), lambda st: self.set_load_last_folder(bool(st))),
+            (t["include_subfolders"], self.include_subfolders, lambda st: self.set_include_subfolders(bool(st))),
             (t["loop_navigation"], self.loop_navigation, lambda st: self.set_loop_navigation(bool(st))),
             (t["menu_dock_left"], self.menu_dock_left, lambda st: self.toggle_menu_dock(bool(st))),
             #(t["hide_navigation_controls"], self.hide_navigation_controls, lambda st: self.set_hide_navigation_controls(bool(st)))
@@ -2768,33 +3050,23 @@ class PhotoViewer(QMainWindow):
         self.sort_option = option
         self.save_config()
 
-        # 3) Get the full list, sorted
-        sorted_full = self.get_all_images()
-
-        # 4) Re-apply the active filter
-        if active_filter == 'favorites':
-            new_files = [f for f in sorted_full if f in self.favorites]
-        elif active_filter == 'non_favorites':
-            new_files = [f for f in sorted_full if f not in self.favorites]
-        elif active_filter == 'compare':
-            new_files = [f for f in sorted_full if f in self.compare_set]
-        else:
-            new_files = sorted_full
+        # 3) Get the sorted list with the active filter re-applied
+        new_files = self.image_view().filtered(active_filter)
 
-        # 5) Restore index to the same image if possible
+        # 4) Restore index to the same image if possible
         if current_image and current_image in new_files:
             self.current_index = new_files.index(current_image)
         else:
             # If we fell off, go back to 0
             self.current_index = 0
 
-        # 6) Swap in the newly-sorted, re-filtered list
+        # 5) Swap in the newly-sorted, re-filtered list
         self.image_files = new_files
 
-        # 7) Refresh the view, preserving zoom/pan on the same image
+        # 6) Refresh the view, preserving zoom/pan on the same image
         self.show_image(reset_zoom=False, preserve_zoom=True)
 
-        # 8) And now update the floating filter icon/count & position
+        # 7) And now update the floating filter icon/count & position
         self.update_favorite_count()
         self.update_floating_controls()
 
@@ -2811,32 +3083,22 @@ class PhotoViewer(QMainWindow):
         self.sort_ascending = ascending
         self.save_config()
 
-        # 3) Get the full list, sorted
-        sorted_full = self.get_all_images()
+        # 3) Get the sorted list with the active filter re-applied
+        new_files = self.image_view().filtered(active_filter)
 
-        # 4) Re-apply the active filter
-        if active_filter == 'favorites':
-            new_files = [f for f in sorted_full if f in self.favorites]
-        elif active_filter == 'non_favorites':
-            new_files = [f for f in sorted_full if f not in self.favorites]
-        elif active_filter == 'compare':
-            new_files = [f for f in sorted_full if f in self.compare_set]
-        else:
-            new_files = sorted_full
-
-        # 5) Restore index to the same image if possible
+        # 4) Restore index to the same image if possible
         if current_image and current_image in new_files:
             self.current_index = new_files.index(current_image)
         else:
             self.current_index = 0
 
-        # 6) Swap in the newly-sorted, re-filtered list
+        # 5) Swap in the newly-sorted, re-filtered list
         self.image_files = new_files
 
-        # 7) Refresh the view, preserving zoom/pan on the same image
+        # 6) Refresh the view, preserving zoom/pan on the same image
         self.show_image(reset_zoom=False, preserve_zoom=True)
 
-        # 8) And now update the floating filter icon/count & position
+        # 7) And now update the floating filter icon/count & position
         self.update_favorite_count()
         self.update_floating_controls()
 
@@ -3454,80 +3716,313 @@ class PhotoViewer(QMainWindow):
         self.floating_menu.move(menu_x, menu_y)
 
     def _invalidate_directory_cache(self, directory=None):
-        if directory is None:
-            self._directory_cache.clear()
+        """Drop the folder index so the next get_all_images() rescans."""
+        index = self._directory_index
+        if index is None:
             return
+        if directory is None or index.accepts(directory):
+            self._cancel_directory_scan()
+            self._directory_index = None
+            self._directory_index_key = None
+            self.directory_watcher.clear()
+
+    def _library_key(self):
+        """Identifies what the index should cover: its root folders and recursion."""
+        roots = self.library_roots or [self.current_directory]
+        return (tuple(os.path.normcase(os.path.abspath(r)) for r in roots),
+                bool(self.include_subfolders))
+
+    def _new_directory_index(self):
+        """Empty index of the open folder, or of the library when one is open."""
+        if self.library_roots or self.include_subfolders:
+            return LibraryIndex(
+                self.library_roots or [self.current_directory],
+                self.sort_option,
+                self.sort_ascending,
+                recursive=self.include_subfolders,
+                scan=False,
+            )
+        return DirectoryIndex(self.current_directory, self.sort_option, self.sort_ascending,
+                              scan=False)
 
-        norm_dir = os.path.normcase(os.path.abspath(directory))
-        stale_keys = [key for key in self._directory_cache if key[0] == norm_dir]
-        for key in stale_keys:
-            self._directory_cache.pop(key, None)
+    def _start_directory_scan(self, directory, selected_file=None, start_at_first=False,
+                              do_show=True):
+        """
+        Open ``directory`` (or the library) without waiting for it to be
+        listed: the index starts with just the selected file and a
+        DirectoryScanner fills it in from a pool thread.  The image list,
+        counts and position label are updated as batches arrive.  Library
+        scans walk the folders on ``io_threads`` threads and bring each
+        folder's marks along.  With the catalog, the listing stored on the
+        last visit is shown right away and the scan then corrects it.
+        """
+        self._cancel_directory_scan()
+        index = self._new_directory_index()
+        if selected_file:
+            index.add(selected_file)
+        seeded = False
+        if self.catalog is not None:
+            try:
+                records, folders = self.catalog.listing(index.roots, index.recursive)
+                edits = self.catalog.edits(index.roots, index.recursive)
+            except sqlite3.Error as e:
+                print(f"Error reading catalog: {e}")
+            else:
+                seeded = bool(index.merge(records, folders))
+                for path, (angle, factor) in edits.items():
+                    self.image_rotations.setdefault(path, angle)
+                    self.image_brightness.setdefault(path, factor)
+        self._directory_index = index
+        self._directory_index_key = self._library_key()
+        self.directory_watcher.watch(index.roots)
+        self.image_files = self.image_view().filtered("all")
+        self._directory_scan_start = {
+            "selected_file": selected_file,
+            "start_at_first": start_at_first,
+            "do_show": do_show,
+            "first_image": self.image_files[0] if self.image_files else None,
+            "seeded": seeded,
+            # What the scan found, to correct a seeded index and for the catalog
+            "listed": set(),
+            "folders": [],
+        }
+        self._changed_during_scan = []
+
+        is_library = isinstance(index, LibraryIndex)
+        scanner = DirectoryScanner(
+            index.roots,
+            recursive=index.recursive,
+            workers=self.io_threads if is_library else 1,
+            read_marks=is_library,
+            catalog=self.catalog,
+        )
+        scanner.signals.batch.connect(self._on_directory_scan_batch)
+        scanner.signals.finished.connect(self._on_directory_scan_finished)
+        self._directory_scan = scanner
+        QThreadPool.globalInstance().start(scanner)
+
+    def _cancel_directory_scan(self):
+        if self._directory_scan is not None:
+            self._directory_scan.cancel()
+            self._directory_scan = None
+            self._directory_scan_start = None
+
+    def _on_directory_scan_batch(self, scanner, batch):
+        index = self._directory_index
+        if scanner is not self._directory_scan or index is None:
+            return
+        self.directory_watcher.add(batch.folders)
+        start = self._directory_scan_start
+        if self.catalog is not None:
+            start["listed"].update(record[0] for record in batch.records)
+            start["folders"].extend(batch.folders)
+        added = index.merge(batch.records, batch.folders)
+        if scanner.read_marks:
+            self.marks_writer.compact_leftovers(batch.folders, self.sort_by_date)
+        if batch.favorites or batch.compare:
+            self.favorites.load(batch.favorites)
+            self.compare_set.load(batch.compare)
+        elif not added:
+            return
+        self._refresh_image_files()
+        if start["first_image"] is None and self.image_files:
+            # Nothing selected: show the first image found, don't wait for the rest
+            start["first_image"] = self.image_files[0]
+            self.current_index = 0
+            if start["do_show"]:
+                self.show_image()
+        self.update_favorite_count()
+        self.update_floating_controls()
+
+    def _on_directory_scan_finished(self, scanner):
+        if scanner is not self._directory_scan:
+            return
+        start = self._directory_scan_start
+        self._directory_scan = None
+        self._directory_scan_start = None
+        index = self._directory_index
+        if self.catalog is not None and index is not None:
+            if start["seeded"]:
+                # Drop what the stored listing had but the folders no longer do
+                index.retain(start["listed"], start["folders"])
+                self.directory_watcher.watch(index.folders())
+            self.marks_writer.submit(self.catalog.store_listing, start["folders"],
+                                     index.snapshot().records())
+        self._prune_marked_sets(self.get_all_images())
+        self._refresh_image_files()
+
+        # Now that the order is final, go where a synchronous open would
+        # have started, unless the user already moved on.
+        if self.image_files:
+            current_image = None
+            if 0 <= self.current_index < len(self.image_files):
+                current_image = self.image_files[self.current_index]
+            if not start["seeded"] and current_image == start["first_image"]:
+                index = self._starting_image_index(
+                    selected_file=start["selected_file"],
+                    start_at_first=start["start_at_first"],
+                )
+                index = min(max(index, 0), len(self.image_files) - 1)
+                if index != self.current_index:
+                    self.current_index = index
+                    if start["do_show"]:
+                        self.show_image()
+            self.schedule_decoder_benchmark()
+
+        self.save_config()
+        self.update_favorite_count()
+        self.update_floating_controls()
+        changed, self._changed_during_scan = self._changed_during_scan, []
+        for folder in changed:
+            self.on_directory_changed(folder)
+
+    def _refresh_image_files(self):
+        """
+        Rebuild the (filtered) image list from the index, keeping the image
+        on screen and its position label current.
+        """
+        current_image = None
+        if self.image_files and 0 <= self.current_index < len(self.image_files):
+            current_image = self.image_files[self.current_index]
+
+        view = self.image_view()
+        active_filter = getattr(self, "current_filter", "all")
+        new_files = view.filtered(active_filter)
+        if not new_files and active_filter != "all":
+            self.current_filter = "all"
+            new_files = view.filtered("all")
+        self.image_files = new_files
+
+        if current_image in self.image_files:
+            # Same picture stays on screen; only its position may have moved
+            self.current_index = self.image_files.index(current_image)
+            self.update_window_title_and_label(current_image)
+            return current_image
+        return None
+
+    def _update_directory_index(self, added=(), removed=()):
+        """Apply files this app created, overwrote or deleted without a rescan."""
+        index = self._directory_index
+        if index is None:
+            return
+        for path in removed:
+            index.remove(path)
+        for path in added:
+            index.add(path)
 
     def _prune_marked_sets(self, valid_images=None):
-        valid_set = set(valid_images or [])
+        # Look the marks up instead of copying every path into a set
+        valid_images = valid_images if valid_images is not None else ()
+        stale = {p for p in self.favorites | self.compare_set if p not in valid_images}
         previous_favorites = len(self.favorites)
         previous_compare = len(self.compare_set)
-        self.favorites.intersection_update(valid_set)
-        self.compare_set.intersection_update(valid_set)
+        self.favorites.difference_update(stale)
+        self.compare_set.difference_update(stale)
         return (
             len(self.favorites) != previous_favorites
             or len(self.compare_set) != previous_compare
         )
 
-    def get_all_images(self):
+    def _current_directory_index(self):
+        """
+        The index for the open folder or library, sorted as configured.
+        When there is none yet (or it covers other folders) it is never
+        listed here on the GUI thread: a background scan is started and
+        its index, filled in as batches arrive, is returned.
+        """
         if not (self.current_directory and os.path.exists(self.current_directory)):
-            self.norm_to_original = {}
-            return []
-
-        norm_dir = os.path.normcase(os.path.abspath(self.current_directory))
-        cache_key = (norm_dir, self.sort_option, bool(self.sort_ascending))
-        cached = self._directory_cache.get(cache_key)
-        if cached is not None:
-            self.norm_to_original = dict(cached["norm_to_original"])
-            return list(cached["images"])
-
-        entries = []
-        norm_to_original = {}
-
-        with os.scandir(self.current_directory) as scanner:
-            for entry in scanner:
-                if not entry.is_file():
-                    continue
-                if not entry.name.lower().endswith(ALLOWED_EXTENSIONS):
-                    continue
-
-                original_path = os.path.abspath(entry.path)
-                norm_path = os.path.normcase(original_path)
-                norm_to_original[norm_path] = original_path
-
-                if self.sort_option == "file_name":
-                    sort_key = (entry.name.lower(), norm_path)
-                else:
-                    try:
-                        stat_result = entry.stat()
-                    except OSError:
-                        continue
-                    if self.sort_option == "date_modified":
-                        sort_key = (stat_result.st_mtime, norm_path)
-                    elif self.sort_option == "size":
-                        sort_key = (stat_result.st_size, norm_path)
-                    else:
-                        sort_key = (entry.name.lower(), norm_path)
+            return None
 
-                entries.append((sort_key, norm_path))
+        index = self._directory_index
+        if index is None or self._directory_index_key != self._library_key():
+            selected_file = None
+            if self.image_files and 0 <= self.current_index < len(self.image_files):
+                current_image = self.image_files[self.current_index]
+                selected_file = self.norm_to_original.get(current_image, current_image)
+            # Keeps the image on screen where it is once the listing is in
+            self._start_directory_scan(self.current_directory, selected_file=selected_file,
+                                       do_show=False)
+            return self._directory_index
+        index.set_sort(self.sort_option, self.sort_ascending)
+        return index
+
+    def image_view(self):
+        """
+        ImageView over the index's current snapshot, rebuilt only when the
+        index changed since the last call.  Filtered lists come from
+        ``filtered()`` and follow the mark sets without being copied.
+        """
+        index = self._current_directory_index()
+        snapshot = index.snapshot() if index is not None else None
+        view = self._image_view
+        if view is None or self._image_snapshot is not snapshot:
+            if snapshot is None:
+                self.norm_to_original = {}
+                view = ImageView((), self._view_marks)
+            else:
+                # Read-only and shared with the index until it changes
+                self.norm_to_original = snapshot.norm_to_original
+                view = ImageView(snapshot.paths, self._view_marks)
+            self._image_view = view
+            self._image_snapshot = snapshot
+        return view
 
-        entries.sort(key=lambda item: item[0])
-        images = [norm_path for _, norm_path in entries]
+    def get_all_images(self):
+        """The sorted images as a shared, read-only sequence; don't copy it to read it."""
+        return self.image_view().paths
 
-        if not self.sort_ascending:
-            images.reverse()
+    def on_directory_changed(self, directory):
+        """
+        Pick up files added or removed outside the app (tethered camera, sync
+        client) by applying the folder's delta instead of rescanning it.
+        """
+        index = self._directory_index
+        if index is None or not index.accepts(directory):
+            return
+        if self._directory_scan is not None:
+            # Synced once the listing is complete
+            if directory not in self._changed_during_scan:
+                self._changed_during_scan.append(directory)
+            return
+        delta = index.sync(directory)
+        if not delta:
+            return
+        if delta.folders:
+            self.directory_watcher.watch(index.folders())
+            if isinstance(index, LibraryIndex):
+                # Folders copied into the library bring their marks along
+                for folder in delta.folders:
+                    try:
+                        favorites, compare = self.read_folder_marks(folder)
+                    except Exception as e:
+                        print(f"Error loading marked images: {e}")
+                        continue
+                    self.favorites.load(favorites & set(delta.added))
+                    self.compare_set.load(compare & set(delta.added))
+                self.marks_writer.compact_leftovers(delta.folders, self.sort_by_date)
+
+        removed = set(delta.removed)
+        for path in removed:
+            ImageLoaderRunnable.drop_cached_pixmap(path)
+            self.load_scheduler.cancel(path)
+        marks_changed = bool(removed & self.favorites or removed & self.compare_set)
+        self.favorites -= removed
+        self.compare_set -= removed
+        if marks_changed:
+            self.save_marked_images()
 
-        self.norm_to_original = norm_to_original
-        self._directory_cache[cache_key] = {
-            "images": tuple(images),
-            "norm_to_original": dict(norm_to_original),
-        }
-        return list(images)
+        if self._refresh_image_files() is None:
+            if not self.image_files:
+                self.image_viewer.clear()
+                self.current_index = -1
+                self.filename_label.hide()
+                self.setWindowTitle(translations[self.current_language]["photo_viewer_title"])
+            else:
+                self.current_index = min(max(self.current_index, 0), len(self.image_files) - 1)
+                self.show_image(reset_zoom=self.reset_zoom_on_new_image)
+
+        self.update_favorite_count()
+        self.update_floating_controls()
 
 
     def update_scroll_area_margins(self):
@@ -3538,13 +4033,22 @@ class PhotoViewer(QMainWindow):
         else:
             container.layout().setContentsMargins(0, 0, 0, 0)
 
+    def mark_counts(self):
+        """
+        ``(images, favorites, compare)`` counted over the images in the
+        folder, read from the view's bitsets: marks of files that are gone
+        or not listed yet don't count, and nothing is recounted per call.
+        """
+        view = self.image_view()
+        return (
+            len(view),
+            len(view.filtered("favorites")),
+            len(view.filtered("compare")),
+        )
+
     def update_favorite_count(self):
         t = translations[self.current_language]
-        all_images = self.get_all_images()
-        self._prune_marked_sets(all_images)
-        total_images = len(all_images)
-        favorite_count = len(self.favorites)
-        compare_count = len(self.compare_set)
+        total_images, favorite_count, compare_count = self.mark_counts()
         non_favorite_count = total_images - favorite_count
         layout = self.floating_menu.filter_button.layout()
         if layout is None:
@@ -3640,10 +4144,8 @@ class PhotoViewer(QMainWindow):
         layout.setSpacing(5)
 
         # Create filter option buttons
-        all_images_count = len(self.get_all_images())
-        fav_count = len(self.favorites)
+        all_images_count, fav_count, compare_count = self.mark_counts()
         nonfav_count = all_images_count - fav_count
-        compare_count = len(self.compare_set)
 
         btn_all = QPushButton(f"{t['all_images']} ({all_images_count})", container)
         btn_all.clicked.connect(lambda: (self.set_image_view("all"), self.close_filter_overlay()))
@@ -3786,7 +4288,8 @@ class PhotoViewer(QMainWindow):
 
     def set_image_view(self, filter_mode):
         t = translations.get(self.current_language, translations["en"])
-        full_list = self.get_all_images()
+        view = self.image_view()
+        full_list = view.filtered("all")
 
         # 1) Remember what’s currently on-screen
         old_current = None
@@ -3798,7 +4301,7 @@ class PhotoViewer(QMainWindow):
             new_files = full_list
 
         elif filter_mode == "favorites":
-            new_files = [f for f in full_list if f in self.favorites]
+            new_files = view.filtered("favorites")
             if not new_files:
                 self.show_custom_dialog(
                     t["no_favorites_marked"], icon_type="warning", buttons="ok"
@@ -3806,7 +4309,7 @@ class PhotoViewer(QMainWindow):
                 new_files, filter_mode = full_list, "all"
 
         elif filter_mode == "non_favorites":
-            new_files = [f for f in full_list if f not in self.favorites]
+            new_files = view.filtered("non_favorites")
             if not new_files:
                 self.show_custom_dialog(
                     t["no_non_favorites_marked"], icon_type="warning", buttons="ok"
@@ -3814,7 +4317,7 @@ class PhotoViewer(QMainWindow):
                 new_files, filter_mode = full_list, "all"
 
         elif filter_mode == "compare":
-            new_files = [f for f in full_list if f in self.compare_set]
+            new_files = view.filtered("compare")
             if not new_files:
                 self.show_custom_dialog(
                     t["no_compare_marked"], icon_type="warning", buttons="ok"
@@ -3828,23 +4331,9 @@ class PhotoViewer(QMainWindow):
         self.image_files    = new_files
 
         # 3) Compute new index, trying to stay on the same file or its neighbor
-        if old_current in new_files:
-            new_index = new_files.index(old_current)
-        else:
-            new_index = None
-            if old_current in full_list:
-                idx = full_list.index(old_current)
-                for i in range(idx + 1, len(full_list)):
-                    if full_list[i] in new_files:
-                        new_index = new_files.index(full_list[i])
-                        break
-                if new_index is None:
-                    for i in range(idx - 1, -1, -1):
-                        if full_list[i] in new_files:
-                            new_index = new_files.index(full_list[i])
-                            break
-            if new_index is None:
-                new_index = 0
+        new_index = new_files.nearest(old_current) if old_current else None
+        if new_index is None:
+            new_index = 0
 
         self.current_index = new_index
 
@@ -3936,11 +4425,11 @@ class PhotoViewer(QMainWindow):
         self.filename_label.setFixedHeight(50)
         self.filename_label.hide()
         if self.current_directory and os.path.exists(self.current_directory):
-            self.load_directory(self.current_directory)
+            self.load_directory(self.current_directory, library_roots=self.library_roots or None)
         else:
             self.current_directory = None
             self.image_files = []
-            self.favorites = set()
+            self.favorites = MarkSet()
             self.current_index = -1
 
     def toggle_menu(self):
@@ -4151,6 +4640,16 @@ class PhotoViewer(QMainWindow):
                 self.sort_option              = config.get('sort_option', 'file_name')
                 self.sort_ascending           = config.get('sort_ascending', True)
                 self.theme                    = config.get('theme', 'black')
+                self.preview_cache_mb         = config.get('preview_cache_mb', 1024)
+                self.prefetch_ahead           = config.get('prefetch_ahead', 6)
+                self.prefetch_behind          = config.get('prefetch_behind', 2)
+                self.pixmap_cache_mb          = config.get('pixmap_cache_mb', None)
+                self.decoder_preferences      = config.get('decoder_preferences', {})
+                self.io_threads               = config.get('io_threads', 4)
+                self.read_ahead_mb            = config.get('read_ahead_mb', 256)
+                self.include_subfolders       = config.get('include_subfolders', False)
+                self.library_roots            = config.get('library_roots', []) if self.load_last_folder else []
+                self.use_catalog              = config.get('use_catalog', False)
             else:
                 self.load_last_folder         = False
                 self.current_directory        = None
@@ -4165,6 +4664,16 @@ class PhotoViewer(QMainWindow):
                 self.sort_option              = 'file_name'
                 self.sort_ascending           = True
                 self.theme                    = 'black'
+                self.preview_cache_mb         = 1024
+                self.prefetch_ahead           = 6
+                self.prefetch_behind          = 2
+                self.pixmap_cache_mb          = None
+                self.decoder_preferences      = {}
+                self.io_threads               = 4
+                self.read_ahead_mb            = 256
+                self.include_subfolders       = False
+                self.library_roots            = []
+                self.use_catalog              = False
         except Exception as e:
             print(f"Error loading config: {e}")
             self.load_last_folder         = False
@@ -4180,6 +4689,16 @@ class PhotoViewer(QMainWindow):
             self.sort_option              = 'file_name'
             self.sort_ascending           = True
             self.theme                    = 'black'
+            self.preview_cache_mb         = 1024
+            self.prefetch_ahead           = 6
+            self.prefetch_behind          = 2
+            self.pixmap_cache_mb          = None
+            self.decoder_preferences      = {}
+            self.io_threads               = 4
+            self.read_ahead_mb            = 256
+            self.include_subfolders       = False
+            self.library_roots            = []
+            self.use_catalog              = False
 
     def save_config(self):
         try:
@@ -4197,6 +4716,16 @@ class PhotoViewer(QMainWindow):
                 'sort_option':             self.sort_option,
                 'sort_ascending':          self.sort_ascending,
                 'theme':                   self.theme,
+                'preview_cache_mb':        self.preview_cache_mb,
+                'prefetch_ahead':          self.prefetch_ahead,
+                'prefetch_behind':         self.prefetch_behind,
+                'pixmap_cache_mb':         self.pixmap_cache_mb,
+                'decoder_preferences':     self.decoder_preferences,
+                'io_threads':              self.io_threads,
+                'read_ahead_mb':           self.read_ahead_mb,
+                'include_subfolders':      self.include_subfolders,
+                'library_roots':           self.library_roots,
+                'use_catalog':             self.use_catalog,
             }
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=4, ensure_ascii=False)
@@ -4204,49 +4733,54 @@ class PhotoViewer(QMainWindow):
             print(f"Error saving config: {e}")
 
     def save_marked_images(self):
+        """
+        Queue the marks changed since the last save for the background
+        MarksWriter, which journals them per folder (each image's own
+        folder in a library) and compacts Favorites.json from time to time.
+        """
         if not self.current_directory:
             return
-        favorites_list = []
-        for fav_path in self.favorites:
-            norm_path = os.path.normcase(os.path.abspath(fav_path))
-            if os.path.exists(norm_path):
-                favorites_list.append({
-                    'filename': os.path.basename(norm_path),
-                    'full_path': norm_path,
-                    'modification_date': os.path.getmtime(norm_path),
-                    'starred_at': None
-                })
-        compare_list = []
-        for cmp_path in self.compare_set:
-            norm_path = os.path.normcase(os.path.abspath(cmp_path))
-            if os.path.exists(norm_path):
-                compare_list.append({
-                    'filename': os.path.basename(norm_path),
-                    'full_path': norm_path,
-                    'modification_date': os.path.getmtime(norm_path),
-                    'starred_at': None
-                })
-        if self.sort_by_date:
-            favorites_list.sort(key=lambda x: x['modification_date'])
-            compare_list.sort(key=lambda x: x['modification_date'])
-        else:
-            favorites_list.sort(key=lambda x: x['filename'])
-            compare_list.sort(key=lambda x: x['filename'])
-        data = {
-            'directory': self.current_directory,
-            'favorites': favorites_list,
-            'compare': compare_list
-        }
-        json_path = os.path.join(self.current_directory, 'Favorites.json')
-        try:
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            self.show_custom_dialog(
-                f"{translations[self.current_language]['error_loading_image']}\n{str(e)}",
-                icon_type="error",
-                buttons="ok"
-            )
+        changes = {}
+        for mark, marks in (("favorites", self.favorites), ("compare", self.compare_set)):
+            for path, value in marks.take_changes():
+                changes.setdefault(os.path.dirname(path), []).append((mark, path, value))
+        for folder_changes in changes.values():
+            path = folder_changes[0][1]
+            directory = os.path.dirname(self.norm_to_original.get(path, path))
+            self.marks_writer.append(directory, folder_changes)
+
+    def close_marked_images(self, wait=False):
+        """
+        Write out pending marks and compact the folders they went to; with
+        the catalog, also store the unsaved edits of the folder's images.
+        """
+        self.save_marked_images()
+        self.marks_writer.flush(compact=True)
+        index = self._directory_index
+        if self.catalog is not None and index is not None:
+            self.marks_writer.submit(self.catalog.store_edits, index.folders(),
+                                     dict(self.image_rotations), dict(self.image_brightness))
+        if wait:
+            self.marks_writer.wait()
+
+    def _marks_snapshot(self, directory):
+        """The marks of one folder, as MarksWriter needs them for a compaction."""
+        norm_dir = os.path.normcase(os.path.abspath(directory))
+        favorites = {p for p in self.favorites if os.path.dirname(p) == norm_dir}
+        compare = {p for p in self.compare_set if os.path.dirname(p) == norm_dir}
+        records = {}
+        index = self._directory_index
+        if index is not None:
+            index_records = index.records()
+            records = {p: index_records[p] for p in favorites | compare if p in index_records}
+        return favorites, compare, self.sort_by_date, records
+
+    def _on_marks_write_failed(self, message):
+        self.show_custom_dialog(
+            f"{translations[self.current_language]['error_loading_image']}\n{message}",
+            icon_type="error",
+            buttons="ok"
+        )
 
     def setup_shortcuts(self):
         QShortcut(QKeySequence(Qt.Key.Key_Left), self, self.show_previous_image)
@@ -4365,17 +4899,31 @@ class PhotoViewer(QMainWindow):
         self.load_last_folder = value
         self.save_config()
 
+    def set_include_subfolders(self, value: bool):
+        """Switch between the folder's own images and its whole tree, staying on the current image."""
+        if value == self.include_subfolders:
+            return
+        self.include_subfolders = value
+        self.save_config()
+        if not self.current_directory:
+            return
+        selected_file = None
+        if self.image_files and 0 <= self.current_index < len(self.image_files):
+            current_image = self.image_files[self.current_index]
+            selected_file = self.norm_to_original.get(current_image, current_image)
+        self.load_directory(
+            self.current_directory,
+            selected_file=selected_file,
+            library_roots=self.library_roots or None,
+        )
+
     def _starting_image_index(self, selected_file=None, start_at_first=False):
         norm_selected = (
             os.path.normcase(os.path.normpath(selected_file))
             if selected_file else None
         )
-        norm_images = [
-            os.path.normcase(os.path.normpath(path))
-            for path in self.image_files
-        ]
-        if norm_selected and norm_selected in norm_images:
-            return norm_images.index(norm_selected)
+        if norm_selected and norm_selected in self.image_files:
+            return self.image_files.index(norm_selected)
         if start_at_first:
             return 0
         return getattr(self, "last_index", 0)
@@ -4386,12 +4934,18 @@ class PhotoViewer(QMainWindow):
         selected_file=None,
         do_show=True,
         start_at_first=False,
+        library_roots=None,
     ):
+        """
+        Open ``directory``, or with ``library_roots`` several folders as one
+        library (``directory`` is then the first of them).  With "include
+        subfolders" on, everything below the folders is included too.
+        """
         # ——— Clear all per-image history when loading a new folder ———
         self._history.clear()
         self._modified.clear()
         self._current_path = None
-        self._preload_inflight.clear()
+        self.load_scheduler.retain(())
         # ————————————————————————————————————————————————————————
 
         # Unsaved‐crop check (unchanged)
@@ -4400,12 +4954,21 @@ class PhotoViewer(QMainWindow):
                 return
             self.unsaved_crop = None
 
+        # Marks of the folder being left are written out before they're replaced
+        self.close_marked_images()
+
+        if library_roots:
+            roots = [r for r in library_roots if os.path.isdir(r)]
+            library_roots = unique_roots(roots, self.include_subfolders) if roots else []
+            directory = library_roots[0] if library_roots else None
+        self.library_roots = list(library_roots or []) if len(library_roots or []) > 1 else []
+
         # If no valid directory, reset state
         if not directory or not os.path.exists(directory):
             self.current_directory = None
             self.image_files = []
-            self.favorites = set()
-            self.compare_set = set()
+            self.favorites = MarkSet()
+            self.compare_set = MarkSet()
             self.norm_to_original = {}
             self._invalidate_directory_cache()
             self.current_index = -1
@@ -4422,18 +4985,25 @@ class PhotoViewer(QMainWindow):
         self.current_filter = "all"
         self.show_all_images = True
 
-        # Reload image list
-        self.image_files = self.get_all_images()
-        self.favorites = set()
-        self.load_marked_images()
-        self._prune_marked_sets(self.image_files)
-
-        # Choose starting index
+        # List the folder in the background; the selected image (if any)
+        # is shown straight away and the rest streams in.
+        self._start_directory_scan(
+            directory,
+            selected_file=selected_file,
+            start_at_first=start_at_first,
+            do_show=do_show,
+        )
+        self.load_marked_images(prune=False)
         if self.image_files:
-            self.current_index = self._starting_image_index(
-                selected_file=selected_file,
-                start_at_first=start_at_first,
-            )
+            start = self._directory_scan_start
+            if start["seeded"]:
+                # The stored listing is already in order: start where a
+                # synchronous open would, the scan won't move us again
+                index = self._starting_image_index(selected_file, start_at_first)
+                self.current_index = min(max(index, 0), len(self.image_files) - 1)
+                start["first_image"] = self.image_files[self.current_index]
+            else:
+                self.current_index = 0
             if do_show:
                 self.show_image()
 
@@ -4477,42 +5047,69 @@ class PhotoViewer(QMainWindow):
         # ——— Phase 1: mark loading so star updates are skipped ———
         self.image_loading = True
 
-        # ——— Phase 2: preload neighbors into cache ———
-        from PyQt6.QtCore import QThreadPool
-        for neighbor_index in (self.current_index - 1, self.current_index + 1):
-            if 0 <= neighbor_index < len(self.image_files):
-                neighbor_path = self.image_files[neighbor_index]
-                if ImageLoaderRunnable.get_cached_pixmap(neighbor_path) is not None:
-                    continue
-                if neighbor_path in self._preload_inflight:
-                    continue
-                loader = ImageLoaderRunnable(neighbor_path)
-                self._preload_inflight.add(neighbor_path)
-                loader.signals.finished.connect(
-                    lambda _pix, path=neighbor_path: self._preload_inflight.discard(path)
-                )
-                loader.signals.error.connect(
-                    lambda _err, path=neighbor_path: self._preload_inflight.discard(path)
-                )
-                QThreadPool.globalInstance().start(loader)
-
-        # ——— Phase 3: display current image (cache-first) ———
-        viewer = self.image_viewer
-        pix = ImageLoaderRunnable.get_cached_pixmap(path)
-        if pix is not None:
-            # immediate show from cache
-            viewer.load_counter = getattr(viewer, "load_counter", 0) + 1
-            viewer.current_load_id = viewer.load_counter
-            viewer.onImageLoaded(pix, reset_zoom, preserve_zoom, viewer.current_load_id)
-        else:
-            # fallback to threaded load
-            viewer.setImage(path, reset_zoom, preserve_zoom)
+        # ——— Phase 2: preload the prefetch window into cache ———
+        # The next image in the direction of travel goes first; everything
+        # queued for images outside the window is dropped.
+        target_size = self.image_viewer.displayTargetSize()
+        window = self.prefetch.window(
+            self.current_index,
+            len(self.image_files),
+            loop=self.loop_navigation,
+            max_entries=ImageLoaderRunnable.cache_capacity(target_size),
+        )
+        self._prefetch_window = [self.image_files[i] for i in window]
+        keys = [ImageLoaderRunnable.normalize_path(p) for p in self._prefetch_window]
+        self.load_scheduler.retain([ImageLoaderRunnable.normalize_path(path)] + keys)
+        for rank, neighbor_path in enumerate(self._prefetch_window):
+            priority = PRIORITY_NEXT if rank == 0 else PRIORITY_WARMUP
+            if ImageLoaderRunnable.is_cached(neighbor_path):
+                continue
+            if self.load_scheduler.is_scheduled(keys[rank]):
+                self.load_scheduler.reprioritize(keys[rank], priority)
+                continue
+            self.load_scheduler.load_image(neighbor_path, target_size, priority)
+
+        # ——— Phase 3: display current image (setImage is cache-first) ———
+        self.image_viewer.setImage(path, reset_zoom, preserve_zoom)
 
         # ——— Phase 4: refresh controls ———
         self.update_floating_controls()
 
 
 
+    def schedule_decoder_benchmark(self):
+        """
+        Time the decoder backends on one image per format in this folder that
+        has not been measured yet; the winners are kept in the config.
+        """
+        if self._decoder_benchmark is not None:
+            return
+        registry = default_registry()
+        known = registry.preferences()
+        target_size = self.image_viewer.displayTargetSize()
+        samples = {}
+        for image_path in self.image_files:
+            ext = os.path.splitext(image_path)[1].lower()
+            if ext in samples:
+                continue
+            keys = {registry.preference_key(ext, target_size), registry.preference_key(ext)}
+            if not keys <= known.keys():
+                samples[ext] = image_path
+        if not samples:
+            return
+        self._decoder_benchmark = DecoderBenchmark(samples.values(), target_size)
+        self._decoder_benchmark.signals.finished.connect(self._on_decoder_benchmark_finished)
+        QThreadPool.globalInstance().start(self._decoder_benchmark)
+
+    def _on_decoder_benchmark_finished(self, preferences):
+        self._decoder_benchmark = None
+        self.decoder_preferences = preferences
+        self.save_config()
+
+    def warm_images(self):
+        """Images in the current prefetch window that are already decoded."""
+        return [p for p in self._prefetch_window if ImageLoaderRunnable.is_cached(p)]
+
     def update_window_title_and_label(self, image_path):
         t = translations[self.current_language]
         original_path = self.norm_to_original.get(image_path, image_path)
@@ -4541,6 +5138,7 @@ class PhotoViewer(QMainWindow):
         self.previous_image = self.image_files[self.current_index]
         if self.current_index == len(self.image_files) - 1 and not self.loop_navigation:
             return
+        self.prefetch.record_step(1)
         if self.current_index < len(self.image_files) - 1:
             self.current_index += 1
         elif self.loop_navigation:
@@ -4559,6 +5157,7 @@ class PhotoViewer(QMainWindow):
         self.previous_image = self.image_files[self.current_index]
         if self.current_index == 0 and not self.loop_navigation:
             return
+        self.prefetch.record_step(-1)
         if self.current_index > 0:
             self.current_index -= 1
         elif self.loop_navigation:
@@ -4576,13 +5175,9 @@ class PhotoViewer(QMainWindow):
 
         current_image = self.image_files[self.current_index]
 
-        # 3) Toggle in your set
-        if current_image in self.favorites:
-            self.favorites.remove(current_image)
-            toggled_off = True
-        else:
-            self.favorites.add(current_image)
-            toggled_off = False
+        # 3) Toggle in your set (and in the view's favorites bitset)
+        toggled_off = current_image in self.favorites
+        self.image_view().mark("favorites", current_image, not toggled_off)
 
         self.save_marked_images()
         self.update_favorite_count()
@@ -4591,7 +5186,7 @@ class PhotoViewer(QMainWindow):
         if self.current_filter == "favorites":
             if toggled_off:
                 # rebuild the favorites list
-                new_filtered = [img for img in self.get_all_images() if img in self.favorites]
+                new_filtered = self.image_view().filtered("favorites")
                 if not new_filtered:
                     self.set_image_view("all")
                 else:
@@ -4612,8 +5207,7 @@ class PhotoViewer(QMainWindow):
             if not toggled_off:
                 # moved out of non-favs
                 old_index = self.current_index
-                full_list = self.get_all_images()
-                non_favs  = [img for img in full_list if img not in self.favorites]
+                non_favs  = self.image_view().filtered("non_favorites")
 
                 if non_favs:
                     if self.loop_navigation:
@@ -4674,30 +5268,34 @@ class PhotoViewer(QMainWindow):
         self.show_ephemeral_message(t["favorites_cleared"])
 
 
-    def load_marked_images(self):
-        self.favorites = set()
-        self.compare_set = set()
+    def load_marked_images(self, prune=True):
+        """
+        Read Favorites.json of the open folder, or of every folder of the
+        library.  With ``prune=False`` entries are kept even if the folder
+        listing doesn't have them (yet); used while it streams in.
+        """
+        self.favorites = MarkSet()
+        self.compare_set = MarkSet()
         if not self.current_directory:
             return
-        valid_images = set(self.image_files)
-        json_path = os.path.join(self.current_directory, 'Favorites.json')
-        if os.path.exists(json_path):
+        index = self._directory_index
+        if isinstance(index, LibraryIndex):
+            folders = index.folders()
+        else:
+            folders = [self.current_directory]
+        for folder in folders:
             try:
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                if data.get('directory') == self.current_directory:
-                    self.favorites = {
-                        os.path.normcase(os.path.abspath(item['full_path']))
-                        for item in data.get('favorites', [])
-                        if os.path.normcase(os.path.abspath(item['full_path'])) in valid_images
-                    }
-                    self.compare_set = {
-                        os.path.normcase(os.path.abspath(item['full_path']))
-                        for item in data.get('compare', [])
-                        if os.path.normcase(os.path.abspath(item['full_path'])) in valid_images
-                    }
+                favorites, compare = self.read_folder_marks(folder)
             except Exception as e:
                 print(f"Error loading marked images: {e}")
+                continue
+            self.favorites.load(favorites)
+            self.compare_set.load(compare)
+        self.marks_writer.compact_leftovers(folders, self.sort_by_date)
+        if prune:
+            valid_images = set(self.image_files)
+            self.favorites &= valid_images
+            self.compare_set &= valid_images
 
     def get_display_filename(self):
         current_image = self.image_files[self.current_index]
@@ -4723,11 +5321,7 @@ class PhotoViewer(QMainWindow):
         current_image = self.image_files[self.current_index]
 
         # Also determine where this image sits in the full list BEFORE deletion.
-        full_list_before = self.get_all_images()
-        try:
-            old_full_index = full_list_before.index(current_image)
-        except ValueError:
-            old_full_index = 0
+        old_full_index = self.image_view().position(current_image) or 0
 
         if not os.path.exists(current_image):
             self.show_custom_dialog(
@@ -4749,11 +5343,11 @@ class PhotoViewer(QMainWindow):
             # 1) Move to trash
             send2trash.send2trash(os.path.abspath(current_image))
             ImageLoaderRunnable.drop_cached_pixmap(current_image)
-            self._preload_inflight.discard(current_image)
-            self._invalidate_directory_cache(self.current_directory)
+            self.load_scheduler.cancel(ImageLoaderRunnable.normalize_path(current_image))
+            self._update_directory_index(removed=[current_image])
 
-            # 2) Remove from the filtered list in memory
-            self.image_files.pop(self.current_index)
+            # 2) Re-filter the updated index, which no longer has the file
+            self.image_files = self.image_view().filtered(self.current_filter)
 
             # 3) If it was a favorite, drop it
             if current_image in self.favorites:
@@ -4769,7 +5363,7 @@ class PhotoViewer(QMainWindow):
             # 6) Decide next image to show
             if not self.image_files:
                 # Fell out of the filtered list; reset to “all” mode
-                full_list_after = self.get_all_images()
+                full_list_after = self.image_view().filtered("all")
                 self.current_filter = "all"
                 self.image_files = full_list_after
                 if full_list_after:
@@ -5093,8 +5687,9 @@ class PhotoViewer(QMainWindow):
         slider.setValue(int((1.0 - gamma_now) * 200))
 
         # 8) Capture the initial state for undo (but do NOT push yet)
+        self.image_viewer.ensureFullResolution()
         self._brightness_initial_state = {
-            "pixmap":          self.image_viewer.original_pixmap.copy(),
+            "pixmap":          self.image_viewer.original_pixmap,
             "rotation":        self.image_viewer.rotation_angle,
             "brightness":      self.image_viewer.brightness_factor,
             "image_modified":  self.image_modified,
@@ -5496,10 +6091,10 @@ class PhotoViewer(QMainWindow):
         current_image = self.image_files[self.current_index]
         t = translations.get(self.current_language, translations["en"])
         if current_image in self.compare_set:
-            self.compare_set.remove(current_image)
+            self.image_view().mark("compare", current_image, False)
             self.show_ephemeral_message(t["compare_removed"].format(count=len(self.compare_set)))
             if getattr(self, "current_filter", "all") == "compare":
-                new_filtered = sorted(list(self.compare_set))
+                new_filtered = self.image_view().filtered("compare")
                 if not new_filtered:
                     self.set_image_view("all")
                     self.save_marked_images()  # Save changes before returning
@@ -5516,7 +6111,7 @@ class PhotoViewer(QMainWindow):
                     self.save_marked_images()  # Save changes before returning
                     return
         else:
-            self.compare_set.add(current_image)
+            self.image_view().mark("compare", current_image, True)
             self.show_ephemeral_message(t["compare_added"].format(count=len(self.compare_set)))
         self.save_marked_images()
         self.update_favorite_count()
@@ -5587,6 +6182,9 @@ class PhotoViewer(QMainWindow):
 
     def closeEvent(self, event):
         self.save_config()
+        self.close_marked_images(wait=True)
+        if self.catalog is not None:
+            self.catalog.close()
         super().closeEvent(event)
 
     def get_unique_copy_filename(self, folder, base_name, ext):
@@ -5617,8 +6215,13 @@ class PhotoViewer(QMainWindow):
         orig_filename = os.path.basename(orig_path)
         folder = os.path.dirname(orig_path)
 
+        # Never write the screen-sized preview back to disk
+        if not self.image_viewer.ensureFullResolution():
+            self.show_custom_dialog("Failed to save image", icon_type="error", buttons="ok")
+            return
+
         # Grab the current QPixmap from the viewer (what the user sees right now)
-        modified = self.image_viewer.pixmap_item.pixmap()
+        modified = self.image_viewer.displayedPixmap()
         if modified.isNull():
             # Nothing to save
             return
@@ -5648,32 +6251,22 @@ class PhotoViewer(QMainWindow):
             self.show_custom_dialog("Failed to save image", icon_type="error", buttons="ok")
             return
 
-        self._invalidate_directory_cache(folder)
+        # Inserts a new copy, or re-sorts an overwritten file by its new date/size
+        self._update_directory_index(added=[save_path])
 
         # 4) Post‐save logic: two separate branches
         if not overwrite:
             # — “Save a Copy” branch — register the new file and display it —
-            # 4a) Register the new file so get_all_images() will include it
-            new_abs = os.path.abspath(save_path)
-            norm_new = os.path.normcase(new_abs)
-            self.norm_to_original[norm_new] = new_abs
+            # 4a) The index registered the new file above; the next snapshot has it
+            norm_new = os.path.normcase(os.path.abspath(save_path))
 
             # 4a') Retain favorite on the copy: if the original was a favorite, the copy is too
             if norm_path in self.favorites:
                 self.favorites.add(norm_new)
 
             # 4b) Rebuild the list of images respecting the current filter (don't break favorites/compare view)
-            full_list = self.get_all_images()
             active_filter = getattr(self, "current_filter", "all")
-            if active_filter == "favorites":
-                new_files = [f for f in full_list if f in self.favorites]
-            elif active_filter == "non_favorites":
-                new_files = [f for f in full_list if f not in self.favorites]
-            elif active_filter == "compare":
-                new_files = [f for f in full_list if f in self.compare_set]
-            else:
-                new_files = full_list
-            self.image_files = new_files
+            self.image_files = self.image_view().filtered(active_filter)
 
             # 4c) Jump to the new copy in the (filtered) list; if not in list, show first
             if norm_new in self.image_files:
@@ -5748,8 +6341,7 @@ class PhotoViewer(QMainWindow):
             self.context_menu_overlay.close()
         
         t = translations[self.current_language]
-        all_images = self.get_all_images()
-        non_favorites = [img for img in all_images if img not in self.favorites]
+        non_favorites = list(self.image_view().filtered("non_favorites"))
         if not non_favorites:
             self.show_custom_dialog(t["no_non_favorites_marked"], icon_type="warning", buttons="ok")
             return
@@ -5792,14 +6384,15 @@ class PhotoViewer(QMainWindow):
             self.delete_thread.wait()
             self.delete_thread = None
             self.delete_worker = None
-            for deleted_image in non_favorites:
-                if not os.path.exists(deleted_image):
-                    ImageLoaderRunnable.drop_cached_pixmap(deleted_image)
-                    self._preload_inflight.discard(deleted_image)
-            self._invalidate_directory_cache(self.current_directory)
+            deleted = [img for img in non_favorites if not os.path.exists(img)]
+            for deleted_image in deleted:
+                ImageLoaderRunnable.drop_cached_pixmap(deleted_image)
+                self.load_scheduler.cancel(ImageLoaderRunnable.normalize_path(deleted_image))
+            self._update_directory_index(removed=deleted)
+            self.compare_set.difference_update(deleted)
 
-            # Remove deleted files from the current list
-            self.image_files = [img for img in self.image_files if os.path.exists(img)]
+            # Re-filter the index, which no longer has the deleted files
+            self.image_files = self.image_view().filtered(getattr(self, "current_filter", "all"))
 
             if not self.image_files:
                 self.image_viewer.clear()
@@ -5832,6 +6425,9 @@ class PhotoViewer(QMainWindow):
         self.delete_thread.start()
 
     def open_crop_overlay(self):
+        # Crop at full resolution, not on the screen-sized preview.
+        self.image_viewer.ensureFullResolution()
+
         # Retrieve the pristine (original) pixmap.
         current_pixmap = self.image_viewer.original_pixmap
         if current_pixmap is None or current_pixmap.isNull():
@@ -5944,11 +6540,14 @@ class PhotoViewer(QMainWindow):
 
         hist = self._history[path]
 
+        # Edits always start from the full-resolution frame
+        self.image_viewer.ensureFullResolution()
+
         before = len(hist["undo"])
 
         # ==== BEGIN ORIGINAL push_undo_state BODY ====
         state = {
-            "pixmap":          self.image_viewer.original_pixmap.copy(),
+            "pixmap":          self.image_viewer.original_pixmap,
             "rotation":        self.image_viewer.rotation_angle,
             "brightness":      self.image_viewer.brightness_factor,
             "image_modified":  self.image_modified,
@@ -5978,7 +6577,7 @@ class PhotoViewer(QMainWindow):
 
         # 2) Push current into redo
         curr = {
-            "pixmap":          self.image_viewer.original_pixmap.copy(),
+            "pixmap":          self.image_viewer.original_pixmap,
             "rotation":        self.image_viewer.rotation_angle,
             "brightness":      self.image_viewer.brightness_factor,
             "image_modified":  self.image_modified,
@@ -6044,7 +6643,7 @@ class PhotoViewer(QMainWindow):
 
         # 2) Push current into undo
         curr = {
-            "pixmap":          self.image_viewer.original_pixmap.copy(),
+            "pixmap":          self.image_viewer.original_pixmap,
             "rotation":        self.image_viewer.rotation_angle,
             "brightness":      self.image_viewer.brightness_factor,
             "image_modified":  self.image_modified,
@@ -6224,7 +6823,8 @@ class PhotoViewer(QMainWindow):
         if hasattr(self, "_sharpness_undo_pushed"):
             del self._sharpness_undo_pushed
 
-        # Grab the current pixmap
+        # Grab the current pixmap (full resolution, not the preview)
+        self.image_viewer.ensureFullResolution()
         orig = self.image_viewer.original_pixmap
 
         # Create & show the overlay
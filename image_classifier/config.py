@@ -15,6 +15,16 @@ def get_config_dir() -> str:
     return path
 
 
+def get_preview_cache_dir() -> str:
+    """Directory for the persistent screen-sized preview cache."""
+    return os.path.join(get_config_dir(), "preview_cache")
+
+
+def get_catalog_file() -> str:
+    """Full path to the optional SQLite catalog (see ``use_catalog``)."""
+    return os.path.join(get_config_dir(), "catalog.sqlite3")
+
+
 def get_config_file() -> str:
     """Full path to viewer_config.json."""
     return os.path.join(get_config_dir(), "viewer_config.json")
@@ -34,4 +44,14 @@ DEFAULT_CONFIG = {
     "sort_option": "file_name",
     "sort_ascending": True,
     "theme": "black",
+    "preview_cache_mb": 1024,
+    "prefetch_ahead": 6,
+    "prefetch_behind": 2,
+    "pixmap_cache_mb": None,
+    "decoder_preferences": {},
+    "io_threads": 4,
+    "read_ahead_mb": 256,
+    "include_subfolders": False,
+    "library_roots": [],
+    "use_catalog": False,
 }
@@ -177,6 +177,7 @@ translations = {
         "shortcut_dock_key": "D",
         "shortcut_dock_desc": "Enable/Disable menu dock on the left.",
         "load_last_folder": "Load last folder on startup",
+        "include_subfolders": "Include subfolders",
         "menu_dock_left": "Dock menu to the left",
         "export_progress_title": "Export Progress",
         "export_progress_message": "Exporting favorites...",
@@ -489,6 +490,7 @@ translations = {
         "shortcut_export_key": "E",
         "shortcut_export_desc": "Abre el diálogo para exportar Favoritas ⭐.",
         "load_last_folder": "Cargar última carpeta al iniciar",
+        "include_subfolders": "Incluir subcarpetas",
         "menu_dock_left": "Anclar menú a la izquierda",
         "shortcut_toggle_menu_key": "M",
         "shortcut_toggle_menu_desc": "Mostrar/Ocultar el menú.",
@@ -1,4 +1,54 @@
-from image_classifier.imaging.sharpen import sharpen_cv2
-from image_classifier.imaging.loader import ImageLoaderRunnable, WorkerSignals, save_pixmap
+from image_classifier.imaging.sharpen import SharpenSession, sharpen_cv2, sharpen_image, sharpen_tiled
+from image_classifier.imaging.brightness import apply_brightness
+from image_classifier.imaging.gl_brightness import GLBrightness, view_matrix
+from image_classifier.imaging.gl_sharpen import GLSharpener
+from image_classifier.imaging.gl_common import GPULimitError, gl_errors
+from image_classifier.imaging.decoders import (
+    DecoderBackend,
+    DecoderRegistry,
+    decode_image,
+    default_registry,
+    fit_size,
+)
+from image_classifier.imaging.loader import (
+    ImageLoaderRunnable,
+    WorkerSignals,
+    save_pixmap,
+)
+from image_classifier.imaging.preview_cache import PreviewDiskCache
+from image_classifier.imaging.prefetch import PrefetchPlanner
+from image_classifier.imaging.scheduler import (
+    LoadFuture,
+    LoadScheduler,
+    PRIORITY_NEXT,
+    PRIORITY_VISIBLE,
+    PRIORITY_WARMUP,
+)
 
-__all__ = ["sharpen_cv2", "ImageLoaderRunnable", "WorkerSignals", "save_pixmap"]
+__all__ = [
+    "SharpenSession",
+    "sharpen_cv2",
+    "sharpen_image",
+    "sharpen_tiled",
+    "GLSharpener",
+    "GLBrightness",
+    "GPULimitError",
+    "gl_errors",
+    "apply_brightness",
+    "view_matrix",
+    "DecoderBackend",
+    "DecoderRegistry",
+    "default_registry",
+    "ImageLoaderRunnable",
+    "WorkerSignals",
+    "decode_image",
+    "fit_size",
+    "save_pixmap",
+    "PreviewDiskCache",
+    "PrefetchPlanner",
+    "LoadFuture",
+    "LoadScheduler",
+    "PRIORITY_VISIBLE",
+    "PRIORITY_NEXT",
+    "PRIORITY_WARMUP",
+]
@@ -0,0 +1,20 @@
+"""Gamma brightness on the CPU, for viewports without OpenGL."""
+import cv2
+import numpy as np
+from PyQt6.QtGui import QImage
+
+from image_classifier.imaging.sharpen import _rgba_array
+
+
+def brightness_lut(factor: float):
+    """Lookup table raising each 0..1 channel value to ``factor``, as the shader does."""
+    levels = np.arange(256, dtype=np.float64) / 255.0
+    return np.rint(np.power(levels, factor) * 255.0).astype(np.uint8)
+
+
+def apply_brightness(image: QImage, factor: float) -> QImage:
+    """``image`` as RGBA8888 with R, G and B raised to ``factor``; alpha is kept."""
+    lut = brightness_lut(factor)
+    result, arr = _rgba_array(image)
+    arr[..., :3] = cv2.LUT(np.ascontiguousarray(arr[..., :3]), lut)
+    return result
@@ -0,0 +1,366 @@
+"""Decoder backends and per-format backend selection."""
+import io
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import pillow_heif
+from PIL import Image
+from pillow_heif import register_heif_opener
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QSize, Qt
+from PyQt6.QtGui import QImage, QImageIOHandler, QImageReader
+
+register_heif_opener()
+
+# EXIF orientations that swap width and height when applied.
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# Pillow transpose that brings each EXIF orientation upright (1 needs none).
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Pillow modes QImage can wrap as-is: (format, bytes per pixel).
+_QIMAGE_FORMATS = {
+    "RGB": (QImage.Format.Format_RGB888, 3),
+    "RGBA": (QImage.Format.Format_RGBA8888, 4),
+    "L": (QImage.Format.Format_Grayscale8, 1),
+}
+
+
+# (factor, imdecode flag), largest reduction first.
+_OPENCV_REDUCED = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def fit_size(source: QSize, bounds: QSize) -> QSize:
+    """Largest size with the aspect ratio of ``source`` inside ``bounds`` (never upscales)."""
+    if source.isEmpty() or bounds.isEmpty():
+        return QSize(source)
+    if source.width() <= bounds.width() and source.height() <= bounds.height():
+        return QSize(source)
+    return source.scaled(bounds, Qt.AspectRatioMode.KeepAspectRatio)
+
+
+def _image_reader(image_path: str, data: bytes | None = None):
+    """
+    QImageReader over the file, or over ``data`` (the file's bytes) when the
+    read stage already pulled it into memory.  Returns ``(reader, device)``;
+    keep the device alive while reading.
+    """
+    if data is None:
+        return QImageReader(image_path), None
+    device = QBuffer()
+    device.setData(data)
+    device.open(QIODevice.OpenModeFlag.ReadOnly)
+    ext = os.path.splitext(image_path)[1].lstrip(".").lower()
+    return QImageReader(device, QByteArray(ext.encode())), device
+
+
+def _decode_with_qt(image_path: str, target_size: QSize | None = None, data: bytes | None = None):
+    """Decode via QImageReader; returns ``(image, full_resolution)``."""
+    reader, _device = _image_reader(image_path, data)
+    reader.setAutoTransform(True)
+    reader.setAllocationLimit(512 * 1024 * 1024)
+
+    full_resolution = True
+    if target_size is not None:
+        source = reader.size()
+        bounds = QSize(target_size)
+        if reader.transformation() & QImageIOHandler.Transformation.TransformationRotate90:
+            bounds.transpose()
+        scaled = fit_size(source, bounds)
+        if source.isValid() and scaled != source:
+            reader.setScaledSize(scaled)
+            full_resolution = False
+
+    return reader.read(), full_resolution
+
+
+def _decode_with_pillow(image_path: str, target_size: QSize | None = None, data: bytes | None = None):
+    """Decode via Pillow; returns ``(image, full_resolution)``."""
+    with Image.open(io.BytesIO(data) if data is not None else image_path) as pil_image:
+        source_size = pil_image.size
+        orientation = pil_image.getexif().get(0x0112, 1)
+        if target_size is not None:
+            bounds = (target_size.width(), target_size.height())
+            if orientation in _TRANSPOSED_ORIENTATIONS:
+                bounds = bounds[::-1]
+            # JPEG can decode at 1/2, 1/4 or 1/8 scale directly from the DCT.
+            pil_image.draft("RGB", bounds)
+            pil_image.thumbnail(bounds, Image.Resampling.BILINEAR)
+        full_resolution = pil_image.size == source_size
+        return _pillow_to_qimage(pil_image, orientation), full_resolution
+
+
+def _pillow_to_qimage(pil_image: Image.Image, orientation: int = 1) -> QImage:
+    """
+    Wrap a Pillow image in a QImage with as few full-frame passes as possible.
+
+    Upright images skip ``exif_transpose`` (which copies even when there is
+    nothing to do), RGB/RGBA/L keep their own layout instead of being widened
+    to RGBA, and the QImage borrows the ``tobytes()`` buffer rather than
+    copying it: PyQt keeps that buffer referenced for the QImage's lifetime.
+    Call ``.copy()`` on the result before sharing it beyond that object.
+    """
+    method = _ORIENTATION_TRANSPOSE.get(orientation)
+    if method is not None:
+        pil_image = pil_image.transpose(method)
+
+    if pil_image.mode not in _QIMAGE_FORMATS:
+        has_alpha = pil_image.mode in ("LA", "PA", "RGBa", "La") or "transparency" in pil_image.info
+        pil_image = pil_image.convert("RGBA" if has_alpha else "RGB")
+    fmt, channels = _QIMAGE_FORMATS[pil_image.mode]
+    data = pil_image.tobytes()
+    return QImage(
+        data,
+        pil_image.width,
+        pil_image.height,
+        pil_image.width * channels,
+        fmt,
+    )
+
+
+def _read_with_pillow(image_path: str, target_size: QSize | None = None) -> QImage:
+    """Read formats unavailable to Qt, including HEIC/HEIF."""
+    return _decode_with_pillow(image_path, target_size)[0]
+
+
+def _decode_with_opencv(image_path: str, target_size: QSize | None = None, data: bytes | None = None):
+    """
+    Decode via ``cv2.imdecode``; returns ``(image, full_resolution)``.
+
+    For previews the JPEG is decoded at 1/2, 1/4 or 1/8 scale with the
+    ``IMREAD_REDUCED_COLOR_*`` modes and only the remainder is resized.
+    """
+    flags = cv2.IMREAD_COLOR
+    if target_size is not None:
+        # Header-only read for the stored size; bounds are in stored orientation.
+        reader, _device = _image_reader(image_path, data)
+        source = reader.size()
+        bounds = QSize(target_size)
+        if reader.transformation() & QImageIOHandler.Transformation.TransformationRotate90:
+            bounds.transpose()
+        fitted = fit_size(source, bounds)
+        if source.isValid():
+            for factor, reduced in _OPENCV_REDUCED:
+                if (source.width() // factor >= fitted.width()
+                        and source.height() // factor >= fitted.height()):
+                    flags = reduced
+                    break
+    if data is not None:
+        encoded = np.frombuffer(data, dtype=np.uint8)
+    else:
+        # np.fromfile + imdecode copes with non-ASCII paths on Windows; imread doesn't.
+        encoded = np.fromfile(image_path, dtype=np.uint8)
+    pixels = cv2.imdecode(encoded, flags)
+    del encoded
+    if pixels is None:
+        return QImage(), True
+
+    height, width = pixels.shape[:2]
+    full_resolution = flags == cv2.IMREAD_COLOR
+    if target_size is not None:
+        scaled = fit_size(QSize(width, height), target_size)
+        if scaled != QSize(width, height):
+            pixels = cv2.resize(
+                pixels, (scaled.width(), scaled.height()), interpolation=cv2.INTER_AREA
+            )
+            full_resolution = False
+        height, width = pixels.shape[:2]
+    # The QImage borrows the array; PyQt keeps it referenced.
+    pixels = np.ascontiguousarray(pixels)
+    return QImage(pixels, width, height, pixels.strides[0], QImage.Format.Format_BGR888), full_resolution
+
+
+def _decode_with_heif(image_path: str, target_size: QSize | None = None, data: bytes | None = None):
+    """
+    Decode HEIC/HEIF with pillow-heif directly, skipping the Pillow image.
+    libheif already applies the container's rotation and mirroring.
+    """
+    source = io.BytesIO(data) if data is not None else image_path
+    heif_file = pillow_heif.open_heif(source, convert_hdr_to_8bit=True)
+    fmt = _QIMAGE_FORMATS.get(heif_file.mode, (None,))[0]
+    if fmt is None:
+        return QImage(), True
+    width, height = heif_file.size
+    image = QImage(heif_file.data, width, height, heif_file.stride, fmt)
+    if target_size is not None:
+        scaled = fit_size(image.size(), target_size)
+        if scaled != image.size():
+            return image.scaled(
+                scaled,
+                Qt.AspectRatioMode.IgnoreAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
+            ), False
+    return image, True
+
+
+# What a backend may raise on a file it can't read.
+_DECODE_ERRORS = (OSError, ValueError, RuntimeError, cv2.error)
+
+
+def _expected_size(image_path: str, target_size: QSize | None = None):
+    """Upright decoded size from the file header, or None if Pillow can't read it."""
+    try:
+        with Image.open(image_path) as pil_image:
+            size = QSize(*pil_image.size)
+            if pil_image.getexif().get(0x0112, 1) in _TRANSPOSED_ORIENTATIONS:
+                size.transpose()
+    except _DECODE_ERRORS:
+        return None
+    if target_size is not None:
+        size = fit_size(size, target_size)
+    return size.width(), size.height()
+
+
+class DecoderBackend:
+    """
+    A named decode function and the file extensions it is tried for.
+    ``decode(image_path, target_size, data)`` returns ``(image, full_resolution)``.
+    """
+
+    def __init__(self, name: str, decode, extensions=None):
+        self.name = name
+        self.decode = decode
+        # None means "any extension"
+        self.extensions = frozenset(extensions) if extensions is not None else None
+
+    def handles(self, ext: str) -> bool:
+        return self.extensions is None or ext in self.extensions
+
+
+class DecoderRegistry:
+    """
+    Ordered decoder backends plus the preferred backend per extension and
+    size class ("preview" or "full").  Backends are tried in preference
+    order, then registration order, until one returns a non-null image.
+    Preferences are plain ``{"<ext>:<size class>": backend name}`` so they
+    can be stored in the config.
+    """
+
+    def __init__(self, backends=()):
+        self._backends = []
+        self._preferences = {}
+        self._lock = threading.Lock()
+        for backend in backends:
+            self.register(backend)
+
+    def register(self, backend: DecoderBackend):
+        self._backends.append(backend)
+
+    @staticmethod
+    def preference_key(ext: str, target_size: QSize | None = None) -> str:
+        return f"{ext}:{'full' if target_size is None else 'preview'}"
+
+    def preferences(self) -> dict:
+        with self._lock:
+            return dict(self._preferences)
+
+    def set_preferences(self, preferences: dict | None):
+        names = {backend.name for backend in self._backends}
+        with self._lock:
+            self._preferences = {
+                key: name for key, name in (preferences or {}).items() if name in names
+            }
+
+    def backends_for(self, image_path: str, target_size: QSize | None = None):
+        """Backends to try for ``image_path``, preferred one first."""
+        ext = os.path.splitext(image_path)[1].lower()
+        candidates = [b for b in self._backends if b.handles(ext)]
+        with self._lock:
+            preferred = self._preferences.get(self.preference_key(ext, target_size))
+        candidates.sort(key=lambda b: b.name != preferred)
+        return candidates
+
+    def decode(self, image_path: str, target_size: QSize | None = None, data: bytes | None = None):
+        """
+        Returns ``(image, full_resolution)``; a null image if every backend
+        failed.  ``data`` is the file's content when it is already in memory.
+        """
+        for backend in self.backends_for(image_path, target_size):
+            try:
+                image, full_resolution = backend.decode(image_path, target_size, data)
+            except _DECODE_ERRORS:
+                continue
+            if not image.isNull():
+                return image, full_resolution
+        return QImage(), True
+
+    def benchmark(self, image_path: str, target_size: QSize | None = None, repeats: int = 3):
+        """
+        Time every backend on ``image_path`` (best of ``repeats``) and prefer
+        the fastest one for its extension and size class.  A backend whose
+        result differs in size from the others' is disqualified; when none
+        is left the preference stays as it was.  Returns the
+        ``{name: seconds}`` timings.
+        """
+        timings = {}
+        sizes = {}
+        for backend in self.backends_for(image_path, target_size):
+            best = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                try:
+                    image, _full = backend.decode(image_path, target_size)
+                except _DECODE_ERRORS:
+                    image = QImage()
+                elapsed = time.perf_counter() - start
+                if image.isNull():
+                    best = None
+                    break
+                sizes[backend.name] = (image.width(), image.height())
+                best = elapsed if best is None else min(best, elapsed)
+            if best is not None:
+                timings[backend.name] = best
+        if not timings:
+            return timings
+
+        # Reduced decodes may round differently by a pixel; anything more is wrong.
+        reference = _expected_size(image_path, target_size)
+        if reference is None:
+            counts = [sizes[name] for name in timings]
+            reference = max(counts, key=counts.count)
+        valid = {
+            name: seconds for name, seconds in timings.items()
+            if all(abs(a - b) <= 1 for a, b in zip(sizes[name], reference))
+        }
+        if not valid:
+            return timings
+        ext = os.path.splitext(image_path)[1].lower()
+        with self._lock:
+            self._preferences[self.preference_key(ext, target_size)] = min(valid, key=valid.get)
+        return timings
+
+
+_default_registry = DecoderRegistry([
+    DecoderBackend("pillow-heif", _decode_with_heif, (".heic", ".heif")),
+    DecoderBackend("qt", _decode_with_qt),
+    DecoderBackend("opencv", _decode_with_opencv, (".jpg", ".jpeg", ".jpe", ".bmp")),
+    DecoderBackend("pillow", _decode_with_pillow),
+])
+
+
+def default_registry() -> DecoderRegistry:
+    """Registry used by ``decode_image`` and the loader."""
+    return _default_registry
+
+
+def decode_image(image_path: str, target_size: QSize | None = None, data: bytes | None = None):
+    """
+    Decode ``image_path``, scaled to fit ``target_size`` (physical pixels) when
+    given, otherwise at full resolution.  Returns ``(image, full_resolution)``.
+    Pass the file's bytes as ``data`` to decode without touching the disk.
+    """
+    return _default_registry.decode(image_path, target_size, data)
@@ -0,0 +1,239 @@
+"""Gamma brightness drawn by an OpenGL 3.3 core shader."""
+import ctypes
+
+import numpy as np
+from PyQt6.QtCore import QRectF
+from PyQt6.QtGui import QImage, QPixmap, QTransform
+
+from image_classifier.imaging.gl_common import (
+    GPULimitError,
+    _gl,
+    compile_program,
+    max_texture_size,
+    saved_state,
+)
+from image_classifier.imaging.sharpen import _rgba_array
+
+# Maps the unit square (texture coordinates, row 0 at the top) to clip space
+_VERTEX = """
+#version 330 core
+layout(location = 0) in vec2 corner;
+uniform mat3 transform;
+out vec2 uv;
+void main() {
+    vec3 p = transform * vec3(corner, 1.0);
+    gl_Position = vec4(p.xy, 0.0, p.z);
+    uv = corner;
+}
+"""
+
+_FRAGMENT = """
+#version 330 core
+in vec2 uv;
+uniform sampler2D image;
+uniform float brightness;
+uniform bool premultiplied_in;
+uniform bool premultiplied_out;
+out vec4 color;
+void main() {
+    vec4 c = texture(image, uv);
+    if (premultiplied_in && c.a > 0.0)
+        c.rgb /= c.a;
+    c.rgb = pow(c.rgb, vec3(brightness));
+    if (premultiplied_out)
+        c.rgb *= c.a;
+    color = c;
+}
+"""
+
+# Unit square, top-left first, as a triangle strip
+_CORNERS = (0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 1.0)
+
+
+def view_matrix(transform: QTransform, target: QRectF, dpr: float, size) -> np.ndarray:
+    """
+    Row-major 3x3 matrix taking the unit square to ``target`` (item
+    coordinates), through the painter's ``transform`` and ``dpr`` to the
+    clip space of a ``size`` (device pixels) viewport.
+    """
+    w, h = size
+    t = transform
+    corner_to_item = np.array([[target.width(), 0, target.x()],
+                               [0, target.height(), target.y()],
+                               [0, 0, 1]], np.float64)
+    item_to_view = np.array([[t.m11(), t.m21(), t.m31()],
+                             [t.m12(), t.m22(), t.m32()],
+                             [t.m13(), t.m23(), t.m33()]], np.float64)
+    view_to_clip = np.array([[2 * dpr / w, 0, -1],
+                             [0, -2 * dpr / h, 1],
+                             [0, 0, 1]], np.float64)
+    return view_to_clip @ item_to_view @ corner_to_item
+
+
+# Rows of the readback start at the bottom of clip space: keep row 0 at the top
+_RENDER_MATRIX = np.array([[2, 0, -1], [0, 2, -1], [0, 0, 1]], np.float64)
+
+
+class GLBrightness:
+    """
+    Draws one image with a gamma ``brightness`` in the current OpenGL
+    context.  The program and the quad are made once per context and the
+    image is uploaded once (keyed by ``cacheKey()``), so drawing it again
+    at another brightness only sets a uniform.  ``draw()`` paints into
+    whatever is bound (the viewport, inside ``beginNativePainting``);
+    ``render()`` reads the result back for when the pixels are needed.
+
+    Raises ``GPULimitError`` for images beyond the texture limit and
+    ``RuntimeError`` when the shader can't be built; PyOpenGL raises its
+    own errors for failing calls.  Call ``release()`` with the context
+    current before it goes.
+    """
+
+    # QImage format -> (GL format, GL type, premultiplied); 32-bit ARGB is
+    # uploaded as is, packed words read the same on any byte order
+    _FORMATS = {
+        QImage.Format.Format_RGB32: ("GL_BGRA", "GL_UNSIGNED_INT_8_8_8_8_REV", False),
+        QImage.Format.Format_ARGB32: ("GL_BGRA", "GL_UNSIGNED_INT_8_8_8_8_REV", False),
+        QImage.Format.Format_ARGB32_Premultiplied: ("GL_BGRA", "GL_UNSIGNED_INT_8_8_8_8_REV", True),
+        QImage.Format.Format_RGBX8888: ("GL_RGBA", "GL_UNSIGNED_BYTE", False),
+        QImage.Format.Format_RGBA8888: ("GL_RGBA", "GL_UNSIGNED_BYTE", False),
+        QImage.Format.Format_RGBA8888_Premultiplied: ("GL_RGBA", "GL_UNSIGNED_BYTE", True),
+    }
+
+    def __init__(self):
+        self._program = None
+        self._vao = self._vbo = None
+        self._texture = None
+        self._key = None
+        self._premultiplied = False
+        self.size = None
+        # Offscreen target of render(), kept for the next readback
+        self._fbo = self._target = None
+        self._target_size = None
+
+    def _create(self):
+        GL = _gl()
+        self._program = compile_program(_VERTEX, _FRAGMENT)
+        corners = (GL.GLfloat * len(_CORNERS))(*_CORNERS)
+        self._vao = GL.glGenVertexArrays(1)
+        self._vbo = GL.glGenBuffers(1)
+        GL.glBindVertexArray(self._vao)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self._vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, ctypes.sizeof(corners), corners, GL.GL_STATIC_DRAW)
+        GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, 0, ctypes.c_void_p(0))
+        GL.glEnableVertexAttribArray(0)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        self._texture = GL.glGenTextures(1)
+
+    def _upload(self, pixmap):
+        """Make ``pixmap`` (a QPixmap or QImage) the texture, unless it already is."""
+        if self._key == pixmap.cacheKey():
+            return
+        GL = _gl()
+        image = pixmap.toImage() if isinstance(pixmap, QPixmap) else pixmap
+        w, h = image.width(), image.height()
+        limit = max_texture_size()
+        if w > limit or h > limit:
+            raise GPULimitError(f"{w}x{h} exceeds the GPU's {limit} pixel texture limit")
+        gl_format = self._FORMATS.get(image.format())
+        if gl_format is None:
+            image = image.convertToFormat(QImage.Format.Format_RGBA8888)
+            gl_format = self._FORMATS[image.format()]
+        fmt, kind, self._premultiplied = gl_format
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+
+        self._key = None
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self._texture)
+        for param in (GL.GL_TEXTURE_MIN_FILTER, GL.GL_TEXTURE_MAG_FILTER):
+            # The viewer shows pixels unsmoothed (FastTransformation)
+            GL.glTexParameteri(GL.GL_TEXTURE_2D, param, GL.GL_NEAREST)
+        for param in (GL.GL_TEXTURE_WRAP_S, GL.GL_TEXTURE_WRAP_T):
+            GL.glTexParameteri(GL.GL_TEXTURE_2D, param, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAX_LEVEL, 0)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 4)
+        GL.glPixelStorei(GL.GL_UNPACK_ROW_LENGTH, image.bytesPerLine() // 4)
+        # PyOpenGL converts arrays to the element type of ``kind``
+        data = np.frombuffer(bits, np.uint8 if kind == "GL_UNSIGNED_BYTE" else np.uint32)
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_RGBA8, w, h, 0, getattr(GL, fmt),
+                        getattr(GL, kind), data)
+        GL.glPixelStorei(GL.GL_UNPACK_ROW_LENGTH, 0)
+        self._key = pixmap.cacheKey()
+        self.size = (w, h)
+
+    def _draw(self, pixmap, brightness: float, matrix, premultiplied_out: bool):
+        GL = _gl()
+        if self._program is None:
+            self._create()
+        GL.glActiveTexture(GL.GL_TEXTURE0)
+        self._upload(pixmap)
+        program = self._program
+        GL.glUseProgram(program)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self._texture)
+        GL.glUniform1i(GL.glGetUniformLocation(program, "image"), 0)
+        GL.glUniform1f(GL.glGetUniformLocation(program, "brightness"), brightness)
+        GL.glUniform1i(GL.glGetUniformLocation(program, "premultiplied_in"), self._premultiplied)
+        GL.glUniform1i(GL.glGetUniformLocation(program, "premultiplied_out"), premultiplied_out)
+        GL.glUniformMatrix3fv(GL.glGetUniformLocation(program, "transform"), 1, GL.GL_TRUE,
+                              np.asarray(matrix, np.float32))
+        GL.glBindVertexArray(self._vao)
+        GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, 4)
+
+    def draw(self, pixmap, brightness: float, matrix, viewport_size):
+        """
+        Draw ``pixmap`` at ``brightness`` into the bound framebuffer of
+        ``viewport_size`` device pixels, placed by ``matrix`` (see
+        ``view_matrix``) and blended like Qt's own (premultiplied) drawing.
+        """
+        GL = _gl()
+        with saved_state(disable=(GL.GL_DEPTH_TEST, GL.GL_CULL_FACE, GL.GL_POLYGON_SMOOTH)):
+            GL.glViewport(0, 0, *viewport_size)
+            GL.glEnable(GL.GL_BLEND)
+            GL.glBlendFunc(GL.GL_ONE, GL.GL_ONE_MINUS_SRC_ALPHA)
+            self._draw(pixmap, brightness, matrix, premultiplied_out=True)
+
+    def render(self, pixmap, brightness: float) -> QImage:
+        """``pixmap`` at ``brightness`` as an RGBA8888 QImage (a GPU readback)."""
+        GL = _gl()
+        with saved_state():
+            if self._program is None:
+                self._create()
+            GL.glActiveTexture(GL.GL_TEXTURE0)
+            self._upload(pixmap)
+            w, h = self.size
+            if self._fbo is None:
+                self._fbo = GL.glGenFramebuffers(1)
+                self._target = GL.glGenTextures(1)
+            GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._fbo)
+            if self._target_size != (w, h):
+                GL.glBindTexture(GL.GL_TEXTURE_2D, self._target)
+                GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAX_LEVEL, 0)
+                GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_RGBA8, w, h, 0, GL.GL_RGBA,
+                                GL.GL_UNSIGNED_BYTE, None)
+                GL.glFramebufferTexture2D(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0,
+                                          GL.GL_TEXTURE_2D, self._target, 0)
+                self._target_size = (w, h)
+            if GL.glCheckFramebufferStatus(GL.GL_FRAMEBUFFER) != GL.GL_FRAMEBUFFER_COMPLETE:
+                raise RuntimeError("Brightness framebuffer is incomplete")
+            GL.glViewport(0, 0, w, h)
+            self._draw(pixmap, brightness, _RENDER_MATRIX, premultiplied_out=False)
+
+            result, out = _rgba_array(QImage(w, h, QImage.Format.Format_RGBA8888))
+            GL.glPixelStorei(GL.GL_PACK_ALIGNMENT, 4)
+            GL.glReadPixels(0, 0, w, h, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, out)
+            return result
+
+    def release(self):
+        """Delete the GL objects (their context must be current)."""
+        GL = _gl()
+        if self._program is not None:
+            GL.glDeleteProgram(self._program)
+            GL.glDeleteVertexArrays(1, [self._vao])
+            GL.glDeleteBuffers(1, [self._vbo])
+            GL.glDeleteTextures([self._texture])
+        if self._fbo is not None:
+            GL.glDeleteFramebuffers(1, [self._fbo])
+            GL.glDeleteTextures([self._target])
+        self._program = self._vao = self._vbo = self._texture = None
+        self._fbo = self._target = self._target_size = None
+        self._key = self.size = None
@@ -0,0 +1,95 @@
+"""Helpers shared by the OpenGL image passes (PyOpenGL, 3.3 core profile)."""
+from contextlib import contextmanager
+
+
+def _gl():
+    from OpenGL import GL
+
+    return GL
+
+
+class GPULimitError(RuntimeError):
+    """An image or radius beyond what the context can take; the GPU itself works."""
+
+
+def gl_errors() -> tuple:
+    """
+    What a failing pass raises: RuntimeError from these helpers, PyOpenGL's
+    own errors (GLError, NullFunctionError) or ImportError without it.
+    """
+    try:
+        from OpenGL.error import Error
+    except ImportError:
+        return (RuntimeError, ImportError)
+    return (RuntimeError, ImportError, Error)
+
+
+def compile_program(vertex_src: str, fragment_src: str) -> int:
+    """Compile and link a shader program; raises RuntimeError with the log."""
+    GL = _gl()
+    program = GL.glCreateProgram()
+    shaders = []
+    for kind, src in ((GL.GL_VERTEX_SHADER, vertex_src), (GL.GL_FRAGMENT_SHADER, fragment_src)):
+        shader = GL.glCreateShader(kind)
+        GL.glShaderSource(shader, src)
+        GL.glCompileShader(shader)
+        if not GL.glGetShaderiv(shader, GL.GL_COMPILE_STATUS):
+            log = GL.glGetShaderInfoLog(shader)
+            GL.glDeleteShader(shader)
+            raise RuntimeError(f"Shader compile failed: {log!r}")
+        GL.glAttachShader(program, shader)
+        shaders.append(shader)
+    GL.glLinkProgram(program)
+    for shader in shaders:
+        GL.glDetachShader(program, shader)
+        GL.glDeleteShader(shader)
+    if not GL.glGetProgramiv(program, GL.GL_LINK_STATUS):
+        log = GL.glGetProgramInfoLog(program)
+        GL.glDeleteProgram(program)
+        raise RuntimeError(f"Shader link failed: {log!r}")
+    return program
+
+
+def max_texture_size() -> int:
+    GL = _gl()
+    return int(GL.glGetIntegerv(GL.GL_MAX_TEXTURE_SIZE))
+
+
+@contextmanager
+def saved_state(disable=None):
+    """
+    Leave the GL state the passes touch (Qt's framebuffer and so on) as
+    found.  ``disable`` lists the capabilities switched off meanwhile;
+    by default everything that would change how a pass writes pixels.
+    """
+    GL = _gl()
+    capabilities = (GL.GL_BLEND, GL.GL_DEPTH_TEST, GL.GL_SCISSOR_TEST, GL.GL_CULL_FACE,
+                    GL.GL_STENCIL_TEST, GL.GL_MULTISAMPLE, GL.GL_POLYGON_SMOOTH)
+    enabled = {cap: GL.glIsEnabled(cap) for cap in capabilities}
+    framebuffer = GL.glGetIntegerv(GL.GL_FRAMEBUFFER_BINDING)
+    viewport = GL.glGetIntegerv(GL.GL_VIEWPORT)
+    program = GL.glGetIntegerv(GL.GL_CURRENT_PROGRAM)
+    vao = GL.glGetIntegerv(GL.GL_VERTEX_ARRAY_BINDING)
+    active_texture = GL.glGetIntegerv(GL.GL_ACTIVE_TEXTURE)
+    blend = [GL.glGetIntegerv(name) for name in (GL.GL_BLEND_SRC_RGB, GL.GL_BLEND_DST_RGB,
+                                                 GL.GL_BLEND_SRC_ALPHA, GL.GL_BLEND_DST_ALPHA)]
+    textures = []
+    for unit in range(2):
+        GL.glActiveTexture(GL.GL_TEXTURE0 + unit)
+        textures.append(GL.glGetIntegerv(GL.GL_TEXTURE_BINDING_2D))
+    for cap in (capabilities if disable is None else disable):
+        GL.glDisable(cap)
+    try:
+        yield
+    finally:
+        for unit, texture in enumerate(textures):
+            GL.glActiveTexture(GL.GL_TEXTURE0 + unit)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, int(texture))
+        GL.glActiveTexture(int(active_texture))
+        GL.glBlendFuncSeparate(*(int(value) for value in blend))
+        GL.glBindVertexArray(int(vao))
+        GL.glUseProgram(int(program))
+        GL.glViewport(*(int(value) for value in viewport))
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, int(framebuffer))
+        for cap, was_enabled in enabled.items():
+            (GL.glEnable if was_enabled else GL.glDisable)(cap)
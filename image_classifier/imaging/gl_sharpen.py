@@ -0,0 +1,306 @@
+"""The LAB unsharp mask of ``sharpen_image`` as OpenGL 3.3 core passes."""
+import ctypes
+import math
+
+import cv2
+import numpy as np
+from PyQt6.QtGui import QImage
+
+from image_classifier.imaging.gl_common import (
+    GPULimitError,
+    _gl,
+    compile_program,
+    max_texture_size,
+    saved_state,
+)
+from image_classifier.imaging.sharpen import _rgba_array
+
+# Widest blur half-kernel the shaders take: 2 * radius for the slider's 50
+MAX_TAPS = 128
+
+_VERTEX = """
+#version 330 core
+layout(location = 0) in vec2 position;
+void main() {
+    gl_Position = vec4(position, 0.0, 1.0);
+}
+"""
+
+# 8-bit LAB (OpenCV's scaling) -> sRGB with the constants of COLOR_LAB2RGB
+_LAB = """
+float from_linear(float c) {
+    return c <= 0.0031308 ? 12.92 * c : 1.055 * pow(c, 1.0 / 2.4) - 0.055;
+}
+float lab_f_inv(float f) {
+    return f > 0.206893 ? f * f * f : (f - 16.0 / 116.0) / 7.787;
+}
+vec3 lab8_to_rgb(vec3 lab) {
+    float l = lab.x * 100.0 / 255.0;
+    float fy = (l + 16.0) / 116.0;
+    float y = fy * fy * fy;
+    if (l <= 8.0) {
+        y = l / 903.3;
+        fy = 7.787 * y + 16.0 / 116.0;
+    }
+    float x = lab_f_inv((lab.y - 128.0) / 500.0 + fy) * 0.950456;
+    float z = lab_f_inv(fy - (lab.z - 128.0) / 200.0) * 1.088754;
+    vec3 lin = clamp(vec3(dot(vec3(x, y, z), vec3(3.240479, -1.53715, -0.498535)),
+                          dot(vec3(x, y, z), vec3(-0.969256, 1.875991, 0.041556)),
+                          dot(vec3(x, y, z), vec3(0.055648, -0.204043, 1.057311))),
+                     0.0, 1.0);
+    vec3 rgb = vec3(from_linear(lin.r), from_linear(lin.g), from_linear(lin.b));
+    return floor(rgb * 255.0 + 0.5) / 255.0;
+}
+"""
+
+# One direction of a Gaussian blur, mirrored at the edges like OpenCV's
+# BORDER_REFLECT_101; ``scale`` turns the texture's values into 0..255
+_BLUR = """
+uniform sampler2D image;
+uniform ivec2 direction;
+uniform int taps;
+uniform float weights[%d];
+uniform float scale;
+
+float sample_at(ivec2 p, ivec2 size) {
+    ivec2 last = size - 1;
+    p = abs(p);
+    p = last - abs(last - p);
+    return texelFetch(image, p, 0).r * scale;
+}
+float blurred(ivec2 p) {
+    ivec2 size = textureSize(image, 0);
+    float sum = weights[0] * sample_at(p, size);
+    for (int i = 1; i < taps; ++i)
+        sum += weights[i] * (sample_at(p - i * direction, size)
+                             + sample_at(p + i * direction, size));
+    return sum;
+}
+""" % MAX_TAPS
+
+_BLUR_PASS = """
+#version 330 core
+out vec4 color;
+""" + _BLUR + """
+void main() {
+    color = vec4(blurred(ivec2(gl_FragCoord.xy)));
+}
+"""
+
+# Second blur direction, written as ``weight`` * thresholded (L - blur);
+# the two radii are summed into one detail plane by additive blending
+_DETAIL_PASS = """
+#version 330 core
+uniform sampler2D luma;
+uniform float threshold;
+uniform float weight;
+out vec4 color;
+""" + _BLUR + """
+void main() {
+    ivec2 p = ivec2(gl_FragCoord.xy);
+    float diff = floor(texelFetch(luma, p, 0).r * 255.0 + 0.5) - blurred(p);
+    color = vec4(abs(diff) < threshold ? 0.0 : weight * diff);
+}
+"""
+
+_BLEND_PASS = """
+#version 330 core
+uniform sampler2D lab;
+uniform sampler2D detail;
+uniform float amount;
+out vec4 color;
+""" + _LAB + """
+void main() {
+    ivec2 p = ivec2(gl_FragCoord.xy);
+    vec3 lab = floor(texelFetch(lab, p, 0).rgb * 255.0 + 0.5);
+    lab.x = floor(clamp(lab.x + amount * texelFetch(detail, p, 0).r, 0.0, 255.0));
+    color = vec4(lab8_to_rgb(lab), 1.0);
+}
+"""
+
+
+def gaussian_weights(sigma: float):
+    """
+    The centre and one side of the kernel ``SharpenSession`` blurs with at
+    ``sigma``, for the ``weights`` uniform.
+    """
+    k = max(1, 2 * math.ceil(sigma) + 1)
+    kernel = cv2.getGaussianKernel(k, sigma, cv2.CV_32F).ravel()
+    return kernel[k // 2:]
+
+
+class GLSharpener:
+    """
+    ``sharpen_image`` on the GPU, for use with an OpenGL 3.3 core context
+    current (the viewer's viewport).  The image is converted to LAB by
+    OpenCV once and uploaded; each radius then takes four separable
+    Gaussian passes over L in float FBOs, kept for the next call with the
+    same radius and threshold, so a change of ``amount`` alone is one
+    blend pass and a readback.  Only the conversion back to RGB is done in
+    float, so results are within 2 levels per channel of the CPU's.
+
+    Raises ``GPULimitError`` when the image or radius is too large for the
+    context and ``RuntimeError`` when a shader or framebuffer can't be
+    made; callers fall back to ``sharpen_cv2``.  Objects are created in the context current on
+    first use; call ``release()`` with it current before it goes away.
+    """
+
+    def __init__(self):
+        self._programs = None
+        self._vao = self._vbo = self._fbo = None
+        # name -> texture id, all the size of the current image
+        self._textures = {}
+        self._image_key = None
+        self._detail_key = None
+        self.size = None
+
+    # ----- GL objects -------------------------------------------------------
+
+    def _create(self):
+        GL = _gl()
+        self._programs = {name: compile_program(_VERTEX, src) for name, src in (
+            ("blur", _BLUR_PASS), ("detail", _DETAIL_PASS),
+            ("blend", _BLEND_PASS))}
+        # One triangle covering the viewport
+        verts = (GL.GLfloat * 6)(-1.0, -1.0, 3.0, -1.0, -1.0, 3.0)
+        self._vao = GL.glGenVertexArrays(1)
+        self._vbo = GL.glGenBuffers(1)
+        GL.glBindVertexArray(self._vao)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self._vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, ctypes.sizeof(verts), verts, GL.GL_STATIC_DRAW)
+        GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, 0, ctypes.c_void_p(0))
+        GL.glEnableVertexAttribArray(0)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        self._fbo = GL.glGenFramebuffers(1)
+
+    def _texture(self, name: str, internal_format, fmt, kind, data=None) -> int:
+        GL = _gl()
+        texture = self._textures.get(name)
+        if texture is None:
+            texture = self._textures[name] = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, texture)
+        for param in (GL.GL_TEXTURE_MIN_FILTER, GL.GL_TEXTURE_MAG_FILTER):
+            GL.glTexParameteri(GL.GL_TEXTURE_2D, param, GL.GL_NEAREST)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAX_LEVEL, 0)
+        w, h = self.size
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, internal_format, w, h, 0, fmt, kind, data)
+        return texture
+
+    def _release_textures(self):
+        if self._textures:
+            _gl().glDeleteTextures(list(self._textures.values()))
+        self._textures = {}
+        self._image_key = self._detail_key = None
+        self.size = None
+
+    def release(self):
+        """Delete the GL objects (their context must be current)."""
+        GL = _gl()
+        self._release_textures()
+        if self._programs is not None:
+            for program in self._programs.values():
+                GL.glDeleteProgram(program)
+            GL.glDeleteVertexArrays(1, [self._vao])
+            GL.glDeleteBuffers(1, [self._vbo])
+            GL.glDeleteFramebuffers(1, [self._fbo])
+        self._programs = None
+        self._vao = self._vbo = self._fbo = None
+
+    # ----- passes -----------------------------------------------------------
+
+    def _draw(self, program_name: str, target: str, textures, **uniforms):
+        """Draw the full-image triangle into ``target`` with ``textures`` bound."""
+        GL = _gl()
+        program = self._programs[program_name]
+        GL.glFramebufferTexture2D(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0, GL.GL_TEXTURE_2D,
+                                  self._textures[target], 0)
+        if GL.glCheckFramebufferStatus(GL.GL_FRAMEBUFFER) != GL.GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError(f"Framebuffer for {target!r} is incomplete")
+        GL.glUseProgram(program)
+        for unit, (uniform, name) in enumerate(textures.items()):
+            GL.glActiveTexture(GL.GL_TEXTURE0 + unit)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, self._textures[name])
+            GL.glUniform1i(GL.glGetUniformLocation(program, uniform), unit)
+        for uniform, value in uniforms.items():
+            location = GL.glGetUniformLocation(program, uniform)
+            if isinstance(value, np.ndarray):
+                GL.glUniform1fv(location, len(value), value)
+            elif isinstance(value, tuple):
+                GL.glUniform2i(location, *value)
+            elif isinstance(value, int):
+                GL.glUniform1i(location, value)
+            else:
+                GL.glUniform1f(location, value)
+        GL.glDrawArrays(GL.GL_TRIANGLES, 0, 3)
+
+    def _blur(self, sigma: float, threshold: float, weight: float, accumulate: bool):
+        """
+        Write ``weight`` * thresholded (L - blur at ``sigma``) into "detail",
+        or with ``accumulate`` add it to what is there.
+        """
+        GL = _gl()
+        weights = gaussian_weights(sigma)
+        # The edge mirroring reaches back one image width at most
+        if len(weights) > MAX_TAPS or len(weights) > min(self.size):
+            raise GPULimitError(f"Radius {sigma} is too large for the GPU path")
+        taps = dict(taps=len(weights), weights=weights)
+        self._draw("blur", "temp", {"image": "lab"}, direction=(1, 0), scale=255.0, **taps)
+        if accumulate:
+            GL.glEnable(GL.GL_BLEND)
+            GL.glBlendFunc(GL.GL_ONE, GL.GL_ONE)
+        self._draw("detail", "detail", {"image": "temp", "luma": "lab"}, direction=(0, 1),
+                   scale=1.0, threshold=float(threshold), weight=float(weight), **taps)
+        GL.glDisable(GL.GL_BLEND)
+
+    def _upload(self, image: QImage):
+        GL = _gl()
+        _, arr = _rgba_array(image, writable=False)
+        h, w = arr.shape[:2]
+        limit = max_texture_size()
+        if w > limit or h > limit:
+            raise GPULimitError(f"{w}x{h} exceeds the GPU's {limit} pixel texture limit")
+        # OpenCV's own conversion, so L, a and b are exactly the CPU's
+        lab = cv2.cvtColor(cv2.cvtColor(arr, cv2.COLOR_RGBA2BGR), cv2.COLOR_BGR2LAB)
+        if self.size != (w, h):
+            self._release_textures()
+            self.size = (w, h)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        # Texture row 0 is the top scanline; every pass keeps that order
+        self._texture("lab", GL.GL_RGB8, GL.GL_RGB, GL.GL_UNSIGNED_BYTE, lab)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 4)
+        if "detail" not in self._textures:
+            self._texture("temp", GL.GL_R32F, GL.GL_RED, GL.GL_FLOAT)
+            self._texture("detail", GL.GL_R32F, GL.GL_RED, GL.GL_FLOAT)
+            self._texture("result", GL.GL_RGBA8, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE)
+        self._detail_key = None
+
+    def sharpen(self, image: QImage, radius: float, amount: float, threshold: int = 2) -> QImage:
+        """``sharpen_image(image, radius, amount, threshold)`` computed on the GPU."""
+        GL = _gl()
+        with saved_state():
+            if self._programs is None:
+                self._create()
+            GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self._fbo)
+            GL.glBindVertexArray(self._vao)
+            GL.glViewport(0, 0, image.width(), image.height())
+            if image.cacheKey() != self._image_key or self.size != (image.width(), image.height()):
+                self._image_key = None
+                self._upload(image)
+                self._image_key = image.cacheKey()
+            detail_key = (radius, threshold)
+            if detail_key != self._detail_key:
+                self._detail_key = None
+                # L + amount * diff1 + (amount / 2) * diff2, as on the CPU
+                self._blur(radius, threshold, 1.0, accumulate=False)
+                self._blur(radius * 2, threshold, 0.5, accumulate=True)
+                self._detail_key = detail_key
+            self._draw("blend", "result", {"lab": "lab", "detail": "detail"},
+                       amount=float(amount))
+
+            w, h = self.size
+            result = QImage(w, h, QImage.Format.Format_RGBA8888)
+            result, out = _rgba_array(result)
+            GL.glPixelStorei(GL.GL_PACK_ALIGNMENT, 4)
+            GL.glReadPixels(0, 0, w, h, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, out)
+            return result
+
@@ -1,28 +1,22 @@
 """Async image loader with shared LRU cache."""
 import os
+import threading
 from collections import OrderedDict
 
-from PIL import Image, ImageOps
+from PIL import Image
 from pillow_heif import register_heif_opener
-from PyQt6.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
-from PyQt6.QtGui import QImage, QImageReader, QPixmap
-
-register_heif_opener()
+from PyQt6.QtCore import QObject, QRunnable, QSize, pyqtSignal, pyqtSlot
+from PyQt6.QtGui import QImage, QPixmap
 
+from image_classifier.imaging.decoders import decode_image
+from image_classifier.imaging.memory import (
+    MIB,
+    MIN_CACHE_BYTES,
+    default_cache_budget,
+    memory_shortfall,
+)
 
-def _read_with_pillow(image_path: str) -> QImage:
-    """Read formats unavailable to Qt, including HEIC/HEIF."""
-    with Image.open(image_path) as pil_image:
-        pil_image = ImageOps.exif_transpose(pil_image).convert("RGBA")
-        data = pil_image.tobytes("raw", "RGBA")
-        image = QImage(
-            data,
-            pil_image.width,
-            pil_image.height,
-            pil_image.width * 4,
-            QImage.Format.Format_RGBA8888,
-        )
-        return image.copy()
+register_heif_opener()
 
 
 def save_pixmap(pixmap: QPixmap, image_path: str) -> bool:
@@ -55,87 +49,285 @@ class WorkerSignals(QObject):
 
 
 class ImageLoaderRunnable(QRunnable):
+    """
+    Decode one image off the GUI thread.
+
+    With a ``target_size`` (the viewer's size in physical pixels) the image is
+    decoded straight to that size; without one it is decoded at full
+    resolution.  Preview entries in the cache are replaced by full-resolution
+    ones but never the other way round.  Previews are also looked up in (and
+    written to) the optional on-disk ``PreviewDiskCache`` before decoding.
+
+    The shared pixmap cache is sized by ``configure_cache`` (from physical
+    memory unless overridden), shrinks under memory pressure and exposes its
+    counters through ``cache_stats``.
+    """
+
     _pixmap_cache = OrderedDict()
     _pixmap_sizes = {}
+    _pixmap_full = set()
     _cache_limit = 128
     _cache_bytes_limit = 512 * 1024 * 1024
     _cache_bytes = 0
+    # Budget before any memory-pressure shrinking; _cache_bytes_limit is the
+    # limit currently enforced.
+    _cache_budget_bytes = 512 * 1024 * 1024
+    _cache_hits = 0
+    _cache_misses = 0
+    _cache_evictions = 0
+    _cache_lock = threading.RLock()
+    _preview_cache = None
 
-    def __init__(self, image_path: str, max_dimension: int = 4096):
+    def __init__(self, image_path: str, target_size: QSize | None = None):
         super().__init__()
         self.image_path = self.normalize_path(image_path)
-        self.max_dimension = max_dimension
+        self.target_size = QSize(target_size) if target_size is not None else None
+        self.full_resolution = target_size is None
         self.signals = WorkerSignals()
         self._cancelled = False
+        # Filled by read(): the encoded file, or a preview from the disk cache.
+        self._data = None
+        self._preview = None
 
     @classmethod
     def normalize_path(cls, image_path: str) -> str:
         return os.path.normcase(os.path.abspath(image_path))
 
     @classmethod
-    def get_cached_pixmap(cls, image_path: str):
-        norm_path = cls.normalize_path(image_path)
+    def configure_cache(cls, max_bytes: int | None = None):
+        """
+        Set the pixmap cache budget.  ``None`` sizes it from the machine's
+        physical memory; the entry limit follows the byte budget.
+        """
+        budget = max_bytes if max_bytes else default_cache_budget()
+        with cls._cache_lock:
+            cls._cache_budget_bytes = budget
+            cls._cache_bytes_limit = budget
+            cls._cache_limit = max(128, budget // (4 * MIB))
+            cls._evict_to_limits()
+        return budget
+
+    @classmethod
+    def relieve_memory_pressure(cls, total=None, available=None) -> int:
+        """
+        Shrink the cache while the system is low on memory and grow it back to
+        the configured budget once memory frees up.  Returns the enforced limit.
+        """
+        shortfall = memory_shortfall(total, available)
+        with cls._cache_lock:
+            if shortfall:
+                limit = max(MIN_CACHE_BYTES, cls._cache_bytes - shortfall)
+                cls._cache_bytes_limit = min(cls._cache_bytes_limit, limit)
+                cls._evict_to_limits()
+            else:
+                cls._cache_bytes_limit = cls._cache_budget_bytes
+            return cls._cache_bytes_limit
+
+    @classmethod
+    def cache_stats(cls) -> dict:
+        """Counters for tuning the cache on a given machine."""
+        with cls._cache_lock:
+            return {
+                "hits": cls._cache_hits,
+                "misses": cls._cache_misses,
+                "evictions": cls._cache_evictions,
+                "entries": len(cls._pixmap_cache),
+                "resident_bytes": cls._cache_bytes,
+                "limit_bytes": cls._cache_bytes_limit,
+                "budget_bytes": cls._cache_budget_bytes,
+                "limit_entries": cls._cache_limit,
+            }
+
+    @classmethod
+    def reset_cache_stats(cls):
+        with cls._cache_lock:
+            cls._cache_hits = cls._cache_misses = cls._cache_evictions = 0
+
+    @classmethod
+    def _lookup(cls, norm_path: str, full_resolution: bool):
         pix = cls._pixmap_cache.get(norm_path)
-        if pix is None:
+        if pix is None or (full_resolution and norm_path not in cls._pixmap_full):
             return None
         cls._pixmap_cache.move_to_end(norm_path)
         return pix
 
+    @classmethod
+    def get_cached_pixmap(cls, image_path: str, full_resolution: bool = False):
+        norm_path = cls.normalize_path(image_path)
+        with cls._cache_lock:
+            pix = cls._lookup(norm_path, full_resolution)
+            if pix is None:
+                cls._cache_misses += 1
+            else:
+                cls._cache_hits += 1
+            return pix
+
+    @classmethod
+    def is_cached(cls, image_path: str) -> bool:
+        """Whether a pixmap for ``image_path`` is resident (no LRU or stats update)."""
+        return cls.normalize_path(image_path) in cls._pixmap_cache
+
+    @classmethod
+    def cache_capacity(cls, target_size: QSize | None = None) -> int:
+        """How many images of ``target_size`` (or of the current average size) fit."""
+        if target_size is not None and not target_size.isEmpty():
+            entry_bytes = target_size.width() * target_size.height() * 4
+        elif cls._pixmap_cache:
+            entry_bytes = cls._cache_bytes // len(cls._pixmap_cache)
+        else:
+            return cls._cache_limit
+        return min(cls._cache_limit, cls._cache_bytes_limit // max(1, entry_bytes))
+
+    @classmethod
+    def is_full_resolution(cls, image_path: str) -> bool:
+        return cls.normalize_path(image_path) in cls._pixmap_full
+
     @classmethod
     def drop_cached_pixmap(cls, image_path: str):
         norm_path = cls.normalize_path(image_path)
-        pix = cls._pixmap_cache.pop(norm_path, None)
-        size = cls._pixmap_sizes.pop(norm_path, 0)
-        cls._cache_bytes = max(0, cls._cache_bytes - size)
+        with cls._cache_lock:
+            pix = cls._pixmap_cache.pop(norm_path, None)
+            size = cls._pixmap_sizes.pop(norm_path, 0)
+            cls._pixmap_full.discard(norm_path)
+            cls._cache_bytes = max(0, cls._cache_bytes - size)
         return pix
 
     @classmethod
-    def cache_pixmap(cls, image_path: str, pixmap: QPixmap, size_bytes: int):
+    def cache_pixmap(
+        cls,
+        image_path: str,
+        pixmap: QPixmap,
+        size_bytes: int,
+        full_resolution: bool = True,
+    ):
         norm_path = cls.normalize_path(image_path)
 
-        if norm_path in cls._pixmap_cache:
-            cls.drop_cached_pixmap(norm_path)
+        with cls._cache_lock:
+            if norm_path in cls._pixmap_cache:
+                if norm_path in cls._pixmap_full and not full_resolution:
+                    cls._pixmap_cache.move_to_end(norm_path)
+                    return
+                cls.drop_cached_pixmap(norm_path)
 
-        cls._pixmap_cache[norm_path] = pixmap
-        cls._pixmap_sizes[norm_path] = size_bytes
-        cls._cache_bytes += size_bytes
-        cls._pixmap_cache.move_to_end(norm_path)
+            cls._pixmap_cache[norm_path] = pixmap
+            cls._pixmap_sizes[norm_path] = size_bytes
+            if full_resolution:
+                cls._pixmap_full.add(norm_path)
+            cls._cache_bytes += size_bytes
+            cls._pixmap_cache.move_to_end(norm_path)
+            cls._evict_to_limits()
 
-        while (
+    @classmethod
+    def _evict_to_limits(cls):
+        while cls._pixmap_cache and (
             len(cls._pixmap_cache) > cls._cache_limit
             or cls._cache_bytes > cls._cache_bytes_limit
         ):
             oldest_path, _ = cls._pixmap_cache.popitem(last=False)
             oldest_size = cls._pixmap_sizes.pop(oldest_path, 0)
+            cls._pixmap_full.discard(oldest_path)
             cls._cache_bytes = max(0, cls._cache_bytes - oldest_size)
+            cls._cache_evictions += 1
+
+    @classmethod
+    def set_preview_cache(cls, preview_cache):
+        """Install (or with None, disable) the on-disk preview cache."""
+        cls._preview_cache = preview_cache
+
+    @classmethod
+    def load_pixmap(cls, image_path: str, target_size: QSize | None = None,
+                    data: bytes | None = None):
+        """
+        Decode and cache synchronously.  Returns ``(pixmap, full_resolution)``;
+        raises OSError/ValueError if the file cannot be decoded.  ``data`` is
+        the file's content from the read stage, which has already consulted
+        the preview cache.
+        """
+        norm_path = cls.normalize_path(image_path)
+        preview_cache = cls._preview_cache
+
+        img = None
+        if target_size is not None and preview_cache is not None and data is None:
+            img = preview_cache.get(norm_path, target_size)
+        if img is not None:
+            full_resolution = False
+        else:
+            img, full_resolution = decode_image(norm_path, target_size, data)
+            if img.isNull():
+                raise OSError(f"Failed to read {image_path}")
+            if not full_resolution and preview_cache is not None:
+                preview_cache.put(norm_path, img)
+        return cls._cache_image(image_path, img, full_resolution), full_resolution
+
+    @classmethod
+    def _cache_image(cls, image_path: str, img: QImage, full_resolution: bool) -> QPixmap:
+        # Hand the decoder's native format straight to QPixmap: forcing
+        # RGBA8888 first cost an extra full-frame pass and buffer, only for
+        # the pixmap to convert back to (A)RGB32 for painting.
+        pix = QPixmap.fromImage(img)
+        size_bytes = pix.width() * pix.height() * max(1, pix.depth() // 8)
+        cls.cache_pixmap(image_path, pix, size_bytes, full_resolution)
+        return pix
 
     def cancel(self):
         self._cancelled = True
+        self._data = self._preview = None
+
+    def read(self) -> int:
+        """
+        I/O stage, run by the scheduler on its reader threads before run():
+        pull the encoded file (or a screen-sized preview from the disk cache)
+        into memory so decode threads never wait on slow disks.  Returns the
+        number of encoded bytes now held.
+        """
+        if self._cancelled:
+            return 0
+        with ImageLoaderRunnable._cache_lock:
+            if ImageLoaderRunnable._lookup(self.image_path, self.full_resolution) is not None:
+                return 0
+        preview_cache = ImageLoaderRunnable._preview_cache
+        if self.target_size is not None and preview_cache is not None:
+            self._preview = preview_cache.get(self.image_path, self.target_size)
+            if self._preview is not None:
+                return 0
+        try:
+            with open(self.image_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            # run() falls back to the path and reports the failure
+            return 0
+        if self._cancelled:
+            return 0
+        self._data = data
+        return len(data)
 
     @pyqtSlot()
     def run(self):
         if self._cancelled:
             return
 
-        pix = ImageLoaderRunnable.get_cached_pixmap(self.image_path)
+        with ImageLoaderRunnable._cache_lock:
+            pix = ImageLoaderRunnable._lookup(self.image_path, self.full_resolution)
         if pix is not None:
+            self.full_resolution = ImageLoaderRunnable.is_full_resolution(self.image_path)
             self.signals.finished.emit(pix)
             return
 
-        reader = QImageReader(self.image_path)
-        reader.setAutoTransform(True)
-        reader.setAllocationLimit(512 * 1024 * 1024)
-
-        img = reader.read()
-        if img.isNull():
-            try:
-                img = _read_with_pillow(self.image_path)
-            except (OSError, ValueError):
-                self.signals.error.emit(f"Failed to read {self.image_path}")
-                return
-        qimg = img.convertToFormat(QImage.Format.Format_RGBA8888)
-        pix = QPixmap.fromImage(qimg)
-
-        ImageLoaderRunnable.cache_pixmap(self.image_path, pix, qimg.sizeInBytes())
+        preview, data = self._preview, self._data
+        self._preview = self._data = None
+        try:
+            if preview is not None:
+                self.full_resolution = False
+                pix = ImageLoaderRunnable._cache_image(self.image_path, preview, False)
+            else:
+                pix, self.full_resolution = ImageLoaderRunnable.load_pixmap(
+                    self.image_path, self.target_size, data
+                )
+        except (OSError, ValueError):
+            self.signals.error.emit(f"Failed to read {self.image_path}")
+            return
 
+        # Cancelled mid-decode: keep the cached result but don't deliver it.
+        if self._cancelled:
+            return
         self.signals.finished.emit(pix)
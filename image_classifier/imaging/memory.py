@@ -0,0 +1,83 @@
+"""Physical memory queries used to size the pixmap cache."""
+import ctypes
+import os
+import sys
+
+MIB = 1024 * 1024
+GIB = 1024 * MIB
+
+# Share of currently available memory the pixmap cache may claim.
+_AVAILABLE_SHARE = 0.2
+# Never more than this share of installed memory, whatever is free.
+_TOTAL_SHARE = 0.125
+MIN_CACHE_BYTES = 128 * MIB
+MAX_CACHE_BYTES = 8 * GIB
+# Below this much free memory (or share of total) the cache starts shrinking.
+LOW_MEMORY_BYTES = 512 * MIB
+LOW_MEMORY_SHARE = 0.1
+
+
+class _MemoryStatusEx(ctypes.Structure):
+    _fields_ = [
+        ("dwLength", ctypes.c_ulong),
+        ("dwMemoryLoad", ctypes.c_ulong),
+        ("ullTotalPhys", ctypes.c_ulonglong),
+        ("ullAvailPhys", ctypes.c_ulonglong),
+        ("ullTotalPageFile", ctypes.c_ulonglong),
+        ("ullAvailPageFile", ctypes.c_ulonglong),
+        ("ullTotalVirtual", ctypes.c_ulonglong),
+        ("ullAvailVirtual", ctypes.c_ulonglong),
+        ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+    ]
+
+
+def physical_memory():
+    """``(total_bytes, available_bytes)``; either may be None if unknown."""
+    if sys.platform == "win32":
+        status = _MemoryStatusEx()
+        status.dwLength = ctypes.sizeof(_MemoryStatusEx)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys, status.ullAvailPhys
+        return None, None
+
+    total = available = None
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name == "MemTotal":
+                    total = int(value.split()[0]) * 1024
+                elif name == "MemAvailable":
+                    available = int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        pass
+    if total is None:
+        try:
+            total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        except (ValueError, OSError, AttributeError):
+            total = None
+    return total, available
+
+
+def default_cache_budget(total=None, available=None) -> int:
+    """Pixmap cache budget in bytes for a machine with this much memory."""
+    if total is None and available is None:
+        total, available = physical_memory()
+    if total is None and available is None:
+        return 512 * MIB
+    budget = (available if available is not None else total / 2) * _AVAILABLE_SHARE
+    if total is not None:
+        budget = min(budget, total * _TOTAL_SHARE)
+    return int(max(MIN_CACHE_BYTES, min(MAX_CACHE_BYTES, budget)))
+
+
+def memory_shortfall(total=None, available=None) -> int:
+    """How many bytes we are below the low-memory mark (0 when memory is fine)."""
+    if total is None and available is None:
+        total, available = physical_memory()
+    if available is None:
+        return 0
+    low_mark = LOW_MEMORY_BYTES
+    if total is not None:
+        low_mark = max(low_mark, int(total * LOW_MEMORY_SHARE))
+    return max(0, low_mark - available)
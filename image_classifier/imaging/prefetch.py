@@ -0,0 +1,90 @@
+"""Adaptive, direction-aware prefetch window for neighbour preloads."""
+import time
+
+# Inter-step interval (seconds) at which the configured depth is used as-is;
+# faster navigation (a held arrow key) scales the look-ahead up.
+_BASE_STEP_INTERVAL = 0.5
+# Weight of the newest interval in the moving average.
+_SMOOTHING = 0.3
+# Steps further apart than this start a new burst.
+_IDLE_RESET = 3.0
+
+
+class PrefetchPlanner:
+    """
+    Decides which images around the current one to warm, and in what order.
+
+    The window extends ``ahead`` images in the direction of travel and
+    ``behind`` the other way.  Holding an arrow key deepens the look-ahead (up
+    to ``max_ahead``), and the window is capped so preloads never take more
+    than half of the pixmap cache.  Works on indices, so callers apply it to
+    whatever (filtered) list is on screen.
+    """
+
+    def __init__(self, ahead: int = 6, behind: int = 2, max_ahead: int = 24):
+        self.ahead = max(0, ahead)
+        self.behind = max(0, behind)
+        self.max_ahead = max(self.ahead, max_ahead)
+        self.direction = 1
+        self._last_step = None
+        self._interval = None
+
+    def record_step(self, direction: int, timestamp: float | None = None):
+        """Note one navigation step (+1 forward, -1 backward)."""
+        now = time.monotonic() if timestamp is None else timestamp
+        if direction != self.direction:
+            # Reversing restarts the speed estimate
+            self._interval = None
+        elif self._last_step is not None:
+            interval = now - self._last_step
+            if interval > _IDLE_RESET:
+                self._interval = None
+            elif self._interval is None:
+                self._interval = interval
+            else:
+                self._interval += _SMOOTHING * (interval - self._interval)
+        self.direction = 1 if direction >= 0 else -1
+        self._last_step = now
+
+    def depth(self, max_entries: int | None = None):
+        """Current ``(ahead, behind)`` depth."""
+        ahead, behind = self.ahead, self.behind
+        if self._interval is not None and self._interval < _BASE_STEP_INTERVAL:
+            speedup = _BASE_STEP_INTERVAL / max(self._interval, 0.01)
+            ahead = min(self.max_ahead, round(ahead * speedup))
+            # Nobody looks back while racing forward
+            behind = min(behind, 1)
+        if max_entries is not None:
+            room = max(0, max_entries // 2)
+            behind = min(behind, room // 4)
+            ahead = min(ahead, room - behind)
+        return ahead, behind
+
+    def window(self, index: int, count: int, loop: bool = False, max_entries: int | None = None):
+        """Indices to preload, most urgent first (never includes ``index``)."""
+        if count <= 1 or not 0 <= index < count:
+            return []
+        ahead_depth, behind_depth = self.depth(max_entries)
+
+        def walk(step, depth):
+            out = []
+            for distance in range(1, depth + 1):
+                i = index + step * distance
+                if loop:
+                    i %= count
+                elif not 0 <= i < count:
+                    break
+                out.append(i)
+            return out
+
+        ahead = walk(self.direction, ahead_depth)
+        behind = walk(-self.direction, behind_depth)
+        ordered = ahead[:2] + behind[:1] + ahead[2:] + behind[1:]
+
+        seen = {index}
+        result = []
+        for i in ordered:
+            if i not in seen:
+                seen.add(i)
+                result.append(i)
+        return result
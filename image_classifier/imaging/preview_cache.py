@@ -0,0 +1,156 @@
+"""Persistent on-disk cache of screen-sized previews."""
+import hashlib
+import os
+import threading
+
+from PyQt6.QtCore import QSize
+from PyQt6.QtGui import QImage, QImageReader
+
+from image_classifier.imaging.decoders import fit_size
+
+# Evict down to this fraction of the budget so we don't evict on every write.
+_EVICT_TARGET = 0.9
+
+
+class PreviewDiskCache:
+    """
+    Screen-sized previews stored under a cache directory, keyed by normalized
+    path, file size and mtime, so an edited or replaced file never hits a stale
+    entry.  File mtimes double as LRU timestamps: reads touch the entry and
+    eviction removes the oldest files once ``max_bytes`` is exceeded.
+    Safe to use from loader threads.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @staticmethod
+    def cache_key(image_path: str):
+        """Hash of (normalized path, size, mtime); None if the file is gone."""
+        norm_path = os.path.normcase(os.path.abspath(image_path))
+        try:
+            st = os.stat(norm_path)
+        except OSError:
+            return None
+        raw = f"{norm_path}|{st.st_size}|{st.st_mtime_ns}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _entry_base(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, image_path: str, target_size: QSize):
+        """Return a preview covering ``target_size``, or None on a miss."""
+        key = self.cache_key(image_path)
+        if key is None:
+            return None
+        base = self._entry_base(key)
+        for ext in (".jpg", ".png"):
+            entry = base + ext
+            if not os.path.exists(entry):
+                continue
+            reader = QImageReader(entry)
+            stored = reader.size()
+            # A preview made for a smaller window is not good enough.
+            if stored.width() < target_size.width() and stored.height() < target_size.height():
+                return None
+            scaled = fit_size(stored, target_size)
+            if scaled != stored:
+                reader.setScaledSize(scaled)
+            image = reader.read()
+            if image.isNull():
+                return None
+            try:
+                os.utime(entry)
+            except OSError:
+                pass
+            return image
+        return None
+
+    def put(self, image_path: str, image: QImage) -> bool:
+        """Store a preview; opaque images as JPEG, anything with alpha as PNG."""
+        key = self.cache_key(image_path)
+        if key is None or image.isNull():
+            return False
+        ext, fmt, quality = (
+            (".png", "PNG", -1) if image.hasAlphaChannel() else (".jpg", "JPG", 90)
+        )
+        entry = self._entry_base(key) + ext
+        tmp_path = f"{entry}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            if not image.save(tmp_path, fmt, quality):
+                return False
+            try:
+                # An overwritten entry's bytes leave the total
+                replaced = os.path.getsize(entry)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, entry)
+            size = os.path.getsize(entry)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += size - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return True
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            return self._total_bytes
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, st.st_mtime, st.st_size))
+        return entries
+
+    def _scan_total(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda item: item[1])
+        total = sum(size for _, _, size in entries)
+        limit = self.max_bytes * _EVICT_TARGET
+        for path, _, size in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._total_bytes = total
@@ -0,0 +1,319 @@
+"""Priority scheduler for image loads on a dedicated thread pool."""
+import itertools
+
+from PyQt6.QtCore import QObject, QRunnable, QThread, QThreadPool, pyqtSignal
+
+from image_classifier.imaging.loader import ImageLoaderRunnable
+from image_classifier.imaging.memory import MIB
+
+# Priority classes, most urgent first.
+PRIORITY_VISIBLE = 0
+PRIORITY_NEXT = 1
+PRIORITY_WARMUP = 2
+
+
+class _JobSignals(QObject):
+    done = pyqtSignal(object)
+
+
+class _ScheduledJob(QRunnable):
+    """
+    Runs the wrapped runnable and always reports back, even when cancelled.
+
+    Runnables with a ``read()`` method go through two stages: ``read()`` on a
+    reader thread (returning the bytes it now holds), then ``run()`` on a
+    decode thread.
+    """
+
+    def __init__(self, runnable: QRunnable, priority: int, key, seq: int):
+        super().__init__()
+        # The scheduler holds the reference; don't let the pool delete us.
+        self.setAutoDelete(False)
+        self.runnable = runnable
+        self.priority = priority
+        self.key = key
+        self.seq = seq
+        self.cancelled = False
+        self.reading = callable(getattr(runnable, "read", None))
+        # Encoded bytes held between the two stages
+        self.buffered = 0
+        self.signals = _JobSignals()
+
+    def cancel(self):
+        """Cancel the wrapped runnable; a still-queued job is dropped unstarted."""
+        self.cancelled = True
+        cancel = getattr(self.runnable, "cancel", None)
+        if cancel is not None:
+            cancel()
+
+    def run(self):
+        try:
+            if self.reading:
+                self.buffered = self.runnable.read() or 0
+            else:
+                self.runnable.run()
+        finally:
+            self.signals.done.emit(self)
+
+
+class LoadFuture(QObject):
+    """
+    Result of an image load that any number of callers can wait on.
+
+    Callbacks run in the GUI thread as ``on_finished(pixmap, full_resolution)``
+    or ``on_error(message)``; a callback added after the load finished runs
+    immediately.  A cancelled load never calls back.
+    """
+
+    def __init__(self, runnable: ImageLoaderRunnable, key, parent=None):
+        super().__init__(parent)
+        self.key = key
+        self.job = None
+        self._runnable = runnable
+        self._callbacks = []
+        self._result = None
+        self._error = None
+        runnable.signals.finished.connect(self._on_finished)
+        runnable.signals.error.connect(self._on_error)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.job is not None and self.job.cancelled
+
+    def done(self) -> bool:
+        return self._result is not None or self._error is not None
+
+    def add_done_callback(self, on_finished, on_error=None):
+        if self._result is not None:
+            on_finished(*self._result)
+        elif self._error is not None:
+            if on_error is not None:
+                on_error(self._error)
+        else:
+            self._callbacks.append((on_finished, on_error))
+
+    def cancel(self):
+        """Stop the load for every caller waiting on it."""
+        self._callbacks.clear()
+        if self.job is not None:
+            self.job.cancel()
+
+    def _on_finished(self, pixmap):
+        self._result = (pixmap, self._runnable.full_resolution)
+        callbacks, self._callbacks = self._callbacks, []
+        for on_finished, _ in callbacks:
+            on_finished(*self._result)
+
+    def _on_error(self, message):
+        self._error = message
+        callbacks, self._callbacks = self._callbacks, []
+        for _, on_error in callbacks:
+            if on_error is not None:
+                on_error(message)
+
+
+class LoadScheduler(QObject):
+    """
+    Runs image loads by priority class instead of submission order.
+
+    Jobs wait in our own queues and are handed to private QThreadPools only
+    when a thread is free, so queued work can still be reprioritized or
+    dropped.  Loads are split into a read stage (``max_readers`` threads
+    pulling file bytes) and a decode stage (``max_workers`` threads working
+    from memory), so slow card readers and network shares don't leave decode
+    threads waiting on I/O.  Reads stop running ahead of the decoders once
+    ``read_budget_bytes`` are buffered.  ``reserved_visible`` threads of each
+    stage are kept free of background work so the image on screen never
+    waits behind preloads.  Must be used from the GUI thread.
+    """
+
+    _instance = None
+
+    def __init__(self, max_workers: int = 0, reserved_visible: int = 1,
+                 max_readers: int = 4, read_budget_bytes: int = 256 * MIB, parent=None):
+        super().__init__(parent)
+        self.max_workers = max(2, max_workers or QThread.idealThreadCount())
+        self.reserved_visible = min(reserved_visible, self.max_workers - 1)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(self.max_workers)
+        self._io_pool = QThreadPool(self)
+        self.set_read_limits(max_readers, read_budget_bytes)
+        self._pending_reads = []
+        self._reading = []
+        self._pending = []
+        self._running = []
+        self._buffered_bytes = 0
+        self._seq = itertools.count()
+        self._inflight = {}
+
+    @classmethod
+    def instance(cls) -> "LoadScheduler":
+        """Shared scheduler used by the viewer (created on first use)."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def set_read_limits(self, max_readers: int, read_budget_bytes: int):
+        """Reader thread count and how many encoded bytes may wait for a decoder."""
+        self.max_readers = max(2, max_readers)
+        self.read_budget_bytes = max(0, read_budget_bytes)
+        self._io_pool.setMaxThreadCount(self.max_readers)
+
+    def buffered_bytes(self) -> int:
+        """Encoded bytes read ahead and not yet decoded."""
+        return self._buffered_bytes
+
+    def submit(self, runnable: QRunnable, priority: int = PRIORITY_VISIBLE, key=None):
+        """
+        Queue ``runnable``; ``key`` (usually the image path) is used to find it
+        later.  Returns the job, whose ``cancel()`` also drops it from the queue.
+        """
+        job = _ScheduledJob(runnable, priority, key, next(self._seq))
+        job.signals.done.connect(self._on_job_done)
+        (self._pending_reads if job.reading else self._pending).append(job)
+        self._dispatch()
+        return job
+
+    def load_image(self, image_path: str, target_size=None, priority: int = PRIORITY_VISIBLE):
+        """
+        Load ``image_path`` through the pixmap cache and return a LoadFuture.
+
+        If the same image is already being decoded the existing future is
+        returned (moved up to ``priority`` if that is more urgent) instead of
+        reading the file a second time.  A preview request is also satisfied
+        by a full-resolution load in flight.  Jobs are keyed by the normalized
+        path, or ``(path, "full")`` for full-resolution loads.
+        """
+        norm = ImageLoaderRunnable.normalize_path(image_path)
+        full_key = (norm, "full")
+        key = full_key if target_size is None else norm
+        for candidate in (key, full_key):
+            future = self._inflight.get(candidate)
+            if future is not None and not future.cancelled:
+                self.promote(candidate, priority)
+                return future
+
+        runnable = ImageLoaderRunnable(norm, target_size)
+        future = LoadFuture(runnable, key)
+        self._inflight[key] = future
+        future.job = self.submit(runnable, priority, key)
+        return future
+
+    def promote(self, key, priority: int):
+        """Raise jobs for ``key`` to ``priority``; less urgent requests never demote them."""
+        for job in self._jobs():
+            if job.key == key and job.priority > priority:
+                job.priority = priority
+                job.seq = next(self._seq)
+        self._dispatch()
+
+    def demote(self, key, priority: int = PRIORITY_WARMUP):
+        """
+        Lower jobs for ``key`` to ``priority``, e.g. when the user moved on
+        before the image finished.  Unlike cancel() the decode is kept for the
+        cache and for anyone else waiting on it; retain() can still drop it.
+        """
+        for job in self._jobs():
+            if job.key == key and job.priority < priority:
+                job.priority = priority
+        self._dispatch()
+
+    def reprioritize(self, key, priority: int):
+        """
+        Move jobs for ``key`` that haven't started decoding to ``priority``,
+        behind the jobs already there.
+        """
+        changed = False
+        for job in self._waiting():
+            if job.key == key:
+                job.priority = priority
+                job.seq = next(self._seq)
+                changed = True
+        if changed:
+            self._dispatch()
+
+    def cancel(self, key):
+        """Drop queued jobs for ``key`` and ask running ones to stop."""
+        self._drop(lambda job: job.key == key)
+
+    def retain(self, keys):
+        """Drop every background job whose key is not in ``keys``."""
+        keep = set(keys)
+        self._drop(lambda job: job.priority > PRIORITY_VISIBLE and job.key not in keep)
+
+    def is_scheduled(self, key) -> bool:
+        return any(j.key == key and not j.cancelled for j in self._jobs())
+
+    def pending_keys(self):
+        """Keys that haven't started decoding, in the order they will."""
+        live = [j for j in self._waiting() if not j.cancelled]
+        return [j.key for j in sorted(live, key=self._order)]
+
+    def waitForDone(self, msecs: int = -1) -> bool:
+        return self._io_pool.waitForDone(msecs) and self._pool.waitForDone(msecs)
+
+    @staticmethod
+    def _order(job):
+        return (job.priority, job.seq)
+
+    def _jobs(self):
+        return self._pending_reads + self._reading + self._pending + self._running
+
+    def _waiting(self):
+        return self._pending_reads + self._reading + self._pending
+
+    def _drop(self, predicate):
+        for queue in (self._pending_reads, self._pending):
+            for job in [j for j in queue if predicate(j)]:
+                queue.remove(job)
+                job.cancel()
+                self._release(job)
+        # Started jobs report back through _on_job_done
+        for job in self._reading + self._running:
+            if predicate(job):
+                job.cancel()
+
+    def _release(self, job):
+        """Forget a job that finished or was dropped: its buffer and its future."""
+        self._buffered_bytes -= job.buffered
+        job.buffered = 0
+        future = self._inflight.get(job.key)
+        if future is not None and future.job is job:
+            del self._inflight[job.key]
+
+    def _dispatch(self):
+        for queue in (self._pending_reads, self._pending):
+            for job in [j for j in queue if j.cancelled]:
+                queue.remove(job)
+                self._release(job)
+        self._start(self._pending_reads, self._reading, self._io_pool, self.max_readers)
+        self._start(self._pending, self._running, self._pool, self.max_workers)
+
+    def _start(self, queue, active, pool, limit):
+        reserved = min(self.reserved_visible, limit - 1)
+        while queue and len(active) < limit:
+            job = min(queue, key=self._order)
+            if job.priority > PRIORITY_VISIBLE:
+                background = sum(1 for j in active if j.priority > PRIORITY_VISIBLE)
+                if background >= limit - reserved:
+                    return
+                if active is self._reading and self._buffered_bytes >= self.read_budget_bytes:
+                    return
+            queue.remove(job)
+            active.append(job)
+            pool.start(job)
+
+    def _on_job_done(self, job):
+        if job in self._reading:
+            self._reading.remove(job)
+            # Count the bytes first so _release() can give them back
+            self._buffered_bytes += job.buffered
+            if job.cancelled:
+                self._release(job)
+            else:
+                job.reading = False
+                self._pending.append(job)
+        elif job in self._running:
+            self._running.remove(job)
+            self._release(job)
+        self._dispatch()
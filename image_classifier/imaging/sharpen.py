@@ -1,42 +1,164 @@
 """LAB unsharp mask via OpenCV."""
+import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import cv2
 import numpy as np
+from PyQt6.QtCore import QThread
 from PyQt6.QtGui import QPixmap, QImage
 
+# Edge of the square tiles sharpen_tiled() works in, halo excluded
+TILE_SIZE = 1024
+
+
+def _rgba_array(image: QImage, writable: bool = True):
+    """
+    ``(image, array)``: ``image`` as RGBA8888 and an (h, w, 4) view of it;
+    read-only views don't detach (copy) an image that is already RGBA8888.
+    """
+    image = image.convertToFormat(QImage.Format.Format_RGBA8888)
+    w, h = image.width(), image.height()
+    ptr = image.bits() if writable else image.constBits()
+    ptr.setsize(h * image.bytesPerLine())
+    arr = np.frombuffer(ptr, np.uint8).reshape(h, image.bytesPerLine() // 4, 4)[:, :w]
+    return image, arr
+
+
+class SharpenSession:
+    """
+    Sharpens one image again and again with changing settings, as a slider
+    preview does.  The LAB split and the float L plane are made once; each
+    ``(radius, threshold)`` gets one cached detail plane (both unsharp
+    differences, thresholded and weighted), so a change of ``amount`` alone
+    is a single blend plus the conversion back, into buffers allocated once.
+    Up to ``max_details`` detail planes (4 bytes per pixel each) are kept.
+    ``image`` is a QImage or an (h, w, 4) RGBA array.  Not thread-safe;
+    use one session per thread.
+    """
+
+    def __init__(self, image, max_details: int = 2):
+        if isinstance(image, QImage):
+            _, arr = _rgba_array(image, writable=False)
+        else:
+            arr = image
+        h, w = arr.shape[:2]
+
+        bgr = cv2.cvtColor(arr, cv2.COLOR_RGBA2BGR)
+        self._lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)
+        self._Lf = self._lab[..., 0].astype(np.float32)
+        self._bgr = bgr
+        self._rgba = np.empty((h, w, 4), np.uint8)
+        self._blend_buffer = np.empty((h, w), np.float32)
+        self._L8 = np.empty((h, w), np.uint8)
+        self._details = OrderedDict()
+        self.max_details = max(1, max_details)
+        self.size = (w, h)
+
+    def _blur_diff(self, r: float):
+        k = max(1, 2 * math.ceil(r) + 1)
+        diff = cv2.GaussianBlur(self._Lf, (k, k), sigmaX=r)
+        np.subtract(self._Lf, diff, out=diff)
+        return diff
+
+    def _detail(self, radius: float, threshold: int):
+        key = (radius, threshold)
+        detail = self._details.get(key)
+        if detail is not None:
+            self._details.move_to_end(key)
+            return detail
+        detail = self._blur_diff(radius)
+        diff2 = self._blur_diff(radius * 2)
+        if threshold > 0:
+            detail[np.abs(detail) < threshold] = 0
+            diff2[np.abs(diff2) < threshold] = 0
+        # L + amount * diff1 + (amount / 2) * diff2 == L + amount * detail
+        diff2 *= 0.5
+        detail += diff2
+        self._details[key] = detail
+        while len(self._details) > self.max_details:
+            self._details.popitem(last=False)
+        return detail
+
+    def sharpen(self, radius: float, amount: float, threshold: int = 2) -> QImage:
+        """
+        Unsharp mask on the L channel at ``radius`` and twice that.
+        ``radius`` may be fractional, e.g. scaled down for a proxy.
+        """
+        rgba = self.sharpen_array(radius, amount, threshold)
+        w, h = self.size
+        return QImage(rgba.data, w, h, QImage.Format.Format_RGBA8888).copy()
+
+    def sharpen_array(self, radius: float, amount: float, threshold: int = 2):
+        """As ``sharpen()``, as an RGBA array owned by the session (valid until the next call)."""
+        detail = self._detail(radius, threshold)
+        blended = self._blend_buffer
+        cv2.scaleAdd(detail, amount, self._Lf, dst=blended)
+        np.clip(blended, 0, 255, out=blended)
+        np.copyto(self._L8, blended, casting="unsafe")
+        cv2.insertChannel(self._L8, self._lab, 0)
+        cv2.cvtColor(self._lab, cv2.COLOR_LAB2BGR, dst=self._bgr)
+        cv2.cvtColor(self._bgr, cv2.COLOR_BGR2RGBA, dst=self._rgba)
+        return self._rgba
+
+
+def sharpen_tiled(image: QImage, radius: float, amount: float, threshold: int = 2,
+                  tile_size: int = TILE_SIZE, workers: int | None = None,
+                  progress=None, cancelled=None):
+    """
+    ``sharpen_image`` in tiles of ``tile_size`` pixels, each read with a
+    halo as wide as the larger blur so the result is identical, sharpened
+    on ``workers`` threads (default: one per core) straight into the output
+    image.  Besides input and output, memory stays at a few dozen bytes per
+    tile pixel per worker, whatever the image size.
+
+    ``progress(percent)`` is called as tiles finish and ``cancelled()``
+    before each one; once it returns True the remaining tiles are skipped
+    and None is returned.  Both are called from the calling thread.
+    """
+    source, src = _rgba_array(image, writable=False)
+    h, w = src.shape[:2]
+    result = QImage(w, h, QImage.Format.Format_RGBA8888)
+    result, dst = _rgba_array(result)
+    # GaussianBlur's kernel reaches ceil(sigma) pixels at the sizes used here
+    halo = math.ceil(radius * 2)
+    tiles = [(x, y, min(x + tile_size, w), min(y + tile_size, h))
+             for y in range(0, h, tile_size) for x in range(0, w, tile_size)]
+
+    def run(tile):
+        if cancelled is not None and cancelled():
+            return
+        x0, y0, x1, y1 = tile
+        hx0, hy0 = max(0, x0 - halo), max(0, y0 - halo)
+        hx1, hy1 = min(w, x1 + halo), min(h, y1 + halo)
+        session = SharpenSession(src[hy0:hy1, hx0:hx1], max_details=1)
+        rgba = session.sharpen_array(radius, amount, threshold)
+        dst[y0:y1, x0:x1] = rgba[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+
+    workers = max(1, min(workers or QThread.idealThreadCount(), len(tiles)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, tile) for tile in tiles]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if cancelled is not None and cancelled():
+                for pending in futures:
+                    pending.cancel()
+                return None
+            if progress is not None:
+                progress(done * 100 // len(tiles))
+    return result
+
+
+def sharpen_image(image: QImage, radius: float, amount: float, threshold: int = 2) -> QImage:
+    """
+    Unsharp mask on the L channel at ``radius`` and twice that, as
+    ``sharpen_cv2``.  ``radius`` may be fractional, e.g. scaled down to
+    preview the effect on a downsized proxy.  Works in tiles (see
+    ``sharpen_tiled``), so huge images don't need gigabytes of scratch
+    memory.  Safe to call off the GUI thread.
+    """
+    return sharpen_tiled(image, radius, amount, threshold)
+
 
-def sharpen_cv2(pixmap: QPixmap, radius: int, amount: float, threshold: int = 2) -> QPixmap:
-    qimg = pixmap.toImage().convertToFormat(QImage.Format.Format_RGBA8888)
-    w, h = qimg.width(), qimg.height()
-    ptr = qimg.bits()
-    ptr.setsize(w * h * 4)
-    arr = np.frombuffer(ptr, np.uint8).reshape(h, w, 4)
-
-    bgr = cv2.cvtColor(arr, cv2.COLOR_RGBA2BGR)
-    lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)
-    L, A, B = cv2.split(lab)
-    Lf = L.astype(np.float32)
-
-    def blur_L(Lf, r):
-        k = max(1, 2 * r + 1)
-        return cv2.GaussianBlur(Lf, (k, k), sigmaX=r)
-
-    blur1 = blur_L(Lf, radius)
-    blur2 = blur_L(Lf, radius * 2)
-    diff1 = Lf - blur1
-    diff2 = Lf - blur2
-
-    if threshold > 0:
-        m1 = np.abs(diff1)
-        m2 = np.abs(diff2)
-        mask1 = (m1.max(axis=2 if m1.ndim == 3 else 1) if m1.ndim == 3 else m1) >= threshold
-        mask2 = (m2.max(axis=2 if m2.ndim == 3 else 1) if m2.ndim == 3 else m2) >= threshold
-        diff1[~mask1] = 0
-        diff2[~mask2] = 0
-
-    L_new = Lf + amount * diff1 + (amount * 0.5) * diff2
-    L_clipped = np.clip(L_new, 0, 255).astype(np.uint8)
-    lab_new = cv2.merge([L_clipped, A, B])
-    bgr_new = cv2.cvtColor(lab_new, cv2.COLOR_LAB2BGR)
-    rgba = cv2.cvtColor(bgr_new, cv2.COLOR_BGR2RGBA)
-    qimg2 = QImage(rgba.data, w, h, QImage.Format.Format_RGBA8888)
-    return QPixmap.fromImage(qimg2.copy())
+def sharpen_cv2(pixmap: QPixmap, radius: float, amount: float, threshold: int = 2) -> QPixmap:
+    return QPixmap.fromImage(sharpen_image(pixmap.toImage(), radius, amount, threshold))
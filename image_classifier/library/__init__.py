@@ -0,0 +1,27 @@
+# Folder indexing for Image Classifier
+from image_classifier.library.catalog import Catalog
+from image_classifier.library.index import DirectoryIndex, IndexDelta, IndexSnapshot, LibraryIndex
+from image_classifier.library.marks import read_marks, write_marks
+from image_classifier.library.marks_writer import MarksWriter
+from image_classifier.library.paths import PathList, PathMapping, PathTable
+from image_classifier.library.view import FilteredView, ImageView, MarkSet, RankBitset
+from image_classifier.library.watcher import DirectoryWatcher
+
+__all__ = [
+    "Catalog",
+    "DirectoryIndex",
+    "IndexDelta",
+    "IndexSnapshot",
+    "LibraryIndex",
+    "read_marks",
+    "write_marks",
+    "MarksWriter",
+    "PathList",
+    "PathMapping",
+    "PathTable",
+    "DirectoryWatcher",
+    "FilteredView",
+    "ImageView",
+    "MarkSet",
+    "RankBitset",
+]
@@ -0,0 +1,261 @@
+"""Optional SQLite catalog of listings, marks and unsaved edits across folders."""
+import os
+import sqlite3
+import threading
+import time
+
+from image_classifier.library.marks import read_marks as read_marks_file
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    original TEXT NOT NULL,
+    scanned_at REAL,
+    marks_saved INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS images (
+    folder_id INTEGER NOT NULL REFERENCES folders(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    original_name TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    favorite INTEGER NOT NULL DEFAULT 0,
+    compare INTEGER NOT NULL DEFAULT 0,
+    rotation INTEGER NOT NULL DEFAULT 0,
+    brightness REAL NOT NULL DEFAULT 1.0,
+    PRIMARY KEY (folder_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS images_favorite ON images(folder_id) WHERE favorite;
+CREATE INDEX IF NOT EXISTS images_compare ON images(folder_id) WHERE compare;
+CREATE INDEX IF NOT EXISTS images_edited ON images(folder_id)
+    WHERE rotation != 0 OR brightness != 1.0;
+"""
+
+# Rows that hold nothing any more: not listed, not marked, not edited
+_EMPTY_ROWS = """
+DELETE FROM images WHERE folder_id = ? AND size IS NULL AND NOT favorite AND NOT compare
+    AND rotation = 0 AND brightness = 1.0
+"""
+
+_MARK_COLUMNS = {"favorites": "favorite", "compare": "compare"}
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+class Catalog:
+    """
+    One database (in the config folder) for every folder opened: the last
+    listing of each folder with sizes and dates, favorite and compare marks,
+    and rotation / brightness not yet saved into the files.
+
+    Runs in WAL mode with a connection for reads and one for writes, so
+    lookups from the GUI or a scanner thread don't wait for a write in
+    progress on the writer thread.  Each connection is guarded by its own
+    lock and may be used from any thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer = self._connect()
+        with self._write_lock, self._writer:
+            self._writer.executescript(SCHEMA)
+        self._reader = self._connect()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        return connection
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+        with self._read_lock:
+            self._reader.close()
+
+    def _query(self, sql, params=()):
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _scope(roots, recursive: bool):
+        """SQL condition and parameters selecting the folders of ``roots``."""
+        clauses, params = [], []
+        for root in roots:
+            norm_root = _norm(root)
+            clauses.append("folders.path = ?")
+            params.append(norm_root)
+            if recursive:
+                prefix = os.path.join(norm_root, "")
+                clauses.append("substr(folders.path, 1, ?) = ?")
+                params.extend((len(prefix), prefix))
+        return "(" + " OR ".join(clauses or ["0"]) + ")", params
+
+    def listing(self, roots, recursive: bool = False):
+        """
+        The stored listing of ``roots`` (and with ``recursive`` the folders
+        below them) as ``(records, folders)``, in the form of
+        ``scan_records`` so it can be merged into an index.  Only folders
+        listed completely before are included.
+        """
+        scope, params = self._scope(roots, recursive)
+        folders = [row[0] for row in self._query(
+            f"SELECT original FROM folders WHERE scanned_at IS NOT NULL AND {scope}", params)]
+        records = []
+        for original, name, size, mtime in self._query(
+                "SELECT folders.original, images.original_name, images.size, images.mtime "
+                "FROM images JOIN folders ON folders.id = images.folder_id "
+                f"WHERE folders.scanned_at IS NOT NULL AND images.size IS NOT NULL AND {scope}",
+                params):
+            original_path = os.path.join(original, name)
+            records.append((os.path.normcase(original_path), original_path, name, size, mtime))
+        return records, folders
+
+    def marked(self, mark: str, roots=None, recursive: bool = True):
+        """
+        Normalized paths marked ``mark`` (``"favorites"`` or ``"compare"``)
+        in every folder, or only under ``roots``.
+        """
+        column = _MARK_COLUMNS[mark]
+        scope, params = self._scope(roots, recursive) if roots is not None else ("1", [])
+        return {
+            os.path.join(path, name) for path, name in self._query(
+                "SELECT folders.path, images.name FROM images "
+                "JOIN folders ON folders.id = images.folder_id "
+                f"WHERE images.{column} AND {scope}", params)
+        }
+
+    def read_marks(self, directory: str):
+        """
+        ``(favorites, compare)`` of ``directory`` like ``marks.read_marks``.
+        Folders whose marks were never stored here are read from their
+        Favorites.json, which is imported; after that the catalog is used.
+        """
+        norm_dir = _norm(directory)
+        rows = self._query("SELECT marks_saved FROM folders WHERE path = ?", (norm_dir,))
+        if not rows or not rows[0][0]:
+            favorites, compare = read_marks_file(directory)
+            self.store_marks(directory, favorites, compare)
+            return favorites, compare
+        favorites, compare = set(), set()
+        for name, favorite, compare_mark in self._query(
+                "SELECT images.name, images.favorite, images.compare FROM images "
+                "JOIN folders ON folders.id = images.folder_id "
+                "WHERE folders.path = ? AND (images.favorite OR images.compare)", (norm_dir,)):
+            path = os.path.join(norm_dir, name)
+            if favorite:
+                favorites.add(path)
+            if compare_mark:
+                compare.add(path)
+        return favorites, compare
+
+    def edits(self, roots, recursive: bool = False):
+        """``{norm_path: (rotation, brightness)}`` of unsaved edits under ``roots``."""
+        scope, params = self._scope(roots, recursive)
+        return {
+            os.path.join(path, name): (rotation, brightness)
+            for path, name, rotation, brightness in self._query(
+                "SELECT folders.path, images.name, images.rotation, images.brightness "
+                "FROM images JOIN folders ON folders.id = images.folder_id "
+                f"WHERE (images.rotation != 0 OR images.brightness != 1.0) AND {scope}", params)
+        }
+
+    def _folder_id(self, cursor, directory: str) -> int:
+        norm_dir = _norm(directory)
+        cursor.execute("INSERT INTO folders (path, original) VALUES (?, ?) "
+                       "ON CONFLICT(path) DO NOTHING", (norm_dir, os.path.abspath(directory)))
+        return cursor.execute("SELECT id FROM folders WHERE path = ?", (norm_dir,)).fetchone()[0]
+
+    def _upsert_names(self, cursor, folder_id: int, paths):
+        cursor.executemany(
+            "INSERT INTO images (folder_id, name, original_name) VALUES (?, ?, ?) "
+            "ON CONFLICT(folder_id, name) DO NOTHING",
+            [(folder_id, os.path.normcase(os.path.basename(p)), os.path.basename(p))
+             for p in paths])
+
+    def store_listing(self, folders, records):
+        """
+        Replace the stored listing of each of ``folders`` with ``records``
+        (``scan_records`` tuples); marks and edits are kept.
+        """
+        by_folder = {_norm(folder): (folder, []) for folder in folders}
+        for record in records:
+            entry = by_folder.get(os.path.dirname(record[0]))
+            if entry is not None:
+                entry[1].append(record)
+        now = time.time()
+        with self._write_lock, self._writer:
+            cursor = self._writer.cursor()
+            for folder, folder_records in by_folder.values():
+                folder_id = self._folder_id(cursor, folder)
+                cursor.execute("UPDATE images SET size = NULL, mtime = NULL WHERE folder_id = ?",
+                               (folder_id,))
+                cursor.executemany(
+                    "INSERT INTO images (folder_id, name, original_name, size, mtime) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT(folder_id, name) DO UPDATE SET "
+                    "original_name = excluded.original_name, size = excluded.size, "
+                    "mtime = excluded.mtime",
+                    [(folder_id, os.path.normcase(name), name, size, mtime)
+                     for _, _, name, size, mtime in folder_records])
+                cursor.execute("UPDATE folders SET scanned_at = ? WHERE id = ?", (now, folder_id))
+                cursor.execute(_EMPTY_ROWS, (folder_id,))
+
+    def store_marks(self, directory: str, favorites, compare):
+        """Replace the marks of ``directory``."""
+        with self._write_lock, self._writer:
+            cursor = self._writer.cursor()
+            folder_id = self._folder_id(cursor, directory)
+            cursor.execute("UPDATE images SET favorite = 0, compare = 0 WHERE folder_id = ?",
+                           (folder_id,))
+            for column, paths in (("favorite", favorites), ("compare", compare)):
+                self._upsert_names(cursor, folder_id, paths)
+                cursor.executemany(
+                    f"UPDATE images SET {column} = 1 WHERE folder_id = ? AND name = ?",
+                    [(folder_id, os.path.normcase(os.path.basename(p))) for p in paths])
+            cursor.execute("UPDATE folders SET marks_saved = 1 WHERE id = ?", (folder_id,))
+            cursor.execute(_EMPTY_ROWS, (folder_id,))
+
+    def apply_marks(self, directory: str, changes):
+        """Apply ``(mark, norm_path, value)`` changes to the marks of ``directory``."""
+        with self._write_lock, self._writer:
+            cursor = self._writer.cursor()
+            folder_id = self._folder_id(cursor, directory)
+            self._upsert_names(cursor, folder_id, [path for _, path, value in changes if value])
+            for mark, path, value in changes:
+                cursor.execute(
+                    f"UPDATE images SET {_MARK_COLUMNS[mark]} = ? WHERE folder_id = ? AND name = ?",
+                    (int(bool(value)), folder_id, os.path.normcase(os.path.basename(path))))
+            cursor.execute("UPDATE folders SET marks_saved = 1 WHERE id = ?", (folder_id,))
+            cursor.execute(_EMPTY_ROWS, (folder_id,))
+
+    def store_edits(self, folders, rotations, brightness):
+        """
+        Replace the unsaved edits of ``folders`` with those in ``rotations``
+        and ``brightness`` (normalized path -> angle / factor).
+        """
+        edits = {}
+        for path, angle in rotations.items():
+            if angle:
+                edits.setdefault(os.path.dirname(path), {})[path] = [angle, 1.0]
+        for path, factor in brightness.items():
+            if factor != 1.0:
+                edits.setdefault(os.path.dirname(path), {}).setdefault(path, [0, 1.0])[1] = factor
+        with self._write_lock, self._writer:
+            cursor = self._writer.cursor()
+            for folder in folders:
+                folder_id = self._folder_id(cursor, folder)
+                cursor.execute("UPDATE images SET rotation = 0, brightness = 1.0 "
+                               "WHERE folder_id = ?", (folder_id,))
+                folder_edits = edits.get(_norm(folder), {})
+                self._upsert_names(cursor, folder_id, folder_edits)
+                cursor.executemany(
+                    "UPDATE images SET rotation = ?, brightness = ? WHERE folder_id = ? AND name = ?",
+                    [(angle, factor, folder_id, os.path.normcase(os.path.basename(path)))
+                     for path, (angle, factor) in folder_edits.items()])
+                cursor.execute(_EMPTY_ROWS, (folder_id,))
@@ -0,0 +1,489 @@
+"""Sorted image lists for a folder or a library of folders, updated in place from file deltas."""
+import bisect
+import os
+from array import array
+
+from image_classifier.library.paths import PathList, PathMapping, PathTable
+from image_classifier.ui.widgets import ALLOWED_EXTENSIONS
+
+# When a sync finds more changes than this share of the folder, a full
+# rescan is cheaper than applying them one by one.
+RESCAN_FRACTION = 0.5
+
+
+def normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def is_image_name(name: str) -> bool:
+    return name.lower().endswith(ALLOWED_EXTENSIONS)
+
+
+def stat_record(name: str, original_path: str, entry=None):
+    """
+    ``(norm_path, original_path, name, size, mtime)`` for one file, or None
+    if it vanished before we could stat it.
+    """
+    try:
+        stat_result = entry.stat() if entry is not None else os.stat(original_path)
+    except OSError:
+        return None
+    return (os.path.normcase(original_path), original_path, name,
+            stat_result.st_size, stat_result.st_mtime)
+
+
+def iter_folder(directory: str, recursive: bool = False):
+    """
+    Yield ``(record, None)`` for each image directly in ``directory`` and,
+    when ``recursive``, ``(None, path)`` for each subfolder (symlinked
+    folders are skipped so links can't loop), as the listing is read.
+    """
+    with os.scandir(directory) as scanner:
+        for entry in scanner:
+            try:
+                if recursive and entry.is_dir(follow_symlinks=False):
+                    yield None, os.path.abspath(entry.path)
+                    continue
+                if not entry.is_file() or not is_image_name(entry.name):
+                    continue
+            except OSError:
+                continue
+            record = stat_record(entry.name, os.path.abspath(entry.path), entry)
+            if record is not None:
+                yield record, None
+
+
+def list_folder(directory: str, recursive: bool = False):
+    """``(records, subfolders)`` of ``directory``; see ``iter_folder``."""
+    records = []
+    subfolders = []
+    for record, subfolder in iter_folder(directory, recursive):
+        if record is not None:
+            records.append(record)
+        else:
+            subfolders.append(subfolder)
+    return records, subfolders
+
+
+def scan_records(directory: str, recursive: bool = False, folders=None):
+    """
+    Yield a file record (see ``stat_record``) per image in ``directory``
+    (and its subfolders when ``recursive``), unsorted.  Every folder read is
+    appended to ``folders`` if given.  Unreadable subfolders are skipped.
+    """
+    top = os.path.abspath(directory)
+    pending = [top]
+    while pending:
+        folder = pending.pop()
+        try:
+            records, subfolders = list_folder(folder, recursive)
+        except OSError:
+            if folder == top:
+                raise
+            continue
+        if folders is not None:
+            folders.append(folder)
+        pending.extend(subfolders)
+        yield from records
+
+
+class IndexDelta:
+    """
+    Normalized paths added to and removed from an index by one update, and
+    the folders that appeared or went away with them.
+    """
+
+    def __init__(self, added=(), removed=(), folders=()):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.folders = list(folders)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.folders)
+
+    def __repr__(self):
+        return (f"IndexDelta(added={self.added!r}, removed={self.removed!r}, "
+                f"folders={self.folders!r})")
+
+
+class IndexSnapshot:
+    """
+    The images of an index at one ``version``: ``paths`` in display order
+    (a PathList over the index's path table) and a read-only
+    ``norm_to_original`` of just those paths.  Every caller shares the same
+    snapshot until the index changes; its paths never change afterwards.
+    """
+
+    __slots__ = ("version", "paths", "norm_to_original")
+
+    def __init__(self, version: int, paths: PathList):
+        self.version = version
+        self.paths = paths
+        self.norm_to_original = PathMapping(paths.table, paths.table.original_path, paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def records(self):
+        """Records (see ``stat_record``) of the images in order, built as iterated."""
+        table = self.paths.table
+        return (table.record(file_id) for file_id in self.paths.ids)
+
+
+def merge_sorted(order, ids, key):
+    """
+    ``order`` (file IDs sorted by ``key``) with ``ids`` merged in, as a new
+    array.  Each new ID is placed with a binary search, so ``key`` runs
+    O(k log n) times rather than once per file.
+    """
+    merged = array("i")
+    start = 0
+    for file_id in sorted(ids, key=key):
+        position = bisect.bisect_left(order, key(file_id), start, key=key)
+        merged.extend(order[start:position])
+        merged.append(file_id)
+        start = position
+    merged.extend(order[start:])
+    return merged
+
+
+class DirectoryIndex:
+    """
+    The images of one folder in sort order, plus ``norm_to_original``.
+
+    The folder is scanned once and the name, size and date of every image
+    kept in a PathTable, so switching or reversing the sort is done in
+    memory: each sort key's order (an array of file IDs) is built on first
+    use and cached.  Afterwards single files are added or removed with a
+    binary search in every cached order instead of rescanning, and
+    ``sync()`` brings the index up to date after changes made outside the
+    app by diffing the folder listing (no per-file ``stat()`` except for
+    new files).  With ``scan=False`` the index starts empty and is filled
+    with ``merge()``, e.g. from a background scan.
+    """
+
+    recursive = False
+
+    def __init__(self, directory: str, sort_option: str = "file_name", ascending: bool = True,
+                 scan: bool = True):
+        self.directory = os.path.abspath(directory)
+        self.norm_dir = normalize_path(directory)
+        self.roots = [self.directory]
+        self._norm_roots = [self.norm_dir]
+        self.sort_option = sort_option
+        self.ascending = bool(ascending)
+        self._table = PathTable()
+        # normalized folder -> folder path, for every folder listed
+        self._folders = {}
+        # sort option -> file IDs in ascending key order
+        self._orders = {}
+        # Bumped whenever images() would return something else
+        self.version = 0
+        self._snapshot = None
+        if scan:
+            self.rescan()
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, path):
+        return self._live_id(path) is not None
+
+    @property
+    def norm_to_original(self):
+        """Read-only normalized path -> original path of every image."""
+        return PathMapping(self._table, self._table.original_path)
+
+    def images(self):
+        """Normalized paths in display order (a new list)."""
+        order = self._order(self.sort_option)
+        norm_path = self._table.norm_path
+        return [norm_path(file_id) for file_id in (order if self.ascending else reversed(order))]
+
+    def snapshot(self) -> IndexSnapshot:
+        """
+        The current images as an IndexSnapshot, built once per ``version``.
+        It holds the file IDs in display order (4 bytes per image); paths
+        are built from the shared path table when read.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != self.version:
+            order = self._order(self.sort_option)
+            ids = array("i", order if self.ascending else reversed(order))
+            snapshot = IndexSnapshot(self.version, PathList(self._table, ids))
+            self._snapshot = snapshot
+        return snapshot
+
+    def record(self, path: str):
+        """``(norm_path, original_path, name, size, mtime)`` or None."""
+        file_id = self._live_id(normalize_path(path))
+        return self._table.record(file_id) if file_id is not None else None
+
+    def records(self):
+        """Read-only normalized path -> record for every image, built on lookup."""
+        return PathMapping(self._table, self._table.record)
+
+    def folders(self):
+        """Every folder the index was built from, e.g. to watch them."""
+        return list(self._folders.values())
+
+    def accepts(self, folder: str) -> bool:
+        """Whether images in ``folder`` belong in this index."""
+        norm_folder = normalize_path(folder)
+        if norm_folder in self._norm_roots:
+            return True
+        return self.recursive and any(
+            norm_folder.startswith(os.path.join(root, "")) for root in self._norm_roots
+        )
+
+    def set_sort(self, sort_option: str, ascending: bool):
+        """Change the order; never touches the disk."""
+        if (sort_option, bool(ascending)) != (self.sort_option, self.ascending):
+            self.version += 1
+        self.sort_option = sort_option
+        self.ascending = bool(ascending)
+
+    def rescan(self):
+        """Rebuild from a full directory scan."""
+        records = []
+        folders = []
+        for root in self.roots:
+            records.extend(scan_records(root, self.recursive, folders))
+        self._reset()
+        self.merge(records, folders)
+
+    def merge(self, records, folders=()):
+        """
+        Add file records (see ``scan_records``) and the folders they were
+        listed from; paths already present with the same size and date are
+        skipped, changed ones re-sorted.  Returns the normalized paths that
+        were added or changed.
+        """
+        for folder in folders:
+            self._folder(folder)
+        table = self._table
+        records = [r for r in records if not table.same(r)]
+        if not records:
+            return []
+        self._drop_ids([file_id for file_id in (self._live_id(r[0]) for r in records)
+                        if file_id is not None])
+        self.version += 1
+        ids = {}
+        for record in records:
+            ids[table.add(record)] = None
+            self._folder(os.path.dirname(record[1]))
+        for sort_option, order in self._orders.items():
+            self._orders[sort_option] = merge_sorted(order, ids, table.sort_key(sort_option))
+        return [record[0] for record in records]
+
+    def add(self, path: str) -> bool:
+        """
+        Insert (or re-position, if its size or date changed) one file.
+        Returns False if it is not an image of this index or is gone.
+        """
+        original_path = os.path.abspath(path)
+        name = os.path.basename(original_path)
+        if not is_image_name(name) or not self.accepts(os.path.dirname(original_path)):
+            return False
+        if not os.path.isfile(original_path):
+            return False
+        record = stat_record(name, original_path)
+        if record is None:
+            return False
+        file_id = self._live_id(record[0])
+        if file_id is not None:
+            self._discard(file_id)
+        self.version += 1
+        file_id = self._table.add(record)
+        self._folder(os.path.dirname(original_path))
+        for sort_option, order in self._orders.items():
+            key = self._table.sort_key(sort_option)
+            order.insert(bisect.bisect_left(order, key(file_id), key=key), file_id)
+        return True
+
+    def retain(self, paths, folders):
+        """
+        Keep only the images in ``paths`` (normalized) and the folders in
+        ``folders``, e.g. once a fresh scan has replaced a cached listing.
+        Returns the paths dropped.
+        """
+        paths = set(paths)
+        keep = {normalize_path(folder) for folder in folders}
+        for norm_folder in [norm for norm in self._folders if norm not in keep]:
+            del self._folders[norm_folder]
+        norm_path = self._table.norm_path
+        stale = [file_id for file_id in self._table.ids() if norm_path(file_id) not in paths]
+        self._drop_ids(stale)
+        return [norm_path(file_id) for file_id in stale]
+
+    def remove(self, path: str) -> bool:
+        file_id = self._live_id(normalize_path(path))
+        if file_id is None:
+            return False
+        self._discard(file_id)
+        return True
+
+    def sync(self, folder: str | None = None) -> IndexDelta:
+        """
+        Apply files added to or removed from ``folder`` (by default the
+        index's own folder) since it was last listed, and in recursive
+        indexes subfolders that appeared or went away.  Many changes are
+        applied by relisting the folder; a folder that can't be listed any
+        more is dropped with everything in it.
+        """
+        folder = os.path.abspath(folder or self.directory)
+        norm_folder = os.path.normcase(folder)
+        try:
+            listed = {}
+            subfolders = {}
+            with os.scandir(folder) as scanner:
+                for entry in scanner:
+                    try:
+                        if self.recursive and entry.is_dir(follow_symlinks=False):
+                            original_path = os.path.abspath(entry.path)
+                            subfolders[os.path.normcase(original_path)] = original_path
+                        elif entry.is_file() and is_image_name(entry.name):
+                            original_path = os.path.abspath(entry.path)
+                            listed[os.path.normcase(original_path)] = original_path
+                    except OSError:
+                        continue
+        except OSError:
+            dropped = [path for norm, path in self._folders.items()
+                       if self._is_within(norm, norm_folder)]
+            return IndexDelta(removed=self._drop_folder(norm_folder), folders=dropped)
+
+        self._folder(folder)
+        known = {self._table.norm_path(file_id): file_id
+                 for file_id in self._table.ids_in(norm_folder)}
+        added = [p for p in listed if p not in known]
+        removed = [p for p in known if p not in listed]
+        if len(added) + len(removed) > max(16, len(known) * RESCAN_FRACTION):
+            self._drop_ids([known[p] for p in removed])
+            new_paths = set(added)
+            records, _ = list_folder(folder)
+            added = self.merge([r for r in records if r[0] in new_paths])
+        else:
+            for norm_path in removed:
+                self._discard(known[norm_path])
+            added = [p for p in added if self.add(listed[p])]
+
+        changed_folders = []
+        if self.recursive:
+            children = {norm for norm in self._folders
+                        if os.path.dirname(norm) == norm_folder and norm != norm_folder}
+            for norm_child in children - subfolders.keys():
+                changed_folders.append(self._folders[norm_child])
+                changed_folders.extend(path for norm, path in self._folders.items()
+                                       if norm != norm_child and self._is_within(norm, norm_child))
+                removed.extend(self._drop_folder(norm_child))
+            for norm_child in subfolders.keys() - children:
+                new_folders = []
+                try:
+                    records = list(scan_records(subfolders[norm_child], True, new_folders))
+                except OSError:
+                    continue
+                added.extend(self.merge(records, new_folders))
+                changed_folders.extend(new_folders)
+        return IndexDelta(added, removed, changed_folders)
+
+    @staticmethod
+    def _is_within(norm_path: str, norm_folder: str) -> bool:
+        return norm_path == norm_folder or norm_path.startswith(os.path.join(norm_folder, ""))
+
+    def _reset(self):
+        self._table = PathTable()
+        self._folders, self._orders = {}, {}
+        self.version += 1
+
+    def _live_id(self, norm_path: str):
+        file_id = self._table.find(norm_path)
+        return file_id if file_id is not None and self._table.alive(file_id) else None
+
+    def _folder(self, folder: str):
+        norm_folder = os.path.normcase(folder)
+        if norm_folder not in self._folders:
+            self._folders[norm_folder] = folder
+
+    def _drop_folder(self, norm_folder: str):
+        """Forget ``norm_folder`` and its subfolders; returns the paths removed."""
+        gone = [norm for norm in self._folders if self._is_within(norm, norm_folder)]
+        ids = []
+        for norm in gone:
+            ids.extend(self._table.ids_in(norm))
+        self._drop_ids(ids)
+        for norm in gone:
+            del self._folders[norm]
+        return [self._table.norm_path(file_id) for file_id in ids]
+
+    def _drop_ids(self, ids):
+        if ids and len(ids) * 2 > len(self._table):
+            # Cheaper to rebuild the cached orders on next use
+            self._orders = {}
+        for file_id in ids:
+            self._discard(file_id)
+
+    def _order(self, sort_option: str):
+        order = self._orders.get(sort_option)
+        if order is None:
+            order = array("i", sorted(self._table.ids(), key=self._table.sort_key(sort_option)))
+            self._orders[sort_option] = order
+        return order
+
+    def _discard(self, file_id: int):
+        self.version += 1
+        for sort_option, order in self._orders.items():
+            key = self._table.sort_key(sort_option)
+            del order[bisect.bisect_left(order, key(file_id), key=key)]
+        self._table.remove(file_id)
+
+
+class LibraryIndex(DirectoryIndex):
+    """
+    Several root folders, and with ``recursive`` every folder below them,
+    as one sorted image list.  Marks and lookups stay keyed by file path.
+    """
+
+    def __init__(self, roots, sort_option: str = "file_name", ascending: bool = True,
+                 recursive: bool = True, scan: bool = True):
+        roots = unique_roots(roots, recursive)
+        super().__init__(roots[0], sort_option, ascending, scan=False)
+        self.recursive = recursive
+        self.roots = roots
+        self._norm_roots = [normalize_path(root) for root in roots]
+        if scan:
+            self.rescan()
+
+    def rescan(self):
+        records = []
+        folders = []
+        for root in self.roots:
+            try:
+                records.extend(scan_records(root, self.recursive, folders))
+            except OSError:
+                # A root that went away (unplugged card) leaves the rest usable
+                continue
+        self._reset()
+        self.merge(records, folders)
+
+
+def unique_roots(roots, recursive: bool = True):
+    """
+    Absolute ``roots`` without duplicates, in order; with ``recursive``
+    roots inside another root are dropped as they'd be listed twice.
+    """
+    result = []
+    seen = []
+    for root in roots:
+        original = os.path.abspath(root)
+        norm = os.path.normcase(original)
+        if norm in seen:
+            continue
+        result.append(original)
+        seen.append(norm)
+    if recursive:
+        result = [root for root, norm in zip(result, seen)
+                  if not any(norm != other and norm.startswith(os.path.join(other, ""))
+                             for other in seen)]
+    if not result:
+        raise ValueError("a library needs at least one folder")
+    return result
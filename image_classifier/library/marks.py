@@ -0,0 +1,134 @@
+"""Favorites.json: the favorite and compare marks of one folder."""
+import json
+import os
+
+MARKS_FILE = "Favorites.json"
+# Changes made since Favorites.json was last written, one JSON object per line
+JOURNAL_FILE = "Favorites.journal"
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def read_marks(directory: str):
+    """
+    ``(favorites, compare)`` sets of normalized paths saved for
+    ``directory``: Favorites.json with the journal replayed on top, so
+    changes not yet compacted (or cut short by a crash) are kept.  Empty if
+    there is no Favorites.json or it belongs to another folder.  Raises
+    OSError / ValueError on unreadable files.
+    """
+    favorites, compare = set(), set()
+    json_path = os.path.join(directory, MARKS_FILE)
+    if os.path.exists(json_path):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        saved_for = data.get('directory')
+        if saved_for and _norm(saved_for) == _norm(directory):
+            favorites = {_norm(item['full_path']) for item in data.get('favorites', [])}
+            compare = {_norm(item['full_path']) for item in data.get('compare', [])}
+    _replay_journal(directory, {'favorites': favorites, 'compare': compare})
+    return favorites, compare
+
+
+def _replay_journal(directory: str, marks):
+    journal_path = os.path.join(directory, JOURNAL_FILE)
+    if not os.path.exists(journal_path):
+        return
+    norm_dir = _norm(directory)
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                paths = marks[entry['mark']]
+                path = _norm(entry['path'])
+            except (ValueError, KeyError, TypeError):
+                # A line cut short by a crash; everything before it counts
+                continue
+            # Entries of a folder copied from elsewhere don't apply here
+            if os.path.dirname(path) != norm_dir:
+                continue
+            if entry.get('value'):
+                paths.add(path)
+            else:
+                paths.discard(path)
+
+
+def append_journal(directory: str, changes):
+    """
+    Append ``(mark, norm_path, value)`` changes (``mark`` being
+    ``"favorites"`` or ``"compare"``) to the journal of ``directory``.
+    Cheap compared to rewriting Favorites.json; ``write_marks`` folds the
+    journal back in.
+    """
+    lines = [
+        json.dumps({'mark': mark, 'path': path, 'value': bool(value)}, ensure_ascii=False) + "\n"
+        for mark, path, value in changes
+    ]
+    if not lines:
+        return
+    with open(os.path.join(directory, JOURNAL_FILE), 'a', encoding='utf-8') as f:
+        f.write("".join(lines))
+
+
+def write_marks(directory: str, favorites, compare, sort_by_date: bool = False, records=None):
+    """
+    Write the marks of the images in ``directory`` and drop its journal.
+    ``records`` maps normalized paths to index records (see
+    ``stat_record``) so dates don't need a ``stat()``; marked files that no
+    longer exist are left out.  The file is replaced atomically, so a crash
+    leaves either the old file and its journal or the new file.
+    """
+    def entries(paths):
+        items = []
+        for norm_path in paths:
+            record = records.get(norm_path) if records is not None else None
+            if record is not None:
+                mtime = record[4]
+            else:
+                try:
+                    mtime = os.path.getmtime(norm_path)
+                except OSError:
+                    continue
+            items.append({
+                'filename': os.path.basename(norm_path),
+                'full_path': norm_path,
+                'modification_date': mtime,
+                'starred_at': None
+            })
+        if sort_by_date:
+            items.sort(key=lambda x: x['modification_date'])
+        else:
+            items.sort(key=lambda x: x['filename'])
+        return items
+
+    data = {
+        'directory': directory,
+        'favorites': entries(favorites),
+        'compare': entries(compare)
+    }
+    json_path = os.path.join(directory, MARKS_FILE)
+    temp_path = json_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, json_path)
+    try:
+        os.remove(os.path.join(directory, JOURNAL_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def compact_journal(directory: str, sort_by_date: bool = False) -> bool:
+    """
+    Fold a journal left in ``directory`` by an earlier session (one that
+    crashed before compacting) into Favorites.json.  Returns False when
+    there is none.  Raises OSError / ValueError as ``read_marks`` does.
+    """
+    if not os.path.exists(os.path.join(directory, JOURNAL_FILE)):
+        return False
+    favorites, compare = read_marks(directory)
+    write_marks(directory, favorites, compare, sort_by_date)
+    return True
@@ -0,0 +1,151 @@
+"""Debounced background writes of favorite and compare marks."""
+import os
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from image_classifier.library.marks import append_journal, compact_journal, write_marks
+
+
+class _MarksJobSignals(QObject):
+    failed = pyqtSignal(str)
+
+
+class _MarksJob(QRunnable):
+    def __init__(self, function, *args):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.signals = _MarksJobSignals()
+
+    def run(self):
+        try:
+            self.function(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+
+
+class MarksWriter(QObject):
+    """
+    Persists mark changes off the GUI thread.  ``append()`` queues changes
+    per folder; once ``delay_ms`` pass without new ones they are appended
+    to the folder's journal by a single writer thread, so writes stay in
+    order.  A folder whose journal has grown past ``compact_after`` entries
+    is compacted instead: ``snapshot(directory)`` is asked for its marks as
+    ``(favorites, compare, sort_by_date, records)`` and Favorites.json is
+    rewritten atomically.  Journals an earlier session left behind are
+    compacted with ``compact_leftovers()`` when their folders are opened.
+
+    With a ``catalog`` the marks are written there first and Favorites.json
+    becomes a best-effort copy, so read-only media no longer report write
+    errors.  Other catalog writes can be queued behind the marks with
+    ``submit()``.  Must be used from the GUI thread.
+    """
+
+    failed = pyqtSignal(str)
+
+    def __init__(self, snapshot, delay_ms: int = 300, compact_after: int = 256,
+                 catalog=None, parent=None):
+        super().__init__(parent)
+        self.snapshot = snapshot
+        self.catalog = catalog
+        self.compact_after = max(1, compact_after)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.flush)
+        # normalized folder -> (folder, queued changes)
+        self._pending = {}
+        # normalized folder -> (folder, journal entries written this session)
+        self._journaled = {}
+
+    def append(self, directory: str, changes):
+        """Queue ``(mark, norm_path, value)`` changes for ``directory``."""
+        changes = list(changes)
+        if not changes:
+            return
+        norm_dir = os.path.normcase(os.path.abspath(directory))
+        self._pending.setdefault(norm_dir, (directory, []))[1].extend(changes)
+        self._timer.start()
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def flush(self, compact: bool = False):
+        """
+        Hand queued changes to the writer thread now.  With ``compact``,
+        every folder journaled this session is compacted too (used when the
+        folder is closed).
+        """
+        self._timer.stop()
+        pending, self._pending = self._pending, {}
+        for norm_dir, (directory, changes) in pending.items():
+            _, written = self._journaled.get(norm_dir, (directory, 0))
+            written += len(changes)
+            self._journaled[norm_dir] = (directory, written)
+            if written >= self.compact_after:
+                self._compact(norm_dir)
+            else:
+                self.submit(self._append, directory, changes)
+        if compact:
+            for norm_dir in list(self._journaled):
+                self._compact(norm_dir)
+
+    def compact_leftovers(self, directories, sort_by_date: bool = False):
+        """
+        Fold journals left in ``directories`` by an earlier session into
+        their Favorites.json, on the writer thread (the changes are already
+        in the marks just read).  Folders journaled this session are left
+        to ``flush()``.
+        """
+        directories = [
+            directory for directory in directories
+            if os.path.normcase(os.path.abspath(directory)) not in self._journaled
+        ]
+        if directories:
+            self.submit(self._compact_leftovers, directories, sort_by_date)
+
+    def wait(self, msecs: int = -1) -> bool:
+        """Block until everything handed over has been written."""
+        return self._pool.waitForDone(msecs)
+
+    def submit(self, function, *args):
+        """Run ``function(*args)`` on the writer thread after what is queued."""
+        job = _MarksJob(function, *args)
+        job.signals.failed.connect(self.failed)
+        self._pool.start(job)
+
+    def _compact(self, norm_dir: str):
+        directory, _ = self._journaled.pop(norm_dir)
+        favorites, compare, sort_by_date, records = self.snapshot(directory)
+        self.submit(self._write, directory, favorites, compare, sort_by_date, records)
+
+    # These run on the writer thread
+
+    def _append(self, directory, changes):
+        if self.catalog is not None:
+            self.catalog.apply_marks(directory, changes)
+        self._write_file(append_journal, directory, changes)
+
+    def _write(self, directory, favorites, compare, sort_by_date, records):
+        if self.catalog is not None:
+            self.catalog.store_marks(directory, favorites, compare)
+        self._write_file(write_marks, directory, favorites, compare, sort_by_date, records)
+
+    def _compact_leftovers(self, directories, sort_by_date):
+        for directory in directories:
+            try:
+                compact_journal(directory, sort_by_date)
+            except (OSError, ValueError) as e:
+                # Still replayed on every read; tried again next time
+                print(f"Error compacting marked images: {e}")
+
+    def _write_file(self, function, *args):
+        try:
+            function(*args)
+        except OSError as e:
+            if self.catalog is None:
+                raise
+            # Read-only media: the catalog has the marks
+            print(f"Error saving marked images: {e}")
@@ -0,0 +1,232 @@
+"""Compact storage of file paths: a folder prefix table plus interned file names."""
+import os
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+
+
+class PathTable:
+    """
+    The files of an index as integer IDs.  Each folder's path (normalized
+    and original) is stored once; per file only its folder ID, its
+    interned name (cards repeat IMG_0001.JPG in every folder) and its size
+    and date, in flat arrays.  Paths and records are built on access.
+
+    An ID always stands for the same path: removed files are only marked
+    gone and get their ID back if they reappear, so sequences of IDs taken
+    earlier (snapshots) stay valid while the table grows.
+    """
+
+    def __init__(self):
+        # By folder ID: "<folder><sep>" normalized and as found on disk
+        self._norm_prefixes = []
+        self._prefixes = []
+        self._folder_ids = {}
+        # By folder ID: normalized name -> file ID
+        self._files = []
+        # By file ID
+        self.names = []
+        self.folder_of = array("i")
+        self.sizes = array("q")
+        self.mtimes = array("d")
+        self._alive = bytearray()
+        self._count = 0
+
+    def __len__(self):
+        """Number of files present (removed ones don't count)."""
+        return self._count
+
+    @property
+    def capacity(self) -> int:
+        """One more than the highest file ID handed out."""
+        return len(self.names)
+
+    def folder_id(self, folder: str) -> int:
+        norm_folder = os.path.normcase(folder)
+        folder_id = self._folder_ids.get(norm_folder)
+        if folder_id is None:
+            folder_id = len(self._files)
+            self._folder_ids[norm_folder] = folder_id
+            self._norm_prefixes.append(os.path.join(norm_folder, ""))
+            self._prefixes.append(os.path.join(folder, ""))
+            self._files.append({})
+        return folder_id
+
+    def add(self, record) -> int:
+        """Store a ``stat_record`` tuple, updating it if known; returns its ID."""
+        norm_path, original_path, name, size, mtime = record
+        folder_id = self.folder_id(os.path.dirname(original_path))
+        files = self._files[folder_id]
+        name = sys.intern(name)
+        key = sys.intern(os.path.basename(norm_path))
+        file_id = files.get(key)
+        if file_id is None:
+            file_id = len(self.names)
+            files[key] = file_id
+            self.names.append(name)
+            self.folder_of.append(folder_id)
+            self.sizes.append(size)
+            self.mtimes.append(mtime)
+            self._alive.append(0)
+        else:
+            self.names[file_id] = name
+            self.sizes[file_id] = size
+            self.mtimes[file_id] = mtime
+        if not self._alive[file_id]:
+            self._alive[file_id] = 1
+            self._count += 1
+        return file_id
+
+    def remove(self, file_id: int):
+        if self._alive[file_id]:
+            self._alive[file_id] = 0
+            self._count -= 1
+
+    def alive(self, file_id: int) -> bool:
+        return bool(self._alive[file_id])
+
+    def find(self, norm_path: str):
+        """ID of ``norm_path`` (removed files included), or None."""
+        folder_id = self._folder_ids.get(os.path.dirname(norm_path))
+        if folder_id is None:
+            return None
+        return self._files[folder_id].get(os.path.basename(norm_path))
+
+    def same(self, record) -> bool:
+        """Whether ``record`` is present with the same name, size and date."""
+        file_id = self.find(record[0])
+        return (file_id is not None and self._alive[file_id]
+                and self.names[file_id] == record[2]
+                and self.sizes[file_id] == record[3]
+                and self.mtimes[file_id] == record[4])
+
+    def ids(self):
+        """IDs of the files present, in ID order."""
+        return [file_id for file_id, alive in enumerate(self._alive) if alive]
+
+    def ids_in(self, norm_folder: str):
+        """IDs of the files present directly in ``norm_folder``."""
+        folder_id = self._folder_ids.get(norm_folder)
+        if folder_id is None:
+            return []
+        return [file_id for file_id in self._files[folder_id].values() if self._alive[file_id]]
+
+    def norm_path(self, file_id: int) -> str:
+        return (self._norm_prefixes[self.folder_of[file_id]]
+                + os.path.normcase(self.names[file_id]))
+
+    def original_path(self, file_id: int) -> str:
+        return self._prefixes[self.folder_of[file_id]] + self.names[file_id]
+
+    def record(self, file_id: int):
+        """``(norm_path, original_path, name, size, mtime)``, as ``stat_record``."""
+        return (self.norm_path(file_id), self.original_path(file_id), self.names[file_id],
+                self.sizes[file_id], self.mtimes[file_id])
+
+    def sort_key(self, sort_option: str):
+        """
+        Key function over file IDs for ``sort_option``; the folder and name
+        break ties so keys are unique.
+        """
+        names, folder_of, prefixes = self.names, self.folder_of, self._norm_prefixes
+        if sort_option == "date_modified":
+            mtimes = self.mtimes
+            return lambda i: (mtimes[i], prefixes[folder_of[i]], names[i])
+        if sort_option == "size":
+            sizes = self.sizes
+            return lambda i: (sizes[i], prefixes[folder_of[i]], names[i])
+        return lambda i: (names[i].lower(), prefixes[folder_of[i]], names[i])
+
+
+class PathList(Sequence):
+    """
+    Read-only sequence of the normalized paths of ``ids`` (an array of file
+    IDs of ``table``), built on access.  ``position()``, ``in`` and
+    ``index()`` look the path up in the table and then in an ID -> position
+    array made on first use, instead of a dict of path strings.
+    """
+
+    __slots__ = ("table", "ids", "_positions")
+
+    def __init__(self, table: PathTable, ids):
+        self.table = table
+        self.ids = ids
+        self._positions = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self.table.norm_path(file_id) for file_id in self.ids[k]]
+        return self.table.norm_path(self.ids[k])
+
+    def __iter__(self):
+        norm_path = self.table.norm_path
+        for file_id in self.ids:
+            yield norm_path(file_id)
+
+    def position_of_id(self, file_id: int):
+        positions = self._positions
+        if positions is None:
+            positions = array("i", [-1]) * self.table.capacity
+            for position, known_id in enumerate(self.ids):
+                positions[known_id] = position
+            self._positions = positions
+        if 0 <= file_id < len(positions) and positions[file_id] >= 0:
+            return positions[file_id]
+        return None
+
+    def position(self, path):
+        """Position of ``path``, or None if it isn't in the list."""
+        file_id = self.table.find(path) if isinstance(path, str) else None
+        return self.position_of_id(file_id) if file_id is not None else None
+
+    def __contains__(self, path):
+        return self.position(path) is not None
+
+    def index(self, path, start=0, stop=None):
+        position = self.position(path)
+        if position is None or position < start or (stop is not None and position >= stop):
+            raise ValueError(f"{path!r} is not in list")
+        return position
+
+
+class PathMapping(Mapping):
+    """
+    Read-only normalized path -> ``value(file_id)`` over a PathTable, for
+    the files present or, with ``paths`` (a PathList), for those in it.
+    """
+
+    def __init__(self, table: PathTable, value, paths: PathList | None = None):
+        self.table = table
+        self.value = value
+        self.paths = paths
+
+    def _id(self, path):
+        file_id = self.table.find(path) if isinstance(path, str) else None
+        if file_id is None:
+            return None
+        if self.paths is not None:
+            return file_id if self.paths.position_of_id(file_id) is not None else None
+        return file_id if self.table.alive(file_id) else None
+
+    def _ids(self):
+        return self.paths.ids if self.paths is not None else self.table.ids()
+
+    def __getitem__(self, path):
+        file_id = self._id(path)
+        if file_id is None:
+            raise KeyError(path)
+        return self.value(file_id)
+
+    def __contains__(self, path):
+        return self._id(path) is not None
+
+    def __iter__(self):
+        norm_path = self.table.norm_path
+        for file_id in self._ids():
+            yield norm_path(file_id)
+
+    def __len__(self):
+        return len(self.paths) if self.paths is not None else len(self.table)
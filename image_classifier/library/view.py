@@ -0,0 +1,336 @@
+"""Ordered image list with position lookups and filtered views over mark sets."""
+
+BLOCK_BITS = 1024
+
+
+class MarkSet(set):
+    """
+    A set of normalized paths (favorites, compare) that counts its changes
+    in ``version``, so views built from it know when to rebuild, and keeps
+    the latest value of every path changed since ``take_changes()`` so
+    saves can write just those.
+    """
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+        self.version = 0
+        self._changes = {}
+
+    def _changed(self, added=(), removed=()):
+        self.version += 1
+        for item in added:
+            self._changes[item] = True
+        for item in removed:
+            self._changes[item] = False
+
+    def take_changes(self):
+        """``(path, marked)`` for every path changed since the last call."""
+        changes, self._changes = self._changes, {}
+        return list(changes.items())
+
+    def load(self, items):
+        """
+        Add marks read from disk.  They are not reported as changes, and
+        paths changed since (still pending) keep their new value.
+        """
+        super().update(item for item in items if item not in self._changes)
+        self.version += 1
+
+    def add(self, item):
+        if item not in self:
+            super().add(item)
+            self._changed(added=(item,))
+
+    def discard(self, item):
+        if item in self:
+            super().discard(item)
+            self._changed(removed=(item,))
+
+    def remove(self, item):
+        super().remove(item)
+        self._changed(removed=(item,))
+
+    def pop(self):
+        item = super().pop()
+        self._changed(removed=(item,))
+        return item
+
+    def clear(self):
+        removed = list(self)
+        super().clear()
+        self._changed(removed=removed)
+
+    def update(self, *others):
+        added = set().union(*others) - self
+        super().update(added)
+        self._changed(added=added)
+
+    def difference_update(self, *others):
+        removed = set().union(*others) & self
+        super().difference_update(removed)
+        self._changed(removed=removed)
+
+    def intersection_update(self, *others):
+        removed = set(self) - set(self).intersection(*others)
+        super().difference_update(removed)
+        self._changed(removed=removed)
+
+    def symmetric_difference_update(self, other):
+        other = set(other)
+        added, removed = other - self, other & self
+        super().symmetric_difference_update(other)
+        self._changed(added=added, removed=removed)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+
+class RankBitset:
+    """
+    Fixed-size bitset with ``rank`` (set bits before a position) and
+    ``select`` (position of the k-th set or clear bit) in O(log n), and
+    O(log n) single-bit updates.  Bits live in 1024-bit int blocks; a
+    Fenwick tree over the block popcounts answers the prefix counts.
+    """
+
+    def __init__(self, size: int, positions=()):
+        self.size = size
+        blocks = [0] * ((size + BLOCK_BITS - 1) // BLOCK_BITS)
+        for position in positions:
+            blocks[position // BLOCK_BITS] |= 1 << (position % BLOCK_BITS)
+        self._blocks = blocks
+        counts = [block.bit_count() for block in blocks]
+        self.count = sum(counts)
+        tree = [0] + counts
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def __len__(self):
+        return self.size
+
+    def test(self, position: int) -> bool:
+        return bool(self._blocks[position // BLOCK_BITS] >> (position % BLOCK_BITS) & 1)
+
+    def set(self, position: int, value: bool = True):
+        block, offset = divmod(position, BLOCK_BITS)
+        bit = 1 << offset
+        was_set = bool(self._blocks[block] & bit)
+        if was_set == bool(value):
+            return
+        self._blocks[block] ^= bit
+        delta = 1 if value else -1
+        self.count += delta
+        i = block + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def rank(self, position: int, value: bool = True) -> int:
+        """Number of bits equal to ``value`` before ``position``."""
+        position = max(0, min(position, self.size))
+        block, offset = divmod(position, BLOCK_BITS)
+        ones = 0
+        i = block
+        while i > 0:
+            ones += self._tree[i]
+            i -= i & -i
+        if offset:
+            ones += (self._blocks[block] & ((1 << offset) - 1)).bit_count()
+        return ones if value else position - ones
+
+    def select(self, k: int, value: bool = True) -> int:
+        """Position of the ``k``-th (0-based) bit equal to ``value``."""
+        total = self.count if value else self.size - self.count
+        if not 0 <= k < total:
+            raise IndexError("bitset select out of range")
+        # Descend the Fenwick tree to the block holding the k-th bit
+        block = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            node = block + step
+            if node < len(self._tree):
+                ones = self._tree[node]
+                found = ones if value else step * BLOCK_BITS - ones
+                if found <= k:
+                    block = node
+                    k -= found
+            step >>= 1
+        bits = self._blocks[block]
+        if not value:
+            bits = ~bits & ((1 << BLOCK_BITS) - 1)
+        # Binary search for the offset whose prefix holds k + 1 bits
+        low, high = 0, BLOCK_BITS - 1
+        while low < high:
+            middle = (low + high) // 2
+            if (bits & ((2 << middle) - 1)).bit_count() > k:
+                high = middle
+            else:
+                low = middle + 1
+        return block * BLOCK_BITS + low
+
+    def positions(self, value: bool = True):
+        """Positions of the bits equal to ``value``, in order."""
+        for block_index, bits in enumerate(self._blocks):
+            base = block_index * BLOCK_BITS
+            if not value:
+                bits = ~bits & ((1 << min(BLOCK_BITS, self.size - base)) - 1)
+            while bits:
+                low = bits & -bits
+                yield base + low.bit_length() - 1
+                bits ^= low
+
+
+class ImageView:
+    """
+    One ordering of the images (the sorted folder or library) with a
+    ``position(path)`` lookup, plus a RankBitset per mark set so filtered
+    views can be indexed, searched and kept current without copying the
+    list.
+
+    ``marks`` maps a mark name to a zero-argument callable returning the
+    current set, so the owner may replace its sets.  MarkSets are tracked by
+    ``version``; plain sets are re-read on every use.
+    """
+
+    def __init__(self, paths=(), marks=None):
+        if hasattr(paths, "position"):
+            # An IndexSnapshot's PathList is shared and does its own lookups
+            self.paths = paths
+            self.position = paths.position
+        else:
+            self.paths = tuple(paths)
+            self.position = {path: i for i, path in enumerate(self.paths)}.get
+        self._marks = dict(marks or {})
+        self._bits = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def bits(self, name: str) -> RankBitset:
+        marks = self._marks[name]()
+        version = getattr(marks, "version", None)
+        cached = self._bits.get(name)
+        if cached is not None and cached[0] is marks and version is not None and cached[1] == version:
+            return cached[2]
+        positions = (self.position(p) for p in marks)
+        bitset = RankBitset(len(self.paths), (p for p in positions if p is not None))
+        self._bits[name] = (marks, version, bitset)
+        return bitset
+
+    def mark(self, name: str, path: str, value: bool):
+        """Add ``path`` to or remove it from mark set ``name`` in O(log n)."""
+        bitset = self.bits(name)
+        marks = self._marks[name]()
+        if value:
+            marks.add(path)
+        else:
+            marks.discard(path)
+        position = self.position(path)
+        if position is not None:
+            bitset.set(position, value)
+        cached = self._bits[name]
+        self._bits[name] = (cached[0], getattr(marks, "version", None), bitset)
+
+    def filtered(self, filter_mode: str) -> "FilteredView":
+        """
+        View for ``"all"``, ``"favorites"``, ``"non_favorites"`` or
+        ``"compare"``; unknown modes show everything.
+        """
+        if filter_mode == "favorites":
+            return FilteredView(self, "favorites")
+        if filter_mode == "non_favorites":
+            return FilteredView(self, "favorites", value=False)
+        if filter_mode == "compare":
+            return FilteredView(self, "compare")
+        return FilteredView(self)
+
+
+class FilteredView:
+    """
+    The images of an ImageView that pass one filter, as a read-only
+    sequence: ``len``, indexing, ``in`` and ``index()`` are O(log n) or
+    better.  Marks are read live; the order is the view's.
+    """
+
+    def __init__(self, view: ImageView, name: str | None = None, value: bool = True):
+        self.view = view
+        self.name = name
+        self.value = value
+
+    def _bits(self):
+        return self.view.bits(self.name)
+
+    def __len__(self):
+        if self.name is None:
+            return len(self.view.paths)
+        bits = self._bits()
+        return bits.count if self.value else bits.size - bits.count
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in range(*k.indices(len(self)))]
+        if self.name is None:
+            return self.view.paths[k]
+        length = len(self)
+        if k < 0:
+            k += length
+        if not 0 <= k < length:
+            raise IndexError("image index out of range")
+        return self.view.paths[self._bits().select(k, self.value)]
+
+    def __iter__(self):
+        if self.name is None:
+            return iter(self.view.paths)
+        paths = self.view.paths
+        return (paths[p] for p in self._bits().positions(self.value))
+
+    def __contains__(self, path):
+        position = self.view.position(path)
+        if position is None:
+            return False
+        return self.name is None or self._bits().test(position) == self.value
+
+    def index(self, path) -> int:
+        position = self.view.position(path)
+        if position is None or (self.name is not None and self._bits().test(position) != self.value):
+            raise ValueError(f"{path!r} is not in this view")
+        if self.name is None:
+            return position
+        return self._bits().rank(position, self.value)
+
+    def nearest(self, path):
+        """
+        Index of ``path`` if it is in the view, else of the first image
+        after it in the full order, else of the last one before it; None
+        if the view is empty or ``path`` isn't in the full list.
+        """
+        position = self.view.position(path)
+        length = len(self)
+        if position is None or not length:
+            return None
+        if self.name is None:
+            return position
+        after = self._bits().rank(position, self.value)
+        return after if after < length else length - 1
+
+    def __repr__(self):
+        return f"FilteredView({self.name!r}, value={self.value!r}, len={len(self)})"
@@ -0,0 +1,97 @@
+"""Debounced folder watcher feeding DirectoryIndex.sync()."""
+import os
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from image_classifier.library.marks import JOURNAL_FILE, MARKS_FILE
+
+# Written by the app itself next to the images (marks.write_marks and
+# append_journal); changes to these alone are not reported
+OWN_FILES = frozenset({MARKS_FILE, JOURNAL_FILE, MARKS_FILE + ".tmp"})
+
+
+class DirectoryWatcher(QObject):
+    """
+    Watches folders with QFileSystemWatcher (inotify on Linux,
+    ReadDirectoryChangesW on Windows) and emits ``changed`` for each folder
+    that changed once a burst of events has settled, so a camera dropping a
+    dozen files costs one sync.  The folder's names are compared with
+    those seen when it was last reported: if nothing but the app's own
+    marks files (``OWN_FILES``) came or went, there's nothing to sync.
+    """
+
+    changed = pyqtSignal(str)
+
+    def __init__(self, delay_ms: int = 250, parent=None):
+        super().__init__(parent)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self._emit_changed)
+        # Ordered set of watched folders
+        self._directories = {}
+        self._dirty = []
+        # folder -> names in it, less OWN_FILES, when it was last reported
+        self._names = {}
+
+    def directory(self):
+        """The first folder watched, or None."""
+        return next(iter(self._directories), None)
+
+    def directories(self):
+        return list(self._directories)
+
+    def watch(self, directories):
+        """
+        Watch ``directories`` (one path or several) instead of the current
+        folders; None stops watching.
+        """
+        if directories is None:
+            directories = []
+        elif isinstance(directories, str):
+            directories = [directories]
+        directories = [os.path.abspath(d) for d in directories]
+        if directories == list(self._directories):
+            return
+        self.clear()
+        self.add(directories)
+
+    def add(self, directories):
+        """Watch more folders, e.g. subfolders found by a library scan."""
+        new = [os.path.abspath(d) for d in directories]
+        new = [d for d in dict.fromkeys(new) if d not in self._directories]
+        if not new:
+            return
+        failed = set(self._watcher.addPaths(new))
+        self._directories.update((d, None) for d in new if d not in failed)
+
+    def clear(self):
+        self._timer.stop()
+        if self._watcher.directories():
+            self._watcher.removePaths(self._watcher.directories())
+        self._directories = {}
+        self._dirty = []
+        self._names = {}
+
+    def _on_directory_changed(self, path):
+        if path not in self._dirty:
+            self._dirty.append(path)
+        self._timer.start()
+
+    def _emit_changed(self):
+        dirty, self._dirty = self._dirty, []
+        for path in dirty:
+            if not self._only_own_files_changed(path):
+                self.changed.emit(path)
+
+    def _only_own_files_changed(self, path) -> bool:
+        try:
+            names = frozenset(os.listdir(path)) - OWN_FILES
+        except OSError:
+            self._names.pop(path, None)
+            return False
+        previous = self._names.get(path)
+        self._names[path] = names
+        return previous == names
@@ -329,7 +329,11 @@ class MyDragOverlay(QWidget):
         if event.mimeData().hasUrls() and self._urls_allowed(event.mimeData().urls()):
             event.acceptProposedAction()
             urls = event.mimeData().urls()
-            if len(urls) > 1:
+            folders = [url.toLocalFile() for url in urls if os.path.isdir(url.toLocalFile())]
+            if len(folders) > 1:
+                # Several folders: browse them together as one library
+                self.window().load_directory(folders[0], start_at_first=True, library_roots=folders)
+            elif len(urls) > 1:
                 paths = [url.toLocalFile() for url in urls
                          if url.toLocalFile().lower().endswith(ALLOWED_EXTENSIONS)]
                 if paths:
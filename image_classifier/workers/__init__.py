@@ -1,5 +1,8 @@
 from image_classifier.workers.export_worker import ExportWorker
 from image_classifier.workers.delete_worker import DeleteNonFavoritesWorker
 from image_classifier.workers.sharpen_thread import SharpenThread
+from image_classifier.workers.decoder_benchmark import DecoderBenchmark
+from image_classifier.workers.directory_scanner import DirectoryScanner, ScanBatch
 
-__all__ = ["ExportWorker", "DeleteNonFavoritesWorker", "SharpenThread"]
+__all__ = ["ExportWorker", "DeleteNonFavoritesWorker", "SharpenThread", "DecoderBenchmark",
+           "DirectoryScanner", "ScanBatch"]
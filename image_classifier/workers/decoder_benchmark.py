@@ -0,0 +1,42 @@
+"""Pick the fastest decoder backend per image format on this machine."""
+from PyQt6.QtCore import QObject, QRunnable, QSize, pyqtSignal
+
+from image_classifier.imaging.decoders import DecoderRegistry, default_registry
+
+
+class DecoderBenchmarkSignals(QObject):
+    finished = pyqtSignal(dict)
+
+
+class DecoderBenchmark(QRunnable):
+    """
+    Time each decoder backend on one sample file per format, for the preview
+    size and for full resolution, and emit the registry's preferences.
+    """
+
+    def __init__(self, samples, target_size: QSize | None = None,
+                 registry: DecoderRegistry | None = None):
+        super().__init__()
+        self.samples = list(samples)
+        self.target_size = QSize(target_size) if target_size is not None else None
+        self.registry = registry or default_registry()
+        self.signals = DecoderBenchmarkSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        sizes = [None] if self.target_size is None else [self.target_size, None]
+        try:
+            for path in self.samples:
+                for size in sizes:
+                    if self._cancelled:
+                        return
+                    try:
+                        self.registry.benchmark(path, size)
+                    except Exception as e:
+                        print(f"Error benchmarking decoders on {path}: {e}")
+        finally:
+            # Always report back, the viewer waits for this before another run
+            self.signals.finished.emit(self.registry.preferences())
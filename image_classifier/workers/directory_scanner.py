@@ -0,0 +1,153 @@
+"""List folders in the background, handing results over in batches."""
+import collections
+import sqlite3
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from image_classifier.library.index import iter_folder
+from image_classifier.library.marks import read_marks
+
+
+class ScanBatch:
+    """
+    One hand-over from a DirectoryScanner: file records for
+    ``DirectoryIndex.merge()``, the folders they came from, and (when the
+    scanner reads marks) the favorites and compare marks found there.
+    """
+
+    def __init__(self, records=(), folders=(), favorites=(), compare=()):
+        self.records = list(records)
+        self.folders = list(folders)
+        self.favorites = set(favorites)
+        self.compare = set(compare)
+
+    def __bool__(self):
+        return bool(self.records or self.folders)
+
+
+class DirectoryScannerSignals(QObject):
+    batch = pyqtSignal(object, object)
+    finished = pyqtSignal(object)
+
+
+class DirectoryScanner(QRunnable):
+    """
+    Read one folder, or several roots and with ``recursive`` the folders
+    below them, and emit ``batch(scanner, ScanBatch)`` as results come in,
+    then ``finished(scanner)``.
+
+    Trees are walked by ``workers`` threads taking folders from a shared
+    queue, so slow network shares and card readers are listed in parallel.
+    The first batch is small so the first image can be shown right away;
+    later ones grow up to ``max_batch`` to keep the GUI-side merges few.
+    With ``read_marks`` each folder's Favorites.json is read here too, or
+    its marks in ``catalog`` when one is given.
+    """
+
+    def __init__(self, roots, recursive: bool = False, workers: int = 1,
+                 first_batch: int = 64, max_batch: int = 4096, read_marks: bool = False,
+                 catalog=None):
+        super().__init__()
+        self.roots = [roots] if isinstance(roots, str) else list(roots)
+        self.recursive = recursive
+        self.workers = max(1, workers)
+        self.first_batch = max(1, first_batch)
+        self.max_batch = max(self.first_batch, max_batch)
+        self.read_marks = read_marks
+        self.catalog = catalog
+        self.signals = DirectoryScannerSignals()
+        self._cancelled = False
+        self._lock = threading.Condition()
+        self._queue = collections.deque()
+        self._busy = 0
+        self._batch = ScanBatch()
+        self._batch_size = self.first_batch
+
+    def cancel(self):
+        self._cancelled = True
+        with self._lock:
+            self._lock.notify_all()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        self._queue.extend(self.roots)
+        pool = None
+        if self.recursive and self.workers > 1:
+            pool = QThreadPool()
+            pool.setMaxThreadCount(self.workers - 1)
+            for _ in range(self.workers - 1):
+                pool.start(self._walk)
+        self._walk()
+        if pool is not None:
+            pool.waitForDone()
+        if self._cancelled:
+            return
+        with self._lock:
+            self._flush(force=True)
+        self.signals.finished.emit(self)
+
+    def _walk(self):
+        while True:
+            with self._lock:
+                while not self._queue and self._busy and not self._cancelled:
+                    self._lock.wait()
+                if self._cancelled or not self._queue:
+                    self._lock.notify_all()
+                    return
+                folder = self._queue.popleft()
+                self._busy += 1
+            favorites, compare = set(), set()
+            if self.read_marks:
+                try:
+                    if self.catalog is not None:
+                        favorites, compare = self.catalog.read_marks(folder)
+                    else:
+                        favorites, compare = read_marks(folder)
+                except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+                    print(f"Error loading marked images: {e}")
+            records = []
+            subfolders = []
+            listed = True
+            try:
+                for record, subfolder in iter_folder(folder, self.recursive):
+                    if self._cancelled:
+                        break
+                    if subfolder is not None:
+                        subfolders.append(subfolder)
+                        continue
+                    records.append(record)
+                    if len(records) >= self._batch_size:
+                        # Big folders are handed over while still being listed
+                        with self._lock:
+                            self._batch.records.extend(records)
+                            self._flush()
+                        records = []
+            except OSError as e:
+                print(f"Error scanning folder: {e}")
+                listed = False
+            with self._lock:
+                self._busy -= 1
+                self._queue.extend(subfolders)
+                batch = self._batch
+                batch.records.extend(records)
+                if listed:
+                    batch.folders.append(folder)
+                batch.favorites |= favorites
+                batch.compare |= compare
+                self._flush()
+                self._lock.notify_all()
+
+    def _flush(self, force: bool = False):
+        """Emit the pending batch once it is big enough (lock held)."""
+        batch = self._batch
+        if not batch or self._cancelled:
+            return
+        if not force and len(batch.records) < self._batch_size:
+            return
+        self._batch = ScanBatch()
+        self._batch_size = min(self._batch_size * 4, self.max_batch)
+        self.signals.batch.emit(self, batch)
@@ -1,19 +1,32 @@
 """Background sharpen (LAB unsharp) via OpenCV."""
 from PyQt6.QtCore import QThread, pyqtSignal
 from PyQt6.QtGui import QPixmap
-from image_classifier.imaging.sharpen import sharpen_cv2
+from image_classifier.imaging.sharpen import TILE_SIZE, sharpen_tiled
 
 
 class SharpenThread(QThread):
+    """
+    Sharpen ``orig`` off the GUI thread, in tiles spread over ``workers``
+    threads (see ``sharpen_tiled``).  ``progressChanged`` reports the share
+    of tiles done; ``cancel()`` stops at the next tile boundary and emits
+    ``cancelled`` instead of ``finished``.  Pass a QImage
+    (``pixmap.toImage()`` made on the GUI thread) to keep pixmaps out of
+    the worker; a QPixmap is still accepted.
+    """
+
     progressChanged = pyqtSignal(int)
     finished = pyqtSignal(QPixmap)
     errorOccurred = pyqtSignal(str)
+    cancelled = pyqtSignal()
 
-    def __init__(self, orig: QPixmap, radius: int, amount: float, parent=None):
+    def __init__(self, orig, radius: float, amount: float, parent=None,
+                 workers: int | None = None, tile_size: int = TILE_SIZE):
         super().__init__(parent)
         self.orig = orig
         self.radius = radius
         self.amount = amount
+        self.workers = workers
+        self.tile_size = tile_size
         self._cancel = False
 
     def cancel(self):
@@ -21,7 +34,15 @@ class SharpenThread(QThread):
 
     def run(self):
         try:
-            result = sharpen_cv2(self.orig, self.radius, self.amount)
-            self.finished.emit(result)
+            image = self.orig.toImage() if isinstance(self.orig, QPixmap) else self.orig
+            result = sharpen_tiled(
+                image, self.radius, self.amount,
+                tile_size=self.tile_size, workers=self.workers,
+                progress=self.progressChanged.emit, cancelled=lambda: self._cancel,
+            )
+            if result is None:
+                self.cancelled.emit()
+                return
+            self.finished.emit(QPixmap.fromImage(result))
         except Exception as e:
             self.errorOccurred.emit(str(e))
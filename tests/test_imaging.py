@@ -1,19 +1,47 @@
 """Tests for imaging (sharpen, loader)."""
+import gc
 import os
 import sys
+import threading
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from PIL import Image
 from pillow_heif import register_heif_opener
-from PyQt6.QtGui import QPixmap, QImage
-from image_classifier.imaging.sharpen import sharpen_cv2
+from PyQt6.QtCore import QCoreApplication, QRunnable, QSize
+from PyQt6.QtGui import QColor, QPixmap, QImage
+from image_classifier.imaging.sharpen import SharpenSession, sharpen_cv2, sharpen_image, sharpen_tiled
+from image_classifier.imaging.brightness import apply_brightness
+from image_classifier.imaging.gl_brightness import view_matrix
+from image_classifier.imaging.gl_sharpen import gaussian_weights
+from image_classifier.imaging.decoders import (
+    DecoderBackend,
+    DecoderRegistry,
+    _decode_with_heif,
+    _decode_with_opencv,
+    _decode_with_pillow,
+    _decode_with_qt,
+    _read_with_pillow,
+    decode_image,
+    fit_size,
+)
 from image_classifier.imaging.loader import (
     ImageLoaderRunnable,
     WorkerSignals,
-    _read_with_pillow,
     save_pixmap,
 )
+from image_classifier.imaging.memory import GIB, MIB, default_cache_budget, memory_shortfall
+from image_classifier.imaging.prefetch import PrefetchPlanner
+from image_classifier.imaging.preview_cache import PreviewDiskCache
+from image_classifier.imaging.scheduler import (
+    LoadFuture,
+    LoadScheduler,
+    PRIORITY_NEXT,
+    PRIORITY_VISIBLE,
+    PRIORITY_WARMUP,
+)
 from image_classifier.ui.widgets import ALLOWED_EXTENSIONS
+from image_classifier.workers.decoder_benchmark import DecoderBenchmark
 
 register_heif_opener()
 
@@ -29,6 +57,102 @@ def test_sharpen_returns_pixmap(qapp):
     assert out.height() == 80
 
 
+def test_sharpen_image_takes_fractional_radius(qapp):
+    """A proxy preview sharpens with a scaled-down, fractional radius."""
+    img = QImage(64, 48, QImage.Format.Format_RGBA8888)
+    img.fill(0xFF808080)
+    for x in range(32, 64):
+        for y in range(48):
+            img.setPixelColor(x, y, QColor(200, 200, 200))
+    whole = sharpen_image(img, 2, 1.0)
+    assert whole == sharpen_cv2(QPixmap.fromImage(img), 2, 1.0).toImage().convertToFormat(
+        QImage.Format.Format_RGBA8888)
+    proxy = sharpen_image(img, 0.4, 1.0)
+    assert proxy.size() == img.size()
+    # The edge is still enhanced, just over fewer pixels
+    assert QColor(proxy.pixel(32, 10)).red() > 200
+
+
+def test_sharpen_session_matches_one_shot_sharpen(qapp):
+    """Cached planes give the same pixels as sharpening from scratch."""
+    img = QImage(40, 30, QImage.Format.Format_RGBA8888)
+    for x in range(40):
+        for y in range(30):
+            img.setPixelColor(x, y, QColor((x * 37 + y * 11) % 256, (x * 5) % 256, (y * 9) % 256))
+    session = SharpenSession(img, max_details=2)
+    for radius, amount, threshold in ((2, 1.0, 2), (2, 2.5, 2), (1.5, 0.5, 0), (2, 0.7, 2)):
+        assert session.sharpen(radius, amount, threshold) == sharpen_image(img, radius, amount, threshold)
+    assert len(session._details) == 2
+
+
+def test_tiled_sharpen_matches_whole_image_and_can_stop(qapp):
+    """Tiles read a halo, so seams don't show; cancelling stops between tiles."""
+    img = QImage(150, 100, QImage.Format.Format_RGBA8888)
+    for x in range(150):
+        for y in range(100):
+            img.setPixelColor(x, y, QColor((x * 29 + y * 7) % 256, (x * y) % 256, (y * 13) % 256))
+    whole = SharpenSession(img).sharpen(3, 1.5)
+    assert sharpen_tiled(img, 3, 1.5, tile_size=32, workers=3) == whole
+
+    ticks = []
+    assert sharpen_tiled(img, 3, 1.5, tile_size=32, workers=1, progress=ticks.append,
+                         cancelled=lambda: len(ticks) >= 2) is None
+    assert ticks == [5, 10]
+
+
+def test_gpu_blur_taps_match_cpu_blur():
+    """The shader's one-sided kernel and edge mirroring blur L as OpenCV does."""
+    import cv2
+    import numpy as np
+
+    L = np.random.default_rng(3).integers(0, 256, (23, 31)).astype(np.float32)
+    for sigma in (0.4, 1, 2.5, 6):
+        weights = gaussian_weights(sigma)
+        assert abs(weights[0] + 2 * weights[1:].sum() - 1) < 1e-6
+        blurred = L
+        for axis in (1, 0):
+            n = L.shape[axis]
+            out = np.zeros_like(L)
+            for i, weight in enumerate(weights):
+                for offset in {i, -i}:
+                    # Same index mirroring as the shader's sample_at()
+                    index = (n - 1) - np.abs((n - 1) - np.abs(np.arange(n) + offset))
+                    out += weight * np.take(blurred, index, axis=axis)
+            blurred = out
+        k = 2 * len(weights) - 1
+        assert np.abs(blurred - cv2.GaussianBlur(L, (k, k), sigmaX=sigma)).max() < 1e-3
+
+
+def test_cpu_brightness_is_a_gamma_on_color_only(qapp):
+    """The fallback raises 0..1 channels to the factor, as the shader does, and keeps alpha."""
+    img = QImage(2, 1, QImage.Format.Format_ARGB32)
+    img.setPixelColor(0, 0, QColor(64, 128, 255, 255))
+    img.setPixelColor(1, 0, QColor(0, 200, 100, 77))
+    out = apply_brightness(img, 0.5)
+    assert out.pixelColor(0, 0).getRgb() == (128, 181, 255, 255)
+    assert out.pixelColor(1, 0).getRgb() == (0, 226, 160, 77)
+    assert img.pixelColor(0, 0).red() == 64
+
+
+def test_brightness_view_matrix_places_the_image_in_clip_space():
+    """The shader's quad lands where the painter would draw the item."""
+    import numpy as np
+    from PyQt6.QtCore import QRectF
+    from PyQt6.QtGui import QTransform
+
+    transform = QTransform().translate(100, 50).scale(0.5, 0.5)
+    matrix = view_matrix(transform, QRectF(0, 0, 400, 200), 2.0, (800, 400))
+
+    def clip(u, v):
+        x, y, w = matrix @ np.array([u, v, 1.0])
+        return round(x / w, 6), round(y / w, 6)
+
+    # Item (0, 0) is at view (100, 50) = device (200, 100) of 800x400
+    assert clip(0, 0) == (-0.5, 0.5)
+    # Item (400, 200) is at view (300, 150) = device (600, 300)
+    assert clip(1, 1) == (0.5, -0.5)
+
+
 def test_worker_signals_exists(qapp):
     sig = WorkerSignals()
     assert hasattr(sig, "finished")
@@ -61,3 +185,534 @@ def test_heic_round_trip(qapp, tmp_path):
     loaded = _read_with_pillow(str(path))
     assert not loaded.isNull()
     assert loaded.size() == source.size()
+
+
+def test_fit_size_keeps_aspect_and_never_upscales():
+    assert fit_size(QSize(6000, 4000), QSize(1500, 1500)) == QSize(1500, 1000)
+    assert fit_size(QSize(300, 200), QSize(1500, 1500)) == QSize(300, 200)
+
+
+def test_decode_image_scales_to_target(qapp, tmp_path):
+    source = QImage(1200, 800, QImage.Format.Format_RGB32)
+    source.fill(0xFF336699)
+    path = str(tmp_path / "large.jpg")
+    assert source.save(path)
+
+    preview, full = decode_image(path, QSize(300, 300))
+    assert preview.size() == QSize(300, 200)
+    assert not full
+
+    original, full = decode_image(path)
+    assert original.size() == QSize(1200, 800)
+    assert full
+
+
+def test_decode_image_scales_pillow_formats(qapp, tmp_path):
+    source = QImage(240, 160, QImage.Format.Format_RGBA8888)
+    source.fill(0xFF336699)
+    path = str(tmp_path / "iphone-photo.heic")
+    assert save_pixmap(QPixmap.fromImage(source), path)
+
+    preview, full = decode_image(path, QSize(60, 60))
+    assert preview.size() == QSize(60, 40)
+    assert not full
+
+
+def test_opencv_backend_uses_reduced_decode(qapp, tmp_path):
+    path = str(tmp_path / "large.jpg")
+    Image.new("RGB", (800, 600), (200, 40, 40)).save(path, quality=90)
+
+    preview, full = _decode_with_opencv(path, QSize(100, 100))
+    assert preview.size() == QSize(100, 75)
+    assert not full
+    gc.collect()
+    assert QColor(preview.pixel(50, 37)).red() > 150
+
+    image, full = _decode_with_opencv(path)
+    assert image.size() == QSize(800, 600)
+    assert full
+
+
+def test_heif_backend_decodes_without_pillow(qapp, tmp_path):
+    path = str(tmp_path / "photo.heic")
+    Image.new("RGB", (240, 160), (20, 200, 40)).save(path)
+
+    image, full = _decode_with_heif(path)
+    assert full and image.size() == QSize(240, 160)
+    preview, full = _decode_with_heif(path, QSize(60, 60))
+    assert not full and preview.size() == QSize(60, 40)
+
+
+def test_decoder_registry_prefers_and_falls_back(qapp, tmp_path):
+    path = str(tmp_path / "photo.jpg")
+    _write_jpeg(path, 40, 30)
+    calls = []
+
+    def broken(image_path, target_size=None, data=None):
+        calls.append("broken")
+        raise OSError("unsupported")
+
+    def working(image_path, target_size=None, data=None):
+        calls.append("working")
+        return decode_image(image_path, target_size)
+
+    registry = DecoderRegistry([
+        DecoderBackend("working", working),
+        DecoderBackend("broken", broken, (".jpg",)),
+        DecoderBackend("png-only", broken, (".png",)),
+    ])
+    assert [b.name for b in registry.backends_for(path)] == ["working", "broken"]
+
+    registry.set_preferences({"jpg:full": "missing", ".jpg:full": "broken"})
+    assert registry.preferences() == {".jpg:full": "broken"}
+    image, full = registry.decode(path)
+    assert image.size() == QSize(40, 30) and full
+    assert calls == ["broken", "working"]
+    # Preferences are per size class
+    assert registry.backends_for(path, QSize(10, 10))[0].name == "working"
+
+
+def test_decoder_benchmark_picks_a_valid_backend(qapp, tmp_path):
+    path = str(tmp_path / "bench.jpg")
+    _write_jpeg(path, 64, 48)
+
+    def wrong_size(image_path, target_size=None, data=None):
+        return QImage(5, 5, QImage.Format.Format_RGB32), True
+
+    def slow(image_path, target_size=None, data=None):
+        threading.Event().wait(0.01)
+        return decode_image(image_path, target_size)
+
+    registry = DecoderRegistry([
+        DecoderBackend("slow", slow),
+        DecoderBackend("wrong", wrong_size),
+    ])
+    timings = registry.benchmark(path, repeats=1)
+    assert set(timings) == {"slow", "wrong"}
+    # "wrong" is faster but its output doesn't match, so it can't win
+    assert registry.preferences() == {".jpg:full": "slow"}
+
+
+def test_decoder_benchmark_keeps_preferences_when_no_backend_is_valid(qapp, tmp_path):
+    path = str(tmp_path / "bench.jpg")
+    _write_jpeg(path, 64, 48)
+
+    def wrong_size(image_path, target_size=None, data=None):
+        return QImage(5, 5, QImage.Format.Format_RGB32), True
+
+    registry = DecoderRegistry([
+        DecoderBackend("wrong", wrong_size),
+        DecoderBackend("also-wrong", wrong_size),
+    ])
+    timings = registry.benchmark(path, repeats=1)
+    assert set(timings) == {"wrong", "also-wrong"}
+    assert registry.preferences() == {}
+
+    # A failing sample doesn't keep the worker from reporting back
+    registry.benchmark = lambda image_path, target_size=None: 1 / 0
+    worker = DecoderBenchmark([path], registry=registry)
+    results = []
+    worker.signals.finished.connect(results.append)
+    worker.run()
+    assert results == [{}]
+
+
+def test_pillow_bridge_keeps_native_modes_and_orientation(qapp, tmp_path):
+    rotated = tmp_path / "rotated.jpg"
+    pil_image = Image.new("RGB", (40, 20), (255, 0, 0))
+    pil_image.paste((0, 0, 255), (20, 0, 40, 20))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    pil_image.save(rotated, exif=exif, quality=95)
+
+    image, full = _decode_with_pillow(str(rotated))
+    assert full
+    assert image.format() == QImage.Format.Format_RGB888
+    assert (image.width(), image.height()) == (20, 40)
+    gc.collect()
+    # Orientation 6 turns the red left half to the top
+    assert QColor(image.pixel(10, 5)).red() > 200
+    assert QColor(image.pixel(10, 35)).blue() > 200
+
+    alpha = tmp_path / "alpha.png"
+    Image.new("RGBA", (8, 8), (0, 255, 0, 128)).save(alpha)
+    assert _decode_with_pillow(str(alpha))[0].format() == QImage.Format.Format_RGBA8888
+
+    gray = tmp_path / "gray.png"
+    Image.new("L", (9, 7), 77).save(gray)
+    image = _decode_with_pillow(str(gray))[0]
+    assert image.format() == QImage.Format.Format_Grayscale8
+    assert QColor(image.pixel(8, 6)).red() == 77
+
+
+def test_preview_never_replaces_full_resolution_entry(qapp, tmp_path):
+    path = str(tmp_path / "cached.jpg")
+    full_pix = QPixmap(40, 40)
+    preview_pix = QPixmap(10, 10)
+    try:
+        ImageLoaderRunnable.cache_pixmap(path, full_pix, 40 * 40 * 4)
+        ImageLoaderRunnable.cache_pixmap(path, preview_pix, 10 * 10 * 4, full_resolution=False)
+        assert ImageLoaderRunnable.is_full_resolution(path)
+        assert ImageLoaderRunnable.get_cached_pixmap(path).width() == 40
+
+        ImageLoaderRunnable.drop_cached_pixmap(path)
+        ImageLoaderRunnable.cache_pixmap(path, preview_pix, 10 * 10 * 4, full_resolution=False)
+        assert ImageLoaderRunnable.get_cached_pixmap(path) is not None
+        assert ImageLoaderRunnable.get_cached_pixmap(path, full_resolution=True) is None
+    finally:
+        ImageLoaderRunnable.drop_cached_pixmap(path)
+
+
+def _write_jpeg(path, width, height, color=0xFF336699):
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(color)
+    assert image.save(str(path))
+    return str(path)
+
+
+def test_preview_cache_round_trip_and_invalidation(qapp, tmp_path):
+    cache = PreviewDiskCache(str(tmp_path / "cache"))
+    source = _write_jpeg(tmp_path / "photo.jpg", 800, 600)
+    preview = QImage(400, 300, QImage.Format.Format_RGB32)
+    preview.fill(0xFF00FF00)
+
+    assert cache.get(source, QSize(400, 400)) is None
+    assert cache.put(source, preview)
+    hit = cache.get(source, QSize(400, 400))
+    assert hit is not None and hit.size() == QSize(400, 300)
+    # Larger windows need a larger preview
+    assert cache.get(source, QSize(1600, 1600)) is None
+
+    os.utime(source, ns=(1, 1))
+    assert cache.get(source, QSize(400, 400)) is None
+
+
+def test_preview_cache_evicts_least_recently_used(qapp, tmp_path):
+    first = _write_jpeg(tmp_path / "a.jpg", 64, 64)
+    second = _write_jpeg(tmp_path / "b.jpg", 64, 64)
+    noise = QImage(256, 256, QImage.Format.Format_RGB32)
+    for y in range(256):
+        for x in range(256):
+            noise.setPixel(x, y, 0xFF000000 | ((x * 7919 + y * 104729) & 0xFFFFFF))
+
+    cache = PreviewDiskCache(str(tmp_path / "cache"))
+    assert cache.put(first, noise)
+    one_entry = cache.total_bytes()
+    cache.max_bytes = int(one_entry * 1.5)
+    assert cache.put(second, noise)
+
+    assert cache.total_bytes() <= cache.max_bytes
+    assert cache.get(first, QSize(64, 64)) is None
+    assert cache.get(second, QSize(64, 64)) is not None
+
+
+def test_preview_cache_total_counts_an_overwritten_entry_once(qapp, tmp_path):
+    source = _write_jpeg(tmp_path / "photo.jpg", 800, 600)
+    preview = QImage(400, 300, QImage.Format.Format_RGB32)
+    preview.fill(0xFF00FF00)
+
+    cache = PreviewDiskCache(str(tmp_path / "cache"))
+    assert cache.put(source, preview)
+    one_entry = cache.total_bytes()
+    for _ in range(3):
+        assert cache.put(source, preview)
+    assert cache.total_bytes() == one_entry == cache._scan_total()
+
+
+def test_loader_uses_preview_cache_before_decoding(qapp, tmp_path):
+    source = _write_jpeg(tmp_path / "photo.jpg", 800, 600, 0xFF0000FF)
+    cache = PreviewDiskCache(str(tmp_path / "cache"))
+    cached = QImage(200, 150, QImage.Format.Format_RGB32)
+    cached.fill(0xFFFF0000)
+    cache.put(source, cached)
+
+    ImageLoaderRunnable.set_preview_cache(cache)
+    try:
+        pix, full = ImageLoaderRunnable.load_pixmap(source, QSize(200, 200))
+        assert not full
+        assert pix.size() == QSize(200, 150)
+        assert QColor(pix.toImage().pixel(10, 10)).red() > 200
+    finally:
+        ImageLoaderRunnable.set_preview_cache(None)
+        ImageLoaderRunnable.drop_cached_pixmap(source)
+
+
+def test_loaded_pixmap_shares_the_cached_buffer(qapp, tmp_path):
+    source = str(tmp_path / "opaque.jpg")
+    _write_jpeg(source, 64, 48)
+    try:
+        pix, full = ImageLoaderRunnable.load_pixmap(source)
+        assert full
+        cached = ImageLoaderRunnable.get_cached_pixmap(source, full_resolution=True)
+        # Same implicitly shared pixels, not a second buffer
+        assert cached.cacheKey() == pix.cacheKey()
+        # Opaque sources are not widened to an alpha format
+        assert not pix.hasAlphaChannel()
+        assert ImageLoaderRunnable._pixmap_sizes[ImageLoaderRunnable.normalize_path(source)] == 64 * 48 * 4
+    finally:
+        ImageLoaderRunnable.drop_cached_pixmap(source)
+
+
+class _RecordingRunnable(QRunnable):
+    def __init__(self, name, log, gate=None):
+        super().__init__()
+        self.name = name
+        self.log = log
+        self.gate = gate
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if not self.cancelled:
+            self.log.append(self.name)
+
+
+def _drain(scheduler):
+    for _ in range(200):
+        scheduler.waitForDone(50)
+        QCoreApplication.processEvents()
+        if not scheduler._pending and not scheduler._running:
+            return
+
+
+def _drain_until(condition):
+    for _ in range(200):
+        QCoreApplication.processEvents()
+        if condition():
+            return
+        threading.Event().wait(0.01)
+
+
+def test_scheduler_runs_visible_before_preloads(qapp):
+    scheduler = LoadScheduler(max_workers=2, reserved_visible=1)
+    log = []
+    gate = threading.Event()
+    try:
+        scheduler.submit(_RecordingRunnable("busy", log, gate), PRIORITY_WARMUP, "busy")
+        scheduler.submit(_RecordingRunnable("warmup", log), PRIORITY_WARMUP, "warmup")
+        scheduler.submit(_RecordingRunnable("next", log), PRIORITY_NEXT, "next")
+        # The reserved thread is still free for the visible image
+        scheduler.submit(_RecordingRunnable("visible", log), PRIORITY_VISIBLE, "visible")
+        scheduler.waitForDone(1000)
+        assert log == ["visible"]
+        assert scheduler.pending_keys() == ["next", "warmup"]
+
+        scheduler.reprioritize("warmup", PRIORITY_NEXT)
+        assert scheduler.pending_keys() == ["next", "warmup"]
+        scheduler.reprioritize("next", PRIORITY_WARMUP)
+        assert scheduler.pending_keys() == ["warmup", "next"]
+    finally:
+        gate.set()
+        _drain(scheduler)
+    assert log == ["visible", "busy", "warmup", "next"]
+
+
+def test_scheduler_retain_drops_stale_preloads(qapp):
+    scheduler = LoadScheduler(max_workers=2, reserved_visible=1)
+    log = []
+    gate = threading.Event()
+    try:
+        scheduler.submit(_RecordingRunnable("busy", log, gate), PRIORITY_WARMUP, "busy")
+        scheduler.submit(_RecordingRunnable("old", log), PRIORITY_NEXT, "old")
+        scheduler.submit(_RecordingRunnable("new", log), PRIORITY_NEXT, "new")
+        job = scheduler.submit(_RecordingRunnable("late", log), PRIORITY_WARMUP, "late")
+
+        scheduler.retain(["new", "late"])
+        job.cancel()
+        assert scheduler.pending_keys() == ["new"]
+        assert not scheduler.is_scheduled("old")
+    finally:
+        gate.set()
+        _drain(scheduler)
+    # "busy" was running and not retained, so its result is discarded
+    assert log == ["new"]
+
+
+class _ReadingRunnable(_RecordingRunnable):
+    def __init__(self, name, log, size):
+        super().__init__(name, log)
+        self.size = size
+
+    def read(self):
+        self.log.append(f"read {self.name}")
+        return self.size
+
+
+def test_scheduler_reads_ahead_within_byte_budget(qapp):
+    scheduler = LoadScheduler(max_workers=2, reserved_visible=1, max_readers=2, read_budget_bytes=150)
+    log = []
+    gate = threading.Event()
+    try:
+        # Hold the only background decode thread so read bytes pile up
+        scheduler.submit(_RecordingRunnable("busy", log, gate), PRIORITY_WARMUP, "busy")
+        for name in ("a", "b", "c"):
+            scheduler.submit(_ReadingRunnable(name, log, 100), PRIORITY_WARMUP, name)
+        _drain_until(lambda: scheduler.buffered_bytes() >= 200)
+        assert log == ["read a", "read b"]
+        assert scheduler.pending_keys() == ["a", "b", "c"]
+
+        # The visible image reads and decodes regardless of the budget
+        scheduler.submit(_ReadingRunnable("visible", log, 100), PRIORITY_VISIBLE, "visible")
+        _drain_until(lambda: "visible" in log)
+        assert log == ["read a", "read b", "read visible", "visible"]
+    finally:
+        gate.set()
+        _drain(scheduler)
+    # "c" is read once a decode frees budget
+    assert [e for e in log[4:] if not e.startswith("read")] == ["busy", "a", "b", "c"]
+    assert "read c" in log
+    assert scheduler.buffered_bytes() == 0
+
+
+def test_loader_decodes_from_read_stage_bytes(qapp, tmp_path):
+    source = str(tmp_path / "staged.jpg")
+    _write_jpeg(source, 200, 100)
+    loader = ImageLoaderRunnable(source, QSize(50, 50))
+    results = []
+    loader.signals.finished.connect(lambda pix: results.append(pix.size()))
+    try:
+        assert loader.read() == os.path.getsize(source)
+        # Decoding no longer needs the file
+        os.remove(source)
+        loader.run()
+        QCoreApplication.processEvents()
+        assert results == [QSize(50, 25)]
+        assert not loader.full_resolution
+    finally:
+        ImageLoaderRunnable.drop_cached_pixmap(source)
+
+    for backend in (_decode_with_qt, _decode_with_opencv, _decode_with_pillow):
+        path = str(tmp_path / "bytes.jpg")
+        _write_jpeg(path, 80, 60)
+        with open(path, "rb") as f:
+            data = f.read()
+        image, full = backend("missing/bytes.jpg", QSize(40, 40), data)
+        assert image.size() == QSize(40, 30) and not full
+
+
+def test_scheduler_coalesces_duplicate_loads(qapp, tmp_path):
+    source = str(tmp_path / "shared.jpg")
+    _write_jpeg(source, 400, 300)
+    scheduler = LoadScheduler(max_workers=2, reserved_visible=1)
+    log = []
+    results = []
+    gate = threading.Event()
+    try:
+        scheduler.submit(_RecordingRunnable("busy", log, gate), PRIORITY_WARMUP, "busy")
+        preload = scheduler.load_image(source, QSize(100, 100), PRIORITY_WARMUP)
+        assert isinstance(preload, LoadFuture)
+        preload.add_done_callback(lambda pix, full: results.append(("preload", pix.width())))
+        assert scheduler.pending_keys() == [preload.key]
+
+        # The visible request attaches to the queued preload and promotes it
+        visible = scheduler.load_image(source, QSize(100, 100), PRIORITY_VISIBLE)
+        assert visible is preload
+        visible.add_done_callback(lambda pix, full: results.append(("visible", pix.width())))
+        _drain_until(lambda: visible.done())
+        assert scheduler.pending_keys() == []
+        assert sorted(results) == [("preload", 100), ("visible", 100)]
+
+        # Late callers are answered immediately
+        visible.add_done_callback(lambda pix, full: results.append(("late", full)))
+        assert results[-1] == ("late", False)
+    finally:
+        gate.set()
+        _drain(scheduler)
+        ImageLoaderRunnable.drop_cached_pixmap(source)
+    assert not scheduler._inflight
+
+
+def test_preview_request_reuses_full_resolution_load(qapp, tmp_path):
+    source = str(tmp_path / "full.jpg")
+    _write_jpeg(source, 400, 300)
+    scheduler = LoadScheduler(max_workers=2, reserved_visible=1)
+    gate = threading.Event()
+    try:
+        scheduler.submit(_RecordingRunnable("busy", [], gate), PRIORITY_WARMUP, "busy")
+        full = scheduler.load_image(source, None, PRIORITY_WARMUP)
+        assert scheduler.load_image(source, QSize(100, 100)) is full
+        # ...but a full-resolution request never settles for a preview
+        full.cancel()
+        preview = scheduler.load_image(source, QSize(100, 100), PRIORITY_WARMUP)
+        assert preview is not full
+        assert scheduler.load_image(source, None, PRIORITY_WARMUP) is not preview
+    finally:
+        gate.set()
+        _drain(scheduler)
+        ImageLoaderRunnable.drop_cached_pixmap(source)
+    assert not scheduler._inflight
+
+
+def test_prefetch_window_follows_direction():
+    planner = PrefetchPlanner(ahead=6, behind=2)
+    assert planner.window(10, 100) == [11, 12, 9, 13, 14, 15, 16, 8]
+
+    planner.record_step(-1, timestamp=0.0)
+    assert planner.window(10, 100) == [9, 8, 11, 7, 6, 5, 4, 12]
+    # Clipped at the ends unless looping
+    assert planner.window(1, 100) == [0, 2, 3]
+    assert planner.window(1, 5, loop=True) == [0, 4, 2, 3]
+
+
+def test_prefetch_window_deepens_when_navigating_fast():
+    planner = PrefetchPlanner(ahead=6, behind=2, max_ahead=20)
+    for step in range(10):
+        planner.record_step(1, timestamp=step * 0.1)
+    ahead, behind = planner.depth()
+    assert ahead == 20
+    assert behind == 1
+
+    # A pause resets to the configured depth
+    planner.record_step(1, timestamp=10.0)
+    assert planner.depth() == (6, 2)
+
+
+def test_prefetch_window_respects_cache_budget():
+    planner = PrefetchPlanner(ahead=6, behind=2)
+    assert planner.depth(max_entries=8) == (3, 1)
+    assert planner.window(50, 100, max_entries=8) == [51, 52, 49, 53]
+    assert planner.window(0, 1) == []
+
+
+def test_cache_budget_scales_with_physical_memory():
+    laptop = default_cache_budget(total=8 * GIB, available=2 * GIB)
+    workstation = default_cache_budget(total=64 * GIB, available=48 * GIB)
+    assert 128 * MIB <= laptop < 512 * MIB
+    assert workstation >= 4 * GIB
+    assert memory_shortfall(total=8 * GIB, available=4 * GIB) == 0
+    assert memory_shortfall(total=8 * GIB, available=300 * MIB) > 0
+
+
+def test_cache_stats_and_pressure_shrink(qapp, tmp_path):
+    saved_budget = ImageLoaderRunnable._cache_budget_bytes
+    paths = [str(tmp_path / f"{i}.jpg") for i in range(4)]
+    try:
+        ImageLoaderRunnable.configure_cache(256 * MIB)
+        ImageLoaderRunnable.reset_cache_stats()
+        for path in paths:
+            ImageLoaderRunnable.cache_pixmap(path, QPixmap(8, 8), 100 * MIB)
+        stats = ImageLoaderRunnable.cache_stats()
+        assert stats["entries"] == 2
+        assert stats["evictions"] == 2
+        assert stats["resident_bytes"] == 200 * MIB
+
+        assert ImageLoaderRunnable.get_cached_pixmap(paths[3]) is not None
+        assert ImageLoaderRunnable.get_cached_pixmap(paths[0]) is None
+        stats = ImageLoaderRunnable.cache_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+        limit = ImageLoaderRunnable.relieve_memory_pressure(total=8 * GIB, available=700 * MIB)
+        assert limit == 128 * MIB
+        assert ImageLoaderRunnable.cache_stats()["entries"] == 1
+        assert ImageLoaderRunnable.is_cached(paths[3])
+
+        limit = ImageLoaderRunnable.relieve_memory_pressure(total=8 * GIB, available=4 * GIB)
+        assert limit == 256 * MIB
+    finally:
+        for path in paths:
+            ImageLoaderRunnable.drop_cached_pixmap(path)
+        ImageLoaderRunnable.configure_cache(saved_budget)
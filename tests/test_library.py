@@ -0,0 +1,484 @@
+"""Tests for folder indexing (library)."""
+import os
+import random
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import QCoreApplication
+
+from image_classifier.library import (
+    Catalog, DirectoryIndex, DirectoryWatcher, ImageView, LibraryIndex, MarkSet, MarksWriter, PathTable,
+    RankBitset, read_marks, write_marks,
+)
+from image_classifier.library.index import unique_roots
+from image_classifier.library.marks import JOURNAL_FILE, append_journal
+from image_classifier.workers import DirectoryScanner
+
+
+def _touch(path, size=1, mtime=None):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _names(paths):
+    return [os.path.basename(p) for p in paths]
+
+
+def test_index_sorts_like_a_fresh_scan(tmp_path):
+    _touch(tmp_path / "b.jpg", size=30, mtime=1000)
+    _touch(tmp_path / "A.png", size=10, mtime=3000)
+    _touch(tmp_path / "c.heic", size=20, mtime=2000)
+    _touch(tmp_path / "notes.txt")
+    os.mkdir(tmp_path / "sub.jpg")
+
+    index = DirectoryIndex(str(tmp_path))
+    assert [n.lower() for n in _names(index.images())] == ["a.png", "b.jpg", "c.heic"]
+    index.set_sort("date_modified", True)
+    assert _names(index.images())[0].lower() == "b.jpg"
+    index.set_sort("size", False)
+    assert [n.lower() for n in _names(index.images())] == ["b.jpg", "c.heic", "a.png"]
+    assert all(os.path.isabs(p) for p in index.norm_to_original.values())
+
+
+def test_switching_sort_is_in_memory(tmp_path):
+    _touch(tmp_path / "a.jpg", size=30, mtime=200)
+    _touch(tmp_path / "b.jpg", size=10, mtime=300)
+    _touch(tmp_path / "c.jpg", size=20, mtime=100)
+    index = DirectoryIndex(str(tmp_path))
+    assert index.record(str(tmp_path / "a.jpg"))[3] == 30
+
+    # Changes on disk are not seen: the scanned records are reused
+    for name in ("a.jpg", "b.jpg", "c.jpg"):
+        os.remove(tmp_path / name)
+    index.set_sort("size", True)
+    assert _names(index.images()) == ["b.jpg", "c.jpg", "a.jpg"]
+    index.set_sort("date_modified", False)
+    assert _names(index.images()) == ["b.jpg", "a.jpg", "c.jpg"]
+    index.set_sort("file_name", True)
+    assert _names(index.images()) == ["a.jpg", "b.jpg", "c.jpg"]
+
+
+def test_cached_orders_follow_single_file_changes(tmp_path):
+    _touch(tmp_path / "a.jpg", size=30, mtime=200)
+    _touch(tmp_path / "b.jpg", size=10, mtime=300)
+    index = DirectoryIndex(str(tmp_path))
+    for option in ("size", "date_modified", "file_name"):
+        index.set_sort(option, True)
+        index.images()
+
+    added = _touch(tmp_path / "c.jpg", size=20, mtime=100)
+    index.add(added)
+    index.remove(str(tmp_path / "b.jpg"))
+    index.merge([(os.path.normcase(str(tmp_path / "d.jpg")), str(tmp_path / "d.jpg"),
+                  "d.jpg", 5, 400)])
+
+    index.set_sort("size", True)
+    assert _names(index.images()) == ["d.jpg", "c.jpg", "a.jpg"]
+    index.set_sort("date_modified", True)
+    assert _names(index.images()) == ["c.jpg", "a.jpg", "d.jpg"]
+    index.set_sort("file_name", False)
+    assert _names(index.images()) == ["d.jpg", "c.jpg", "a.jpg"]
+
+
+def test_index_applies_single_file_changes(tmp_path):
+    for name, mtime in (("a.jpg", 100), ("c.jpg", 300), ("e.jpg", 500)):
+        _touch(tmp_path / name, mtime=mtime)
+    index = DirectoryIndex(str(tmp_path), "date_modified")
+
+    new = _touch(tmp_path / "z.jpg", mtime=200)
+    assert index.add(new)
+    assert _names(index.images()) == ["a.jpg", "z.jpg", "c.jpg", "e.jpg"]
+    assert index.norm_to_original[new].endswith("z.jpg")
+
+    # Overwriting a file moves it to its new date
+    os.utime(new, (900, 900))
+    assert index.add(new)
+    assert _names(index.images()) == ["a.jpg", "c.jpg", "e.jpg", "z.jpg"]
+
+    assert index.remove(str(tmp_path / "c.jpg"))
+    assert not index.remove(str(tmp_path / "c.jpg"))
+    assert not index.add(str(tmp_path / "missing.jpg"))
+    assert not index.add(str(tmp_path / "notes.txt"))
+    assert _names(index.images()) == ["a.jpg", "e.jpg", "z.jpg"]
+    assert len(index) == 3
+
+
+def test_snapshots_are_shared_until_the_index_changes(tmp_path):
+    a = _touch(tmp_path / "a.jpg")
+    _touch(tmp_path / "b.jpg")
+    index = DirectoryIndex(str(tmp_path))
+    snapshot = index.snapshot()
+    assert index.snapshot() is snapshot
+    assert _names(snapshot.paths) == ["a.jpg", "b.jpg"]
+
+    c = _touch(tmp_path / "c.jpg")
+    index.add(c)
+    index.remove(a)
+    # The old snapshot is left as it was
+    assert _names(snapshot.paths) == ["a.jpg", "b.jpg"]
+    assert a in snapshot.norm_to_original and c not in snapshot.norm_to_original
+    current = index.snapshot()
+    assert current is not snapshot
+    assert _names(current.paths) == ["b.jpg", "c.jpg"]
+    assert c in current.norm_to_original and a not in current.norm_to_original
+
+
+def test_index_sync_returns_delta(tmp_path):
+    paths = [_touch(tmp_path / f"{i:02d}.jpg") for i in range(40)]
+    index = DirectoryIndex(str(tmp_path))
+
+    os.remove(paths[3])
+    added = _touch(tmp_path / "new.jpg")
+    delta = index.sync()
+    assert delta.added == [added]
+    assert delta.removed == [paths[3]]
+    assert paths[3] not in index and added in index
+    assert not index.sync()
+
+    # Most of the folder changed: falls back to a rescan, same result
+    for path in paths[10:]:
+        os.remove(path)
+    delta = index.sync()
+    assert len(delta.removed) == 30
+    assert len(index) == 10
+
+
+def test_scanner_batches_merge_into_sorted_index(tmp_path):
+    for i in range(300):
+        _touch(tmp_path / f"{i:03d}.jpg", size=300 - i)
+    selected = _touch(tmp_path / "150.jpg", size=150)
+    index = DirectoryIndex(str(tmp_path), "size", scan=False)
+    assert index.add(selected)
+    assert index.images() == [selected]
+
+    scanner = DirectoryScanner(str(tmp_path), first_batch=8, max_batch=100)
+    sizes = []
+    added = []
+    finished = []
+
+    def on_batch(_, batch):
+        sizes.append(len(batch.records))
+        added.extend(index.merge(batch.records, batch.folders))
+
+    scanner.signals.batch.connect(on_batch)
+    scanner.signals.finished.connect(finished.append)
+    scanner.run()
+
+    assert finished == [scanner]
+    assert sizes == [8, 32, 100, 100, 60]
+    # The selected file was already indexed and is not added twice
+    assert len(added) == 299 and selected not in added
+    assert len(index) == 300
+    assert _names(index.images())[:3] == ["299.jpg", "298.jpg", "297.jpg"]
+    assert index.images() == DirectoryIndex(str(tmp_path), "size").images()
+
+
+def test_cancelled_scanner_stops_quietly(tmp_path):
+    for i in range(20):
+        _touch(tmp_path / f"{i}.jpg")
+    scanner = DirectoryScanner(str(tmp_path), first_batch=4)
+    events = []
+    scanner.signals.batch.connect(lambda s, batch: (events.append("batch"), scanner.cancel()))
+    scanner.signals.finished.connect(lambda s: events.append("finished"))
+    scanner.run()
+    assert events == ["batch"]
+
+
+def _make_tree(root):
+    for folder in ("day1/card_a", "day1/card_b", "day2"):
+        os.makedirs(root / folder)
+    paths = {}
+    for i, folder in enumerate(("day1/card_a", "day1/card_b", "day2", ".")):
+        for j in range(3):
+            name = f"{folder.replace('/', '_').strip('.')}_{j}.jpg".lstrip("_")
+            paths[name] = _touch(root / folder / name, mtime=1000 + 10 * i + j)
+    return paths
+
+
+def test_library_index_lists_a_tree_as_one_stream(tmp_path):
+    paths = _make_tree(tmp_path)
+    flat = DirectoryIndex(str(tmp_path))
+    assert len(flat) == 3
+
+    library = LibraryIndex([str(tmp_path)], "date_modified")
+    assert len(library) == 12
+    assert library.images() == sorted(paths.values(), key=lambda p: os.path.getmtime(p))
+    assert len(library.folders()) == 5
+    assert library.accepts(str(tmp_path / "day1" / "card_b"))
+    assert not library.accepts(str(tmp_path.parent))
+
+    # Roots inside another root are not listed twice
+    roots = unique_roots([str(tmp_path / "day2"), str(tmp_path), str(tmp_path)])
+    assert roots == [os.path.abspath(str(tmp_path))]
+    two_roots = LibraryIndex([str(tmp_path / "day1"), str(tmp_path / "day2")], recursive=False)
+    assert len(two_roots) == 3
+
+
+def test_library_sync_follows_folders(tmp_path):
+    _make_tree(tmp_path)
+    library = LibraryIndex([str(tmp_path)])
+
+    os.makedirs(tmp_path / "day3" / "card_c")
+    new = _touch(tmp_path / "day3" / "card_c" / "x.jpg")
+    delta = library.sync(str(tmp_path))
+    assert delta.added == [new]
+    assert {os.path.basename(f) for f in delta.folders} == {"day3", "card_c"}
+    assert str(tmp_path / "day3" / "card_c") in library.folders()
+
+    for name in os.listdir(tmp_path / "day1" / "card_a"):
+        os.remove(tmp_path / "day1" / "card_a" / name)
+    os.rmdir(tmp_path / "day1" / "card_a")
+    delta = library.sync(str(tmp_path / "day1"))
+    assert len(delta.removed) == 3
+    assert len(library) == 10
+    assert str(tmp_path / "day1" / "card_a") not in library.folders()
+
+
+def test_parallel_library_scan_reads_marks(tmp_path):
+    paths = _make_tree(tmp_path)
+    favorite = paths["day1_card_b_1.jpg"]
+    write_marks(str(tmp_path / "day1" / "card_b"), {favorite}, set())
+    assert read_marks(str(tmp_path / "day1" / "card_b")) == ({favorite}, set())
+    # A Favorites.json copied from elsewhere is ignored
+    assert read_marks(str(tmp_path / "day2")) == (set(), set())
+
+    index = LibraryIndex([str(tmp_path)], scan=False)
+    scanner = DirectoryScanner([str(tmp_path)], recursive=True, workers=3, first_batch=2,
+                               read_marks=True)
+    favorites = set()
+
+    def on_batch(_, batch):
+        index.merge(batch.records, batch.folders)
+        favorites.update(batch.favorites)
+
+    scanner.signals.batch.connect(on_batch)
+    scanner.run()
+    assert sorted(index.images()) == sorted(paths.values())
+    assert len(index.folders()) == 5
+    assert favorites == {favorite}
+
+
+def test_journal_replays_on_top_of_saved_marks(tmp_path):
+    a = _touch(tmp_path / "a.jpg")
+    b = _touch(tmp_path / "b.jpg")
+    c = _touch(tmp_path / "c.jpg")
+    write_marks(str(tmp_path), {a, b}, set())
+    append_journal(str(tmp_path), [("favorites", a, False), ("compare", c, True)])
+    with open(tmp_path / JOURNAL_FILE, "a", encoding="utf-8") as f:
+        # A crash in the middle of an append
+        f.write('{"mark": "favorites", "pa')
+    assert read_marks(str(tmp_path)) == ({b}, {c})
+
+    write_marks(str(tmp_path), {b}, {c})
+    assert not os.path.exists(tmp_path / JOURNAL_FILE)
+    assert read_marks(str(tmp_path)) == ({b}, {c})
+
+
+def test_mark_set_reports_changes_but_not_loads():
+    marks = MarkSet({"a"})
+    marks.load({"b", "c"})
+    assert marks.take_changes() == []
+    marks.add("d")
+    marks.discard("a")
+    marks -= {"b"}
+    marks.add("b")
+    assert sorted(marks.take_changes()) == [("a", False), ("b", True), ("d", True)]
+    assert marks == {"b", "c", "d"}
+    marks.discard("c")
+    # A pending change wins over marks read from disk afterwards
+    marks.load({"c"})
+    assert "c" not in marks and marks.take_changes() == [("c", False)]
+
+
+def test_marks_writer_journals_then_compacts(tmp_path):
+    paths = [_touch(tmp_path / f"{i}.jpg") for i in range(4)]
+    favorites = set()
+    writer = MarksWriter(lambda d: (set(favorites), set(), False, None), compact_after=3)
+
+    favorites.update(paths[:2])
+    writer.append(str(tmp_path), [("favorites", p, True) for p in paths[:2]])
+    writer.flush()
+    writer.wait()
+    assert os.path.exists(tmp_path / JOURNAL_FILE)
+    assert read_marks(str(tmp_path)) == (set(paths[:2]), set())
+
+    favorites.discard(paths[0])
+    favorites.add(paths[3])
+    writer.append(str(tmp_path), [("favorites", paths[0], False), ("favorites", paths[3], True)])
+    writer.flush()
+    writer.wait()
+    # Past compact_after the journal is folded into Favorites.json
+    assert not os.path.exists(tmp_path / JOURNAL_FILE)
+    assert read_marks(str(tmp_path)) == ({paths[1], paths[3]}, set())
+
+
+def test_marks_writer_compacts_a_journal_left_by_a_crash(tmp_path):
+    a = _touch(tmp_path / "a.jpg")
+    b = _touch(tmp_path / "b.jpg")
+    write_marks(str(tmp_path), {a}, set())
+    append_journal(str(tmp_path), [("favorites", b, True)])
+    writer = MarksWriter(lambda d: (set(), set(), False, None))
+
+    writer.compact_leftovers([str(tmp_path), str(tmp_path / "missing")])
+    writer.wait()
+    assert not os.path.exists(tmp_path / JOURNAL_FILE)
+    assert read_marks(str(tmp_path)) == ({a, b}, set())
+
+    # A journal this session is writing is compacted by flush(), not here
+    writer.append(str(tmp_path), [("favorites", a, False)])
+    writer.flush()
+    writer.compact_leftovers([str(tmp_path)])
+    writer.wait()
+    assert os.path.exists(tmp_path / JOURNAL_FILE)
+    assert read_marks(str(tmp_path)) == ({b}, set())
+
+
+def test_catalog_keeps_listings_marks_and_edits(tmp_path):
+    paths = _make_tree(tmp_path / "photos")
+    card_a = str(tmp_path / "photos" / "day1" / "card_a")
+    favorite = paths["day1_card_a_1.jpg"]
+    write_marks(card_a, {favorite}, set())
+
+    catalog = Catalog(str(tmp_path / "catalog.sqlite3"))
+    index = LibraryIndex([str(tmp_path / "photos")])
+    catalog.store_listing(index.folders(), index.records().values())
+    # Favorites.json is imported once, then the catalog answers
+    assert catalog.read_marks(card_a) == ({favorite}, set())
+    os.remove(os.path.join(card_a, "Favorites.json"))
+    catalog.apply_marks(card_a, [("compare", favorite, True)])
+    assert catalog.read_marks(card_a) == ({favorite}, {favorite})
+    assert catalog.marked("favorites") == {favorite}
+
+    catalog.store_edits([card_a], {favorite: 90}, {})
+    assert catalog.edits([str(tmp_path / "photos")], recursive=True) == {favorite: (90, 1.0)}
+
+    records, folders = catalog.listing([str(tmp_path / "photos")], recursive=True)
+    reopened = LibraryIndex([str(tmp_path / "photos")], scan=False)
+    reopened.merge(records, folders)
+    assert reopened.images() == index.images()
+    assert len(catalog.listing([card_a])[0]) == 3
+    catalog.close()
+
+
+def test_path_table_keeps_ids_and_shares_names(tmp_path):
+    table = PathTable()
+    records = []
+    for folder in ("100CANON", "101CANON"):
+        original = os.path.join(str(tmp_path), folder, "IMG_0001.JPG")
+        records.append((os.path.normcase(original), original, "IMG_0001.JPG", 10, 100.0))
+    first, second = (table.add(record) for record in records)
+    assert table.record(first) == records[0] and table.find(records[1][0]) == second
+    assert table.names[first] is table.names[second]
+
+    table.remove(first)
+    assert len(table) == 1 and table.ids() == [second]
+    # A file that comes back keeps its ID, so older snapshots still read right
+    assert table.add(records[0][:3] + (20, 200.0)) == first
+    assert table.record(first)[3:] == (20, 200.0) and len(table) == 2
+
+
+def test_snapshot_paths_answer_lookups_without_a_dict(tmp_path):
+    paths = [_touch(tmp_path / f"{i}.jpg") for i in range(5)]
+    index = DirectoryIndex(str(tmp_path))
+    index.set_sort("file_name", False)
+    snapshot = index.snapshot()
+    assert list(snapshot.paths) == paths[::-1] and snapshot.paths[-1] == paths[0]
+    assert snapshot.paths.index(paths[1]) == 3
+    assert str(tmp_path / "missing.jpg") not in snapshot.paths
+
+    view = ImageView(snapshot.paths, {"favorites": lambda: {paths[1], paths[3]}})
+    assert view.position(paths[4]) == 0
+    assert list(view.filtered("favorites")) == [paths[3], paths[1]]
+    assert view.filtered("non_favorites").index(paths[0]) == 2
+    assert [r[0] for r in snapshot.records()] == paths[::-1]
+
+
+def test_rank_bitset_matches_a_plain_list():
+    rng = random.Random(7)
+    size = 3000
+    bits = [rng.random() < 0.3 for _ in range(size)]
+    bitset = RankBitset(size, (i for i, b in enumerate(bits) if b))
+    for _ in range(200):
+        i = rng.randrange(size)
+        bits[i] = not bits[i]
+        bitset.set(i, bits[i])
+    ones = [i for i, b in enumerate(bits) if b]
+    zeros = [i for i, b in enumerate(bits) if not b]
+    assert bitset.count == len(ones)
+    assert list(bitset.positions()) == ones
+    assert list(bitset.positions(False)) == zeros
+    for i in range(0, size + 1, 37):
+        assert bitset.rank(i) == sum(bits[:i])
+    for k in range(0, len(ones), 13):
+        assert bitset.select(k) == ones[k]
+    for k in range(0, len(zeros), 13):
+        assert bitset.select(k, False) == zeros[k]
+
+
+def test_filtered_views_follow_marks():
+    paths = [f"/p/{i:03d}.jpg" for i in range(10)]
+    favorites = MarkSet({paths[2], paths[5]})
+    view = ImageView(paths, {"favorites": lambda: favorites, "compare": lambda: set()})
+    favs = view.filtered("favorites")
+    others = view.filtered("non_favorites")
+    assert list(favs) == [paths[2], paths[5]]
+    assert favs.index(paths[5]) == 1
+    assert others[2] == paths[3] and len(others) == 8
+
+    view.mark("favorites", paths[7], True)
+    favorites.discard(paths[2])
+    assert list(favs) == [paths[5], paths[7]]
+    assert others.index(paths[2]) == 2
+    assert paths[7] not in others
+    # Stays on the image, else moves to the next (or last) one in the view
+    assert favs.nearest(paths[7]) == 1
+    assert favs.nearest(paths[6]) == 1
+    assert favs.nearest(paths[9]) == 1
+    assert favs.nearest("/elsewhere.jpg") is None
+    assert not view.filtered("compare")
+
+
+def test_watcher_reports_external_changes_once(tmp_path):
+    watcher = DirectoryWatcher(delay_ms=50)
+    seen = []
+    watcher.changed.connect(seen.append)
+    watcher.watch(str(tmp_path))
+    for i in range(5):
+        _touch(tmp_path / f"{i}.jpg")
+    for _ in range(200):
+        QCoreApplication.processEvents()
+        if seen:
+            break
+        threading.Event().wait(0.01)
+    # One debounced notification for the whole burst
+    threading.Event().wait(0.1)
+    QCoreApplication.processEvents()
+    assert seen == [os.path.abspath(str(tmp_path))]
+
+    # The app's own marks files don't count as changes
+    seen.clear()
+    write_marks(str(tmp_path), {str(tmp_path / "0.jpg")}, set())
+    append_journal(str(tmp_path), [("favorites", str(tmp_path / "1.jpg"), True)])
+    _touch(tmp_path / "5.jpg")
+    for _ in range(200):
+        QCoreApplication.processEvents()
+        if seen:
+            break
+        threading.Event().wait(0.01)
+    threading.Event().wait(0.1)
+    QCoreApplication.processEvents()
+    assert seen == [os.path.abspath(str(tmp_path))]
+    seen.clear()
+    write_marks(str(tmp_path), set(), set())
+    for _ in range(30):
+        QCoreApplication.processEvents()
+        threading.Event().wait(0.01)
+    assert seen == []
+
+    watcher.clear()
+    assert watcher.directory() is None
@@ -0,0 +1,137 @@
+"""Tests for the image viewer's GPU paths falling back to the CPU."""
+from contextlib import nullcontext
+
+from PyQt6.QtGui import QColor, QImage, QPainter, QPixmap
+
+import image_classifier.app as app_module
+import image_classifier.imaging.gl_sharpen as gl_sharpen
+from image_classifier.app import AdvancedGraphicsImageViewer, BrightnessPixmapItem
+from image_classifier.imaging import GLSharpener, GPULimitError
+
+
+class FakeViewport:
+    def isValid(self):
+        return True
+
+    def context(self):
+        return object()
+
+    def makeCurrent(self):
+        pass
+
+    def doneCurrent(self):
+        pass
+
+    def width(self):
+        return 64
+
+    def height(self):
+        return 64
+
+    def devicePixelRatioF(self):
+        return 1.0
+
+
+def _fake_viewer():
+    return type(
+        "FakeViewer",
+        (),
+        {
+            "_gl_sharpener": GLSharpener(),
+            "_gl_sharpen_failed": False,
+            "viewport": lambda self: FakeViewport(),
+        },
+    )()
+
+
+def _pixmap(size=16):
+    pixmap = QPixmap(size, size)
+    pixmap.fill(QColor(40, 80, 120))
+    return pixmap
+
+
+def test_gpu_sharpen_limit_falls_back_for_that_call_only(monkeypatch):
+    monkeypatch.setattr(app_module, "QOpenGLWidget", FakeViewport)
+    viewer = _fake_viewer()
+
+    def too_large(*args):
+        raise GPULimitError("too large")
+
+    viewer._gl_sharpener.sharpen = too_large
+    fallback = _pixmap()
+
+    result = AdvancedGraphicsImageViewer.applySharpenGPU(
+        viewer, _pixmap(), 60, 1.0, fallback=lambda: fallback)
+
+    assert result is fallback
+    assert not viewer._gl_sharpen_failed
+
+
+def test_gpu_sharpen_compile_failure_disables_the_gpu(monkeypatch):
+    monkeypatch.setattr(app_module, "QOpenGLWidget", FakeViewport)
+    monkeypatch.setattr(gl_sharpen, "saved_state", nullcontext)
+    compiles = []
+
+    def broken_compile(vertex_src, fragment_src):
+        compiles.append(fragment_src)
+        raise RuntimeError("Shader compile failed: 'no GLSL 3.30'")
+
+    monkeypatch.setattr(gl_sharpen, "compile_program", broken_compile)
+    viewer = _fake_viewer()
+
+    for _ in range(2):
+        result = AdvancedGraphicsImageViewer.applySharpenGPU(viewer, _pixmap(), 1, 1.0)
+        assert result.size() == _pixmap().size()
+
+    assert viewer._gl_sharpen_failed
+    # Not compiled again once the GPU is given up on
+    assert len(compiles) == 1
+
+
+def _paint(item):
+    target = QImage(64, 64, QImage.Format.Format_ARGB32_Premultiplied)
+    painter = QPainter(target)
+    item.paint(painter, None, FakeViewport())
+    painter.end()
+
+
+def test_brightness_limit_bakes_only_oversized_pixmaps(monkeypatch):
+    monkeypatch.setattr(app_module, "QOpenGLWidget", FakeViewport)
+    drawn = []
+
+    class Renderer:
+        def draw(self, pixmap, brightness, matrix, viewport_size):
+            if pixmap.width() > 16:
+                raise GPULimitError("too large")
+            drawn.append(pixmap.width())
+
+    failed = []
+    item = BrightnessPixmapItem(Renderer(), on_failed=lambda: failed.append(True))
+    item.setPixmap(_pixmap(32))
+    item.setBrightness(0.5)
+    _paint(item)
+
+    assert failed and not item.gl_failed
+    assert item.brightness == 1.0
+    assert not item.drawsBrightness(_pixmap(32))
+    # The next, smaller image is still drawn by the shader
+    item.setPixmap(_pixmap(16))
+    item.setBrightness(0.5)
+    _paint(item)
+    assert drawn == [16] and item.brightness == 0.5
+
+
+def test_brightness_gl_failure_disables_the_shader(monkeypatch):
+    monkeypatch.setattr(app_module, "QOpenGLWidget", FakeViewport)
+
+    class Renderer:
+        def draw(self, pixmap, brightness, matrix, viewport_size):
+            raise RuntimeError("Shader link failed")
+
+    item = BrightnessPixmapItem(Renderer())
+    item.setPixmap(_pixmap())
+    item.setBrightness(0.5)
+    _paint(item)
+
+    assert item.gl_failed
+    assert not item.drawsBrightness(_pixmap(4))